@@ -1,41 +1,714 @@
 import sqlite3
-from flask import Flask, render_template, jsonify, request
-from datetime import datetime
+import time
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g, send_from_directory, url_for
+from datetime import datetime, timezone
 import os
 from pathlib import Path
 import json
+import math
+import asyncio
+import threading
+import gzip
+import io
+import zlib
+from functools import wraps
 
-from llm_client import LLMClient
+from llm_client import LLMClient, LLMResponseError
+from async_llm_client import AsyncLLMClient
+from llm_router import LLMRouter
 from config import Config
+from profiler import RequestProfiler, bind_to_profile
+from change_feed import ChangeFeed
+from entity_dedup import DuplicateFinder, load_entities
+from semantic_index import SemanticIndex, create_embedder
+from archive import ArchiveError, export_ndjson, import_ndjson
+from extraction_eval import DEFAULT_PROMPT_NAME, evaluate, load_corpus, recommend
+import rate_limiter
+import metrics
+
+# Brotli is optional; without it, responses are compressed with gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
+HTTP_REQUESTS = metrics.Counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status",
+    ["route", "method", "status"]
+)
+HTTP_REQUEST_SECONDS = metrics.Histogram(
+    "http_request_duration_seconds",
+    "Time to produce the HTTP response (streamed bodies excluded)",
+    ["route", "method"]
+)
+SQLITE_QUERY_SECONDS = metrics.Histogram(
+    "sqlite_query_duration_seconds",
+    "Time to execute SQLite statements",
+    ["operation"]
+)
+HTTP_CACHE_RESPONSES = metrics.Counter(
+    "http_cache_responses_total",
+    "Conditional GET outcomes of the cacheable read endpoints (hit = 304 Not Modified)",
+    ["route", "result"]
+)
+
+# JSON bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+# Page sizes of the paginated message lists
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Related messages are only searched through entities linked to at most this many messages
+RELATED_POSTING_LIMIT = 2000
+
+# Seconds a client should wait before asking again for duplicate clusters that are still being computed
+DUPLICATES_RETRY_AFTER = 2
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started, for the latency histogram."""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency under its route pattern."""
+    started = g.get('request_started')
+    if started is not None:
+        # Use the URL rule, not the path, to keep the label set small
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.labels(route=route, method=request.method, status=response.status_code).inc()
+        HTTP_REQUEST_SECONDS.labels(route=route, method=request.method).observe(time.perf_counter() - started)
+    return response
+
 # Get the extraction prompt from the LLM client
 def get_extraction_prompt():
-    """Get the extraction prompt used by the LLM client."""
-    # Create a temporary LLM client to get the prompt
-    temp_client = LLMClient()
-    # Get the prompt by calling the private method
-    # This is a bit of a hack, but it allows us to reuse the prompt
-    return temp_client._create_extraction_prompt("").strip()
+    """Get the extraction prompt used by the LLM client, with {text} where the note goes."""
+    return LLMClient.EXTRACTION_PROMPT.strip()
 
 # Initialize configuration
 config = Config()
 
+# Apply the per-provider limits to the shared LLM request scheduler
+rate_limiter.scheduler.configure(config.get_rate_limit_config())
+
+# On-demand request profiling, inactive unless configured
+profiler = RequestProfiler(config.get_profiling_config())
+
+@app.before_request
+def start_request_profile():
+    """Start sampling the request if it was picked for profiling."""
+    if not profiler.active:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if profiler.should_profile(route, request.path, request.args.get('profile')):
+        g.profile_sampler = profiler.start()
+
+def profiled_async_to_sync(func):
+    """Run an async view like Flask does, sampling its event loop thread if the request is profiled."""
+    return Flask.async_to_sync(app, bind_to_profile(func))
+
+app.async_to_sync = profiled_async_to_sync
+
+@app.teardown_request
+def save_request_profile(exc):
+    """Write the profile of a sampled request (after streamed bodies have finished)."""
+    sampler = g.pop('profile_sampler', None)
+    if sampler is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        profiler.save(sampler, route, request.method)
+
+# Router over all configured providers, rebuilt when the LLM configuration changes
+llm_router = None
+
+def get_llm_router():
+    """Get the provider router, creating it from the current configuration if needed."""
+    global llm_router
+    if llm_router is None:
+        llm_router = LLMRouter(config.get_llm_config(), config.get_routing_config())
+    return llm_router
+
+# Embedding index for semantic search, created on first use and kept up to
+# date by one background thread (see update_semantic_index)
+semantic_index = None
+semantic_index_lock = threading.Lock()
+semantic_index_updater = None
+semantic_index_outdated = threading.Event()
+
+def semantic_search_enabled():
+    """Check whether semantic search is configured."""
+    return bool(config.get_semantic_search_config().get("enabled"))
+
+def get_semantic_index():
+    """Get the semantic search index, opening it from the current configuration if needed."""
+    global semantic_index
+    with semantic_index_lock:
+        if semantic_index is None:
+            search_config = config.get_semantic_search_config()
+            semantic_index = SemanticIndex(
+                search_config.get("index_dir", "embeddings"),
+                create_embedder(search_config, config.get_llm_config()),
+                dtype=search_config.get("dtype", "float32"),
+                batch_size=search_config.get("batch_size", 32),
+                clusters=search_config.get("clusters", 0),
+                nprobe=search_config.get("nprobe", 8)
+            )
+        return semantic_index
+
+def update_semantic_index():
+    """Have the background thread embed new and changed messages, if semantic search is enabled."""
+    global semantic_index_updater
+    if not semantic_search_enabled():
+        return
+    
+    with semantic_index_lock:
+        if semantic_index_updater is None:
+            semantic_index_updater = threading.Thread(target=run_semantic_index_updates, name="semantic-index", daemon=True)
+            semantic_index_updater.start()
+    # Requests arriving during a sync are collected into the next one
+    semantic_index_outdated.set()
+
+def run_semantic_index_updates():
+    """Sync the semantic index whenever update_semantic_index asks for it."""
+    while True:
+        semantic_index_outdated.wait()
+        semantic_index_outdated.clear()
+        try:
+            get_semantic_index().sync(get_db_connection)
+        except Exception as e:
+            print(f"Error updating the semantic index: {e}")
+
+# Proposed duplicate clusters per (threshold, type), computed in the background
+# (see get_duplicate_entities) and kept for the database revision they were computed at
+duplicate_clusters = {}  # (threshold, type) -> (revision, clusters)
+duplicate_jobs = set()  # (threshold, type) being computed
+duplicate_clusters_lock = threading.Lock()
+
+def find_duplicates_in_background(threshold, entity_type):
+    """Compute the duplicate clusters for a threshold and type in a background thread, unless already running."""
+    key = (threshold, entity_type)
+    with duplicate_clusters_lock:
+        if key in duplicate_jobs:
+            return
+        duplicate_jobs.add(key)
+    
+    def run():
+        try:
+            # Read the revision first, so changes made meanwhile make the result stale
+            revision, _ = get_db_revision()
+            conn = get_db_connection()
+            entities = load_entities(conn, entity_type)
+            conn.close()
+            clusters = DuplicateFinder(threshold).find_clusters(entities)
+            with duplicate_clusters_lock:
+                # Results of older revisions are not served anymore
+                for stale in [k for k, (r, _) in duplicate_clusters.items() if r != revision]:
+                    del duplicate_clusters[stale]
+                duplicate_clusters[key] = (revision, clusters)
+        except Exception as e:
+            print(f"Error finding duplicate entities: {e}")
+        finally:
+            with duplicate_clusters_lock:
+                duplicate_jobs.discard(key)
+    
+    threading.Thread(target=run, name="duplicate-entities", daemon=True).start()
+
+def routing_enabled():
+    """Check whether requests are routed across providers instead of using a single one."""
+    return bool(config.get_routing_config().get("enabled"))
+
 # Initialize LLM client
 def get_llm_client():
     """Get an LLM client based on current configuration."""
+    if routing_enabled():
+        # Fastest healthy provider
+        return get_llm_router().best_client()
+    
     llm_config = config.get_llm_config()
     provider = llm_config.get("provider", "ollama")
     provider_config = llm_config.get(provider, {})
     return LLMClient(provider=provider, config=provider_config)
 
+def get_async_llm_client(provider=None):
+    """
+    Get an async LLM client for the configured (or given) provider.
+    
+    The client is bound to the running event loop; use it with `async with`.
+    """
+    llm_config = config.get_llm_config()
+    provider = provider or llm_config.get("provider", "ollama")
+    provider_config = llm_config.get(provider, {})
+    return AsyncLLMClient(provider=provider, config=provider_config)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records the execution time of each statement."""
+    
+    def execute(self, sql, parameters=()):
+        with SQLITE_QUERY_SECONDS.labels(operation=sql.split(None, 1)[0].upper()).time():
+            return super().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        with SQLITE_QUERY_SECONDS.labels(operation=sql.split(None, 1)[0].upper()).time():
+            return super().executemany(sql, seq_of_parameters)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (and shortcut execute) record statement timings."""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+# Rows of change_log kept for reconnecting event streams and the semantic index
+CHANGE_LOG_RETENTION = 10000
+CHANGE_LOG_PRUNE_EVERY = 1000
+
+# Database file, overridable for benchmarks and load tests
+DB_PATH = os.environ.get('TRANSCRIPTS_DB', 'transcripts.db')
+
 def get_db_connection():
     """Create a connection to the SQLite database."""
-    conn = sqlite3.connect('transcripts.db')
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
+def init_db(db_path=None):
+    """
+    Create the database tables that do not exist yet.
+    
+    Args:
+        db_path: Path of the database file, defaults to DB_PATH
+    """
+    conn = sqlite3.connect(db_path or DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        transcript TEXT NOT NULL
+    )
+    ''')
+    
+    # Create entities table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS entities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        label TEXT NOT NULL,
+        color TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Create note_entities junction table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS note_entities (
+        message_id INTEGER NOT NULL,
+        entity_id INTEGER NOT NULL,
+        PRIMARY KEY (message_id, entity_id),
+        FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE,
+        FOREIGN KEY (entity_id) REFERENCES entities(id) ON DELETE CASCADE
+    )
+    ''')
+    
+    # Change counter for ETags, bumped by triggers on every write
+    # (including the inserts of trans.pyw, which uses its own connections)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS db_revision (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        revision INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO db_revision (id, revision) VALUES (1, 0)")
+    
+    for table in ('messages', 'entities', 'note_entities'):
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_revision
+            AFTER {operation} ON {table}
+            BEGIN
+                UPDATE db_revision SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+            END
+            ''')
+    
+    # Log of changed rows for the live event stream (see change_feed.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        operation TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # row_id is the message id, except for entity updates (entity id)
+    change_triggers = [
+        ('messages', 'INSERT', 'NEW.id'),
+        ('messages', 'UPDATE', 'NEW.id'),
+        ('messages', 'DELETE', 'OLD.id'),
+        ('note_entities', 'INSERT', 'NEW.message_id'),
+        ('note_entities', 'UPDATE', 'NEW.message_id'),
+        ('note_entities', 'DELETE', 'OLD.message_id'),
+        ('entities', 'UPDATE', 'NEW.id'),
+    ]
+    for table, operation, row_id in change_triggers:
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_change_log
+        AFTER {operation} ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, operation, row_id) VALUES ('{table}', '{operation}', {row_id});
+        END
+        ''')
+    
+    # Keep only the newest CHANGE_LOG_RETENTION rows, also when no event stream is open
+    # and for writes from other processes (trans.pyw): every CHANGE_LOG_PRUNE_EVERY-th
+    # change deletes the rows that fell out of the window
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS change_log_prune
+    AFTER INSERT ON change_log
+    WHEN NEW.id % {CHANGE_LOG_PRUNE_EVERY} = 0
+    BEGIN
+        DELETE FROM change_log WHERE id <= NEW.id - {CHANGE_LOG_RETENTION};
+    END
+    ''')
+    # Databases written before the trigger existed
+    cursor.execute(
+        "DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - ?",
+        (CHANGE_LOG_RETENTION,)
+    )
+    
+    # Lets MIN/MAX(timestamp) and date range queries use an index instead of a table scan
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)")
+    # The primary key of note_entities starts with message_id; this one serves lookups by entity
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_entities_entity ON note_entities(entity_id, message_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_entities_type ON entities(type)")
+    
+    # Aggregates for the statistics and the calendar, kept up to date by triggers.
+    # The INSERT OR IGNORE above has opened the transaction, so the backfill of an
+    # existing database and the new triggers take effect together.
+    placeholders = ','.join(['?'] * len(AGGREGATE_TABLES))
+    cursor.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        AGGREGATE_TABLES
+    )
+    needs_backfill = cursor.fetchone()[0] < len(AGGREGATE_TABLES)
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS message_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        message_count INTEGER NOT NULL,
+        word_count INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day TEXT PRIMARY KEY,
+        message_count INTEGER NOT NULL,
+        word_count INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS entity_type_stats (
+        type TEXT PRIMARY KEY,
+        entity_count INTEGER NOT NULL,
+        link_count INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS entity_usage (
+        entity_id INTEGER PRIMARY KEY,
+        message_count INTEGER NOT NULL,
+        last_seen TEXT
+    )
+    ''')
+    # Symmetric: each pair is stored as (a, b) and (b, a), so the primary key finds all partners of an entity
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS entity_cooccurrence (
+        entity_a INTEGER NOT NULL,
+        entity_b INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (entity_a, entity_b)
+    ) WITHOUT ROWID
+    ''')
+    
+    for trigger, body in aggregate_triggers().items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger} {body}")
+    
+    if needs_backfill:
+        rebuild_aggregates(cursor)
+    
+    conn.commit()
+    conn.close()
+
+# Tables maintained by aggregate_triggers(); all of them are rebuilt if one is missing
+AGGREGATE_TABLES = ('message_totals', 'daily_stats', 'entity_type_stats', 'entity_usage', 'entity_cooccurrence')
+
+def word_count_sql(column):
+    """
+    Build an SQL expression that counts the words of a text column.
+    
+    Words are separated by single spaces or line breaks, as in Whisper output.
+    """
+    text = f"trim(replace(replace({column}, char(13), ''), char(10), ' '))"
+    return f"(CASE WHEN {text} = '' THEN 0 ELSE length({text}) - length(replace({text}, ' ', '')) + 1 END)"
+
+def aggregate_triggers():
+    """
+    Get the triggers that maintain the tables in AGGREGATE_TABLES.
+    
+    Returns:
+        A dictionary mapping trigger names to their definitions (after the name)
+    """
+    def add_message(row):
+        day, words = f"substr({row}.timestamp, 1, 10)", word_count_sql(f"{row}.transcript")
+        return f'''
+            UPDATE message_totals SET message_count = message_count + 1, word_count = word_count + {words} WHERE id = 1;
+            INSERT INTO daily_stats (day, message_count, word_count) VALUES ({day}, 1, {words})
+            ON CONFLICT(day) DO UPDATE SET message_count = message_count + 1, word_count = word_count + excluded.word_count;
+        '''
+    
+    def remove_message(row):
+        day, words = f"substr({row}.timestamp, 1, 10)", word_count_sql(f"{row}.transcript")
+        return f'''
+            UPDATE message_totals SET message_count = message_count - 1, word_count = word_count - {words} WHERE id = 1;
+            UPDATE daily_stats SET message_count = message_count - 1, word_count = word_count - {words} WHERE day = {day};
+            DELETE FROM daily_stats WHERE day = {day} AND message_count <= 0;
+        '''
+    
+    # link_count is the number of note_entities rows whose entity has the type
+    def move_links(entity_id, sign):
+        return f'''
+            UPDATE entity_type_stats SET link_count = link_count {sign} 1
+            WHERE type = (SELECT type FROM entities WHERE id = {entity_id});
+        '''
+    
+    def links_of(entity_id):
+        return f"(SELECT COUNT(*) FROM note_entities WHERE entity_id = {entity_id})"
+    
+    # entity_usage counts the links of an entity and keeps the newest linked timestamp;
+    # last_seen is only searched again when the removed link was the newest one
+    def last_seen_of(entity_id):
+        return f'''(SELECT MAX(m.timestamp) FROM note_entities ne JOIN messages m ON m.id = ne.message_id
+                   WHERE ne.entity_id = {entity_id})'''
+    
+    def add_usage(row):
+        return f'''
+            INSERT INTO entity_usage (entity_id, message_count, last_seen)
+            VALUES ({row}.entity_id, 1, (SELECT timestamp FROM messages WHERE id = {row}.message_id))
+            ON CONFLICT(entity_id) DO UPDATE SET message_count = message_count + 1,
+                last_seen = NULLIF(max(COALESCE(last_seen, ''), COALESCE(excluded.last_seen, '')), '');
+        '''
+    
+    def remove_usage(row):
+        return f'''
+            UPDATE entity_usage SET message_count = message_count - 1 WHERE entity_id = {row}.entity_id;
+            UPDATE entity_usage SET last_seen = {last_seen_of(f"{row}.entity_id")}
+            WHERE entity_id = {row}.entity_id AND last_seen = (SELECT timestamp FROM messages WHERE id = {row}.message_id);
+        '''
+    
+    def refresh_last_seen(row):
+        return f'''
+            UPDATE entity_usage SET last_seen = {last_seen_of("entity_usage.entity_id")}
+            WHERE entity_id IN (SELECT entity_id FROM note_entities WHERE message_id = {row}.id);
+        '''
+    
+    # entity_cooccurrence counts the messages that link both entities of a pair.
+    # partners() selects the other entities of the link's message; on updates,
+    # the new row is already in place and must not count as a partner of the old one.
+    def partners(row, extra=''):
+        return f"SELECT entity_id FROM note_entities WHERE message_id = {row}.message_id AND entity_id != {row}.entity_id{extra}"
+    
+    def add_pairs(row):
+        return f'''
+            INSERT INTO entity_cooccurrence (entity_a, entity_b, count)
+            SELECT {row}.entity_id, entity_id, 1 FROM note_entities
+            WHERE message_id = {row}.message_id AND entity_id != {row}.entity_id
+            UNION ALL
+            SELECT entity_id, {row}.entity_id, 1 FROM note_entities
+            WHERE message_id = {row}.message_id AND entity_id != {row}.entity_id
+            ON CONFLICT(entity_a, entity_b) DO UPDATE SET count = count + 1;
+        '''
+    
+    def remove_pairs(row, extra=''):
+        return f'''
+            UPDATE entity_cooccurrence SET count = count - 1
+            WHERE entity_a = {row}.entity_id AND entity_b IN ({partners(row, extra)});
+            UPDATE entity_cooccurrence SET count = count - 1
+            WHERE entity_a IN ({partners(row, extra)}) AND entity_b = {row}.entity_id;
+            DELETE FROM entity_cooccurrence WHERE entity_a = {row}.entity_id AND count <= 0;
+            DELETE FROM entity_cooccurrence WHERE entity_a IN ({partners(row, extra)}) AND entity_b = {row}.entity_id AND count <= 0;
+        '''
+    
+    def add_entity(row):
+        return f'''
+            INSERT INTO entity_type_stats (type, entity_count, link_count) VALUES ({row}.type, 1, {links_of(f"{row}.id")})
+            ON CONFLICT(type) DO UPDATE SET entity_count = entity_count + 1, link_count = link_count + excluded.link_count;
+        '''
+    
+    def remove_entity(row):
+        return f'''
+            UPDATE entity_type_stats SET entity_count = entity_count - 1, link_count = link_count - {links_of(f"{row}.id")}
+            WHERE type = {row}.type;
+            DELETE FROM entity_type_stats WHERE type = {row}.type AND entity_count <= 0;
+        '''
+    
+    return {
+        'messages_insert_stats': f"AFTER INSERT ON messages BEGIN {add_message('NEW')} END",
+        'messages_update_stats': f"AFTER UPDATE OF timestamp, transcript ON messages BEGIN {remove_message('OLD')} {add_message('NEW')} END",
+        'messages_delete_stats': f"AFTER DELETE ON messages BEGIN {remove_message('OLD')} END",
+        'entities_insert_stats': f"AFTER INSERT ON entities BEGIN {add_entity('NEW')} END",
+        'entities_update_stats': f"AFTER UPDATE OF type ON entities BEGIN {remove_entity('OLD')} {add_entity('NEW')} END",
+        'entities_delete_stats': f"AFTER DELETE ON entities BEGIN {remove_entity('OLD')} END",
+        'note_entities_insert_stats': f"AFTER INSERT ON note_entities BEGIN {move_links('NEW.entity_id', '+')} END",
+        'note_entities_update_stats': f"AFTER UPDATE OF entity_id ON note_entities BEGIN {move_links('OLD.entity_id', '-')} {move_links('NEW.entity_id', '+')} END",
+        'note_entities_delete_stats': f"AFTER DELETE ON note_entities BEGIN {move_links('OLD.entity_id', '-')} END",
+        'messages_timestamp_usage': f"AFTER UPDATE OF timestamp ON messages BEGIN {refresh_last_seen('NEW')} END",
+        'messages_delete_usage': f"AFTER DELETE ON messages BEGIN {refresh_last_seen('OLD')} END",
+        'entities_delete_usage': "AFTER DELETE ON entities BEGIN DELETE FROM entity_usage WHERE entity_id = OLD.id; END",
+        'note_entities_insert_usage': f"AFTER INSERT ON note_entities BEGIN {add_usage('NEW')} END",
+        'note_entities_update_usage': f"AFTER UPDATE OF message_id, entity_id ON note_entities BEGIN {remove_usage('OLD')} {add_usage('NEW')} END",
+        'note_entities_delete_usage': f"AFTER DELETE ON note_entities BEGIN {remove_usage('OLD')} END",
+        'entities_delete_cooccurrence': '''AFTER DELETE ON entities BEGIN
+            DELETE FROM entity_cooccurrence
+            WHERE entity_a IN (SELECT entity_b FROM entity_cooccurrence WHERE entity_a = OLD.id) AND entity_b = OLD.id;
+            DELETE FROM entity_cooccurrence WHERE entity_a = OLD.id;
+        END''',
+        'note_entities_insert_cooccurrence': f"AFTER INSERT ON note_entities BEGIN {add_pairs('NEW')} END",
+        'note_entities_update_cooccurrence': f'''AFTER UPDATE OF message_id, entity_id ON note_entities BEGIN
+            {remove_pairs('OLD', " AND NOT (message_id = NEW.message_id AND entity_id = NEW.entity_id)")} {add_pairs('NEW')}
+        END''',
+        'note_entities_delete_cooccurrence': f"AFTER DELETE ON note_entities BEGIN {remove_pairs('OLD')} END",
+    }
+
+def rebuild_aggregates(cursor):
+    """
+    Recompute the aggregate tables from messages, entities and note_entities.
+    
+    Used when the tables are added to an existing database, and after bulk
+    loads that bypass the triggers. The caller commits.
+    
+    Args:
+        cursor: A cursor of an open connection
+    """
+    words = word_count_sql('transcript')
+    cursor.execute("DELETE FROM message_totals")
+    cursor.execute("DELETE FROM daily_stats")
+    cursor.execute("DELETE FROM entity_type_stats")
+    cursor.execute("DELETE FROM entity_usage")
+    cursor.execute("DELETE FROM entity_cooccurrence")
+    
+    cursor.execute(f"""
+        INSERT INTO message_totals (id, message_count, word_count)
+        SELECT 1, COUNT(*), COALESCE(SUM({words}), 0) FROM messages
+    """)
+    cursor.execute(f"""
+        INSERT INTO daily_stats (day, message_count, word_count)
+        SELECT substr(timestamp, 1, 10), COUNT(*), SUM({words}) FROM messages GROUP BY 1
+    """)
+    cursor.execute("""
+        INSERT INTO entity_type_stats (type, entity_count, link_count)
+        SELECT e.type, COUNT(*), SUM((SELECT COUNT(*) FROM note_entities ne WHERE ne.entity_id = e.id))
+        FROM entities e GROUP BY e.type
+    """)
+    cursor.execute("""
+        INSERT INTO entity_usage (entity_id, message_count, last_seen)
+        SELECT ne.entity_id, COUNT(*), MAX(m.timestamp)
+        FROM note_entities ne
+        JOIN entities e ON e.id = ne.entity_id
+        LEFT JOIN messages m ON m.id = ne.message_id
+        GROUP BY ne.entity_id
+    """)
+    cursor.execute("""
+        INSERT INTO entity_cooccurrence (entity_a, entity_b, count)
+        SELECT a.entity_id, b.entity_id, COUNT(*)
+        FROM note_entities a
+        JOIN note_entities b ON b.message_id = a.message_id AND b.entity_id != a.entity_id
+        JOIN entities ea ON ea.id = a.entity_id
+        JOIN entities eb ON eb.id = b.entity_id
+        GROUP BY a.entity_id, b.entity_id
+    """)
+
+def get_db_revision():
+    """
+    Get the database change counter.
+    
+    Returns:
+        A tuple of (revision, time of the last change as an aware UTC datetime)
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT revision, updated_at FROM db_revision WHERE id = 1").fetchone()
+    conn.close()
+    updated_at = datetime.strptime(row['updated_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return row['revision'], updated_at
+
+# Wakes up the live event streams when the change log grows
+change_feed = ChangeFeed(get_db_connection)
+
+def conditional(view):
+    """
+    Support conditional GET on a read endpoint.
+    
+    The ETag and Last-Modified headers come from the database change counter,
+    so an unchanged database is answered with 304 Not Modified before the
+    view runs. Responses must be revalidated on every use (no-cache).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        revision, updated_at = get_db_revision()
+        etag = f"r{revision}"
+        route = request.url_rule.rule
+        
+        # If-None-Match takes precedence; If-Modified-Since only has second resolution
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = request.if_modified_since is not None and updated_at <= request.if_modified_since
+        
+        if not_modified:
+            HTTP_CACHE_RESPONSES.labels(route=route, result='hit').inc()
+            response = Response(status=304)
+        else:
+            HTTP_CACHE_RESPONSES.labels(route=route, result='miss').inc()
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        response.set_etag(etag, weak=True)
+        response.last_modified = updated_at
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON and text bodies with brotli or gzip, as accepted by the client."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype == 'application/json' or response.mimetype.startswith('text/'))):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=4))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @app.route('/')
 def index():
     """Render the main page."""
@@ -48,39 +721,128 @@ def test_page():
     extraction_prompt = get_extraction_prompt()
     return render_template('test.html', llm_config=llm_config, extraction_prompt=extraction_prompt)
 
-@app.route('/api/messages')
-def get_messages():
-    """API endpoint to get messages, optionally filtered by date."""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+def format_message(message):
+    """
+    Add the display time to a message dict.
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Returns:
+        The date of the message as YYYY-MM-DD, for grouping
+    """
+    # Parse the ISO timestamp and format the date part as YYYY-MM-DD
+    timestamp = datetime.fromisoformat(message['timestamp'])
+    
+    # Add formatted time for display
+    message['formatted_time'] = timestamp.strftime('%H:%M:%S')
+    return timestamp.strftime('%Y-%m-%d')
+
+def query_messages(cursor, start_date=None, end_date=None, entity_id=None, entity_type=None,
+                   before_id=None, limit=None):
+    """
+    Get messages, newest first, with optional filters and keyset pagination.
+    
+    Args:
+        cursor: A database cursor
+        start_date, end_date: Only messages with a timestamp in this range (both required)
+        entity_id: Only messages linked to this entity
+        entity_type: Only messages linked to an entity of this type
+        before_id: Only messages after this one in the order (the last id of the previous page)
+        limit: Maximum number of messages
     
-    query = "SELECT id, timestamp, transcript FROM messages"
+    Returns:
+        A list of message dicts with id, timestamp and transcript
+    """
+    query = "SELECT m.id, m.timestamp, m.transcript FROM messages m"
+    conditions = []
     params = []
     
-    # Add date filtering if provided
     if start_date and end_date:
-        query += " WHERE timestamp BETWEEN ? AND ?"
+        conditions.append("m.timestamp BETWEEN ? AND ?")
         params.extend([start_date, end_date])
     
+    # Entity lookups use idx_note_entities_entity; type filters probe the primary key
+    # of note_entities for each message in timestamp order and stop at the limit
+    if entity_id is not None:
+        conditions.append("m.id IN (SELECT message_id FROM note_entities WHERE entity_id = ?)")
+        params.append(entity_id)
+    
+    if entity_type:
+        conditions.append("""EXISTS (
+            SELECT 1 FROM note_entities ne JOIN entities e ON e.id = ne.entity_id
+            WHERE ne.message_id = m.id AND e.type = ?
+        )""")
+        params.append(entity_type)
+    
+    # Unlike OFFSET, continuing after the last seen row does not re-read earlier pages
+    if before_id is not None:
+        conditions.append("(m.timestamp, m.id) < (SELECT timestamp, id FROM messages WHERE id = ?)")
+        params.append(before_id)
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
     # Order by timestamp descending (newest first)
-    query += " ORDER BY timestamp DESC"
+    query += " ORDER BY m.timestamp DESC, m.id DESC"
+    
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
     
     cursor.execute(query, params)
-    messages = [dict(row) for row in cursor.fetchall()]
+    return [dict(row) for row in cursor.fetchall()]
+
+def page_size(default=None):
+    """
+    Read the limit query parameter, capped at MAX_PAGE_SIZE.
+    
+    Returns:
+        The page size, or default if the parameter is missing or invalid
+    """
+    limit = request.args.get('limit', type=int)
+    if limit is None or limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+def with_next_page_link(response, messages, limit):
+    """
+    Announce the next page of a message list in a Link header.
+    
+    The link repeats the request with before_id set to the last id of this
+    page; a page shorter than limit is the last one and gets no link.
+    """
+    if limit is not None and len(messages) == limit:
+        args = {**request.view_args, **request.args.to_dict(), 'before_id': messages[-1]['id']}
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
+@app.route('/api/messages')
+@conditional
+def get_messages():
+    """
+    API endpoint to get messages, grouped by date.
+    
+    Optional filters: start_date and end_date, entity (an entity id) and type
+    (an entity type). With limit, one page is returned and the next page is
+    announced in a Link header (before_id=<last id of this page>).
+    """
+    limit = page_size()
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    messages = query_messages(
+        cursor,
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        entity_id=request.args.get('entity', type=int),
+        entity_type=request.args.get('type'),
+        before_id=request.args.get('before_id', type=int),
+        limit=limit
+    )
     conn.close()
     
     # Group messages by date for the calendar view
     grouped_messages = {}
     for message in messages:
-        # Parse the ISO timestamp and format the date part as YYYY-MM-DD
-        timestamp = datetime.fromisoformat(message['timestamp'])
-        date_str = timestamp.strftime('%Y-%m-%d')
-        
-        # Add formatted time for display
-        message['formatted_time'] = timestamp.strftime('%H:%M:%S')
+        date_str = format_message(message)
         
         if date_str not in grouped_messages:
             grouped_messages[date_str] = []
@@ -96,32 +858,120 @@ def get_messages():
         for date, messages in sorted(grouped_messages.items(), reverse=True)
     ]
     
-    return jsonify(result)
+    return with_next_page_link(jsonify(result), messages, limit)
+
+@app.route('/api/search/semantic')
+def semantic_search():
+    """
+    API endpoint to find messages by meaning (see semantic_index.py).
+    
+    Parameters: q (the search text) and optional limit (default 10).
+    
+    Searches the index as it is and has memos recorded since the last
+    update (e.g. by trans.pyw) embedded in the background. Not conditional:
+    the results change when the background update finishes, without a
+    change to the database.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search text (q)'}), 400
+    
+    if not semantic_search_enabled():
+        return jsonify({'error': 'Semantic search is disabled (semantic_search.enabled in config.json)'}), 503
+    
+    limit = page_size(10)
+    try:
+        results = get_semantic_index().search(query, limit)
+    except Exception as e:
+        print(f"Error in semantic search: {e}")
+        return jsonify({'error': f'Semantic search failed: {str(e)}'}), 503
+    update_semantic_index()
+    
+    if not results:
+        return jsonify([])
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    placeholders = ','.join(['?'] * len(results))
+    cursor.execute(
+        f"SELECT id, timestamp, transcript FROM messages WHERE id IN ({placeholders})",
+        [message_id for message_id, _ in results]
+    )
+    found = {row['id']: dict(row) for row in cursor.fetchall()}
+    conn.close()
+    
+    messages = []
+    for message_id, score in results:
+        message = found.get(message_id)
+        if message:
+            message['date'] = format_message(message)
+            message['score'] = round(score, 4)
+            messages.append(message)
+    
+    return jsonify(messages)
 
 @app.route('/api/stats')
+@conditional
 def get_stats():
     """API endpoint to get basic statistics about the messages."""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get total count
-    cursor.execute("SELECT COUNT(*) as count FROM messages")
-    total_count = cursor.fetchone()['count']
+    # Totals are maintained by triggers (see init_db)
+    cursor.execute("SELECT message_count, word_count FROM message_totals WHERE id = 1")
+    totals = cursor.fetchone()
     
-    # Get date range
-    cursor.execute("SELECT MIN(timestamp) as first, MAX(timestamp) as last FROM messages")
+    # Get date range; as separate subqueries, each is a single lookup in the timestamp index
+    cursor.execute("SELECT (SELECT MIN(timestamp) FROM messages) as first, (SELECT MAX(timestamp) FROM messages) as last")
     date_range = cursor.fetchone()
     
+    cursor.execute("SELECT COUNT(*) as count FROM daily_stats")
+    active_days = cursor.fetchone()['count']
+    
+    cursor.execute("SELECT type, entity_count, link_count FROM entity_type_stats ORDER BY type")
+    entity_types = {
+        row['type']: {'entities': row['entity_count'], 'links': row['link_count']}
+        for row in cursor.fetchall()
+    }
+    
     conn.close()
     
     stats = {
-        'total_messages': total_count,
+        'total_messages': totals['message_count'],
+        'total_words': totals['word_count'],
+        'active_days': active_days,
         'first_message': date_range['first'] if date_range['first'] else None,
-        'last_message': date_range['last'] if date_range['last'] else None
+        'last_message': date_range['last'] if date_range['last'] else None,
+        'entity_types': entity_types
     }
     
     return jsonify(stats)
 
+@app.route('/api/calendar')
+@conditional
+def get_calendar():
+    """API endpoint to get the number of messages and words per day of a year."""
+    year = request.args.get('year', default=datetime.now().year, type=int)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT day, message_count, word_count FROM daily_stats WHERE day BETWEEN ? AND ? ORDER BY day",
+        (f"{year:04d}-01-01", f"{year:04d}-12-31")
+    )
+    days = [
+        {'date': row['day'], 'messages': row['message_count'], 'words': row['word_count']}
+        for row in cursor.fetchall()
+    ]
+    conn.close()
+    
+    return jsonify({
+        'year': year,
+        'total_messages': sum(day['messages'] for day in days),
+        'total_words': sum(day['words'] for day in days),
+        'days': days
+    })
+
 def extract_and_save_entities(message_id, transcript):
     """
     Extract entities from a message transcript and save them to the database.
@@ -136,58 +986,72 @@ def extract_and_save_entities(message_id, transcript):
         - error_message: None if successful, or an error message if extraction failed
     """
     try:
-        # Get LLM client
-        llm_client = get_llm_client()
-        
-        # Check if LLM is connected
-        if not llm_client.is_connected and not llm_client.check_connectivity():
-            error_msg = f"LLM service ({llm_client.provider}) is not reachable. Please check your configuration and ensure the service is running."
-            print(error_msg)
-            return [], error_msg
-        
-        # Extract entities
-        entities = llm_client.extract_entities(transcript)
+        if routing_enabled():
+            # Fastest healthy provider, with hedging and failover
+            try:
+                entities, provider = get_llm_router().extract_entities(transcript)
+            except LLMResponseError as e:
+                error_msg = f"Error extracting entities: {e}"
+                print(error_msg)
+                return [], error_msg
+        else:
+            # Get LLM client
+            llm_client = get_llm_client()
+            
+            # Check if LLM is connected
+            if not llm_client.is_connected and not llm_client.check_connectivity():
+                error_msg = f"LLM service ({llm_client.provider}) is not reachable. Please check your configuration and ensure the service is running."
+                print(error_msg)
+                return [], error_msg
+            
+            # Extract entities
+            entities = llm_client.extract_entities(transcript)
         
         if not entities:
             print(f"No entities extracted for message {message_id}")
             return [], None  # No error, just no entities found
         
-        # Save entities to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # First, clear existing entity associations for this message
-        cursor.execute("DELETE FROM note_entities WHERE message_id = ?", (message_id,))
+        save_message_entities(message_id, entities)
         
-        for entity in entities:
-            # Check if this entity already exists (by type and label)
-            cursor.execute(
-                "SELECT id, color FROM entities WHERE type = ? AND label = ?",
-                (entity['type'], entity['label'])
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Use existing entity
-                entity_id = existing['id']
-                # Keep the existing color
-                entity['color'] = existing['color']
-            else:
-                # Insert new entity
-                cursor.execute(
-                    "INSERT INTO entities (type, label, color) VALUES (?, ?, ?)",
-                    (entity['type'], entity['label'], entity['color'])
-                )
-                entity_id = cursor.lastrowid
+        return entities, None  # Success, no error
+    except Exception as e:
+        error_msg = f"Error extracting entities: {e}"
+        print(error_msg)
+        return [], error_msg
+
+async def async_extract_and_save_entities(message_id, transcript):
+    """
+    Async variant of extract_and_save_entities.
+    
+    The LLM call does not hold a thread while waiting. With provider routing
+    enabled, the (thread-based) router is used in a worker thread instead.
+    
+    Returns:
+        A tuple of (entities, error_message), as extract_and_save_entities
+    """
+    if routing_enabled():
+        return await asyncio.to_thread(extract_and_save_entities, message_id, transcript)
+    
+    try:
+        async with get_async_llm_client() as llm_client:
+            if not llm_client.is_connected and not await llm_client.check_connectivity():
+                error_msg = f"LLM service ({llm_client.provider}) is not reachable. Please check your configuration and ensure the service is running."
+                print(error_msg)
+                return [], error_msg
             
-            # Create association between message and entity
-            cursor.execute(
-                "INSERT INTO note_entities (message_id, entity_id) VALUES (?, ?)",
-                (message_id, entity_id)
-            )
+            try:
+                entities = await llm_client.extract_entities(transcript, raise_errors=True)
+            except LLMResponseError as e:
+                # The service answered, but nothing usable could be parsed
+                error_msg = f"Error extracting entities: {e}"
+                print(error_msg)
+                return [], error_msg
         
-        conn.commit()
-        conn.close()
+        if not entities:
+            print(f"No entities extracted for message {message_id}")
+            return [], None  # No error, just no entities found
+        
+        save_message_entities(message_id, entities)
         
         return entities, None  # Success, no error
     except Exception as e:
@@ -195,6 +1059,203 @@ def extract_and_save_entities(message_id, transcript):
         print(error_msg)
         return [], error_msg
 
+def save_message_entities(message_id, entities):
+    """
+    Replace the entity associations of a message with the given entities.
+    
+    Entities are matched to existing rows by type and label; new ones are
+    inserted. Each entity dict is updated in place with its database id and
+    the stored color.
+    
+    Args:
+        message_id: The ID of the message
+        entities: A list of entity dicts with 'type', 'label', and 'color' keys
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # First, clear existing entity associations for this message
+    cursor.execute("DELETE FROM note_entities WHERE message_id = ?", (message_id,))
+    
+    for entity in entities:
+        # Check if this entity already exists (by type and label)
+        cursor.execute(
+            "SELECT id, color FROM entities WHERE type = ? AND label = ?",
+            (entity['type'], entity['label'])
+        )
+        existing = cursor.fetchone()
+        
+        if existing:
+            # Use existing entity
+            entity_id = existing['id']
+            # Keep the existing color
+            entity['color'] = existing['color']
+        else:
+            # Insert new entity
+            cursor.execute(
+                "INSERT INTO entities (type, label, color) VALUES (?, ?, ?)",
+                (entity['type'], entity['label'], entity['color'])
+            )
+            entity_id = cursor.lastrowid
+        
+        entity['id'] = entity_id
+        
+        # Create association between message and entity (the LLM may repeat an entity)
+        cursor.execute(
+            "INSERT OR IGNORE INTO note_entities (message_id, entity_id) VALUES (?, ?)",
+            (message_id, entity_id)
+        )
+    
+    conn.commit()
+    conn.close()
+
+def sse_event(event, data, event_id=None):
+    """Format a Server-Sent Event with a JSON payload (and an id clients resume from)."""
+    if event_id is not None:
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Wrap a generator of formatted events in a streaming response."""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so events arrive immediately
+        }
+    )
+
+# Above this many affected messages in one batch, clients reload instead of patching
+MAX_LIVE_EVENTS = 200
+
+def build_change_events(changes):
+    """
+    Turn a batch of change log rows into live events.
+    
+    Changes are coalesced per message, so an extraction that rewrites all
+    links of a message produces a single entities-updated event.
+    
+    Args:
+        changes: Change log rows, oldest first
+    
+    Returns:
+        A list of (event name, payload) tuples
+    """
+    created, updated, deleted, entity_messages, changed_entities = [], [], [], [], []
+    for change in changes:
+        row_id = change['row_id']
+        if change['table_name'] == 'messages':
+            if change['operation'] == 'INSERT':
+                created.append(row_id)
+            elif change['operation'] == 'UPDATE':
+                updated.append(row_id)
+            else:
+                deleted.append(row_id)
+        elif change['table_name'] == 'note_entities':
+            entity_messages.append(row_id)
+        else:
+            changed_entities.append(row_id)
+    
+    # Keep first-seen order, drop duplicates and messages that were deleted again
+    deleted = list(dict.fromkeys(deleted))
+    created = [i for i in dict.fromkeys(created) if i not in deleted]
+    updated = [i for i in dict.fromkeys(updated) if i not in deleted and i not in created]
+    entity_messages = [i for i in dict.fromkeys(entity_messages) if i not in deleted]
+    changed_entities = list(dict.fromkeys(changed_entities))
+    
+    if len(created) + len(updated) + len(entity_messages) + len(changed_entities) > MAX_LIVE_EVENTS:
+        return [('reload', {})]
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    messages = {}
+    message_ids = created + updated
+    if message_ids:
+        placeholders = ','.join(['?'] * len(message_ids))
+        cursor.execute(f"SELECT id, timestamp, transcript FROM messages WHERE id IN ({placeholders})", message_ids)
+        for row in cursor.fetchall():
+            message = dict(row)
+            message['date'] = format_message(message)
+            messages[message['id']] = message
+    
+    message_entities = {message_id: [] for message_id in entity_messages}
+    if entity_messages:
+        placeholders = ','.join(['?'] * len(entity_messages))
+        cursor.execute(f"""
+            SELECT ne.message_id, e.id, e.type, e.label, e.color
+            FROM note_entities ne
+            JOIN entities e ON e.id = ne.entity_id
+            WHERE ne.message_id IN ({placeholders})
+            ORDER BY e.type, e.label
+        """, entity_messages)
+        for row in cursor.fetchall():
+            entity = dict(row)
+            message_entities[entity.pop('message_id')].append(entity)
+    
+    entities = []
+    if changed_entities:
+        placeholders = ','.join(['?'] * len(changed_entities))
+        cursor.execute(f"SELECT id, type, label, color FROM entities WHERE id IN ({placeholders})", changed_entities)
+        entities = [dict(row) for row in cursor.fetchall()]
+    
+    conn.close()
+    
+    events = []
+    events.extend(('message-created', messages[i]) for i in created if i in messages)
+    events.extend(('message-updated', messages[i]) for i in updated if i in messages)
+    events.extend(('message-deleted', {'id': i}) for i in deleted)
+    events.extend(('entities-updated', {'message_id': i, 'entities': message_entities[i]}) for i in entity_messages)
+    events.extend(('entity-updated', entity) for entity in entities)
+    return events
+
+@app.route('/api/events')
+def events_stream():
+    """
+    Server-Sent Events stream of database changes.
+    
+    Emits message-created, message-updated, message-deleted, entities-updated
+    (the entities of one message) and entity-updated (a renamed or recolored
+    entity), or reload when too much changed at once. This covers changes
+    from other processes such as trans.pyw. Clients resume after the
+    Last-Event-ID they last received.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    if last_event_id and last_event_id.isdigit():
+        position = int(last_event_id)
+        # Changes since then were already pruned from the log
+        missed_changes = position < change_feed.oldest_id() - 1
+    else:
+        position = change_feed.latest_id()
+        missed_changes = False
+    
+    def events():
+        nonlocal position
+        # Reconnect delay for EventSource, in milliseconds
+        yield "retry: 3000\n\n"
+        if missed_changes:
+            yield sse_event('reload', {}, position)
+        
+        while True:
+            latest_id = change_feed.wait(position, timeout=15)
+            if latest_id <= position:
+                # Comment line, keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            
+            changes = change_feed.changes_since(position)
+            if not changes:
+                position = latest_id
+                continue
+            position = changes[-1]['id']
+            
+            for event, data in build_change_events(changes):
+                yield sse_event(event, data, position)
+    
+    return sse_response(events())
+
 @app.route('/api/messages', methods=['POST'])
 def create_message():
     """API endpoint to create a new message."""
@@ -217,6 +1278,8 @@ def create_message():
     conn.commit()
     conn.close()
     
+    update_semantic_index()
+    
     # Extract and save entities
     entities, error_msg = extract_and_save_entities(message_id, data['transcript'])
     
@@ -273,6 +1336,9 @@ def update_message(message_id):
     conn.commit()
     conn.close()
     
+    if transcript_updated:
+        update_semantic_index()
+    
     # If transcript was updated, re-extract entities
     entities = []
     error_msg = None
@@ -290,47 +1356,226 @@ def update_message(message_id):
     return jsonify(response)
 
 @app.route('/api/messages/<int:message_id>/entities')
+@conditional
 def get_message_entities(message_id):
     """API endpoint to get entities for a specific message."""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Check if the message exists
-    cursor.execute("SELECT id FROM messages WHERE id = ?", (message_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({'error': 'Message not found'}), 404
-    
-    # Get entities for this message
+    # Check if the message exists
+    cursor.execute("SELECT id FROM messages WHERE id = ?", (message_id,))
+    if not cursor.fetchone():
+        conn.close()
+        return jsonify({'error': 'Message not found'}), 404
+    
+    # Get entities for this message
+    cursor.execute("""
+        SELECT e.id, e.type, e.label, e.color
+        FROM entities e
+        JOIN note_entities ne ON e.id = ne.entity_id
+        WHERE ne.message_id = ?
+        ORDER BY e.type, e.label
+    """, (message_id,))
+    
+    entities = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    return jsonify(entities)
+
+@app.route('/api/messages/<int:message_id>/related')
+@conditional
+def get_related_messages(message_id):
+    """
+    API endpoint to get the messages that share the most weighted entities with a message.
+    
+    Each shared entity counts with its inverse document frequency, so a rare
+    project weighs more than a date like "Freitag". Optional parameter: limit
+    (default 10).
+    """
+    limit = page_size(10)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT id FROM messages WHERE id = ?", (message_id,))
+    if not cursor.fetchone():
+        conn.close()
+        return jsonify({'error': 'Message not found'}), 404
+    
+    cursor.execute("SELECT message_count FROM message_totals WHERE id = 1")
+    total_messages = max(cursor.fetchone()['message_count'], 1)
+    
+    cursor.execute("""
+        SELECT ne.entity_id, COALESCE(u.message_count, 0) AS message_count
+        FROM note_entities ne
+        LEFT JOIN entity_usage u ON u.entity_id = ne.entity_id
+        WHERE ne.message_id = ?
+    """, (message_id,))
+    entities = [dict(row) for row in cursor.fetchall() if row['message_count'] > 1]
+    if not entities:
+        conn.close()
+        return jsonify([])
+    
+    weights = {
+        entity['entity_id']: math.log(total_messages / entity['message_count']) if entity['message_count'] < total_messages else 0.0
+        for entity in entities
+    }
+    
+    # Candidates come from the rarer entities only, so that a very common entity does
+    # not make the query read a large part of note_entities; shared common entities
+    # still add their (small) weight to the score
+    seeds = [entity['entity_id'] for entity in entities if entity['message_count'] <= RELATED_POSTING_LIMIT]
+    if not seeds:
+        seeds = [min(entities, key=lambda entity: entity['message_count'])['entity_id']]
+    
+    weight_rows = ' UNION ALL '.join(['SELECT ? AS entity_id, ? AS weight'] * len(weights))
+    seed_placeholders = ','.join(['?'] * len(seeds))
+    cursor.execute(f"""
+        WITH weights AS ({weight_rows}),
+        candidates AS (
+            SELECT message_id FROM note_entities
+            WHERE entity_id IN ({seed_placeholders}) AND message_id != ?
+            ORDER BY message_id DESC
+            LIMIT ?
+        )
+        SELECT m.id, m.timestamp, m.transcript, SUM(w.weight) AS score, COUNT(*) AS shared_entities
+        FROM (SELECT DISTINCT message_id FROM candidates) c
+        JOIN note_entities ne ON ne.message_id = c.message_id
+        JOIN weights w ON w.entity_id = ne.entity_id
+        JOIN messages m ON m.id = c.message_id
+        GROUP BY m.id
+        ORDER BY score DESC, m.timestamp DESC
+        LIMIT ?
+    """, [value for item in weights.items() for value in item] + seeds + [message_id, RELATED_POSTING_LIMIT * 4, limit])
+    
+    messages = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    for message in messages:
+        message['date'] = format_message(message)
+        message['score'] = round(message['score'], 3)
+    
+    return jsonify(messages)
+
+@app.route('/api/entities')
+@conditional
+def get_all_entities():
+    """API endpoint to get all entities with the number of linked messages and the newest one's timestamp."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # entity_usage is maintained by triggers (see aggregate_triggers)
     cursor.execute("""
-        SELECT e.id, e.type, e.label, e.color
+        SELECT e.id, e.type, e.label, e.color,
+               COALESCE(u.message_count, 0) AS message_count, u.last_seen
         FROM entities e
-        JOIN note_entities ne ON e.id = ne.entity_id
-        WHERE ne.message_id = ?
+        LEFT JOIN entity_usage u ON u.entity_id = e.id
         ORDER BY e.type, e.label
-    """, (message_id,))
+    """)
     
     entities = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
     return jsonify(entities)
 
-@app.route('/api/entities')
-def get_all_entities():
-    """API endpoint to get all entities."""
+@app.route('/api/entities/<int:entity_id>/messages')
+@conditional
+def get_entity_messages(entity_id):
+    """
+    API endpoint to get the messages that mention an entity, newest first.
+    
+    Paginated with limit (default DEFAULT_PAGE_SIZE); the next page is
+    announced in a Link header (before_id=<last id of this page>).
+    """
+    limit = page_size(DEFAULT_PAGE_SIZE)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
-        SELECT id, type, label, color
-        FROM entities
-        ORDER BY type, label
-    """)
+        SELECT e.id, e.type, e.label, e.color,
+               COALESCE(u.message_count, 0) AS message_count, u.last_seen
+        FROM entities e
+        LEFT JOIN entity_usage u ON u.entity_id = e.id
+        WHERE e.id = ?
+    """, (entity_id,))
+    entity = cursor.fetchone()
+    if not entity:
+        conn.close()
+        return jsonify({'error': 'Entity not found'}), 404
     
-    entities = [dict(row) for row in cursor.fetchall()]
+    messages = query_messages(
+        cursor,
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        entity_id=entity_id,
+        before_id=request.args.get('before_id', type=int),
+        limit=limit
+    )
     conn.close()
     
-    return jsonify(entities)
+    for message in messages:
+        message['date'] = format_message(message)
+    
+    return with_next_page_link(jsonify({
+        'entity': dict(entity),
+        'messages': messages
+    }), messages, limit)
+
+@app.route('/api/entities/<int:entity_id>/related')
+@conditional
+def get_related_entities(entity_id):
+    """
+    API endpoint to get the entities that appear in the same messages as an entity.
+    
+    Optional parameters: rank (pmi or count, default pmi), min_count (minimum
+    number of shared messages, default 2) and limit (default 20).
+    """
+    rank = request.args.get('rank', default='pmi')
+    if rank not in ('pmi', 'count'):
+        return jsonify({'error': 'rank must be pmi or count'}), 400
+    min_count = request.args.get('min_count', default=2, type=int)
+    limit = page_size(20)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT e.id, COALESCE(u.message_count, 0) AS message_count
+        FROM entities e
+        LEFT JOIN entity_usage u ON u.entity_id = e.id
+        WHERE e.id = ?
+    """, (entity_id,))
+    entity = cursor.fetchone()
+    if not entity:
+        conn.close()
+        return jsonify({'error': 'Entity not found'}), 404
+    
+    cursor.execute("SELECT message_count FROM message_totals WHERE id = 1")
+    total_messages = cursor.fetchone()['message_count']
+    
+    # All partners come from one primary key range of entity_cooccurrence
+    cursor.execute("""
+        SELECT e.id, e.type, e.label, e.color, c.count, COALESCE(u.message_count, 0) AS message_count
+        FROM entity_cooccurrence c
+        JOIN entities e ON e.id = c.entity_b
+        LEFT JOIN entity_usage u ON u.entity_id = c.entity_b
+        WHERE c.entity_a = ? AND c.count >= ?
+    """, (entity_id, min_count))
+    related = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    # Pointwise mutual information: how much more often the two appear together than by chance
+    for item in related:
+        expected = entity['message_count'] * item['message_count'] / max(total_messages, 1)
+        item['pmi'] = round(math.log(item['count'] / expected), 3) if expected > 0 else None
+    
+    if rank == 'pmi':
+        related.sort(key=lambda item: (item['pmi'] is not None, item['pmi'] or 0, item['count']), reverse=True)
+    else:
+        related.sort(key=lambda item: (item['count'], item['pmi'] or 0), reverse=True)
+    
+    return jsonify(related[:limit])
 
 @app.route('/api/entities/<int:entity_id>', methods=['PUT'])
 def update_entity(entity_id):
@@ -379,6 +1624,38 @@ def update_entity(entity_id):
     
     return jsonify({'success': True})
 
+def apply_entity_merges(cursor, merge_map):
+    """
+    Merge entities into others with set-based statements, inside the caller's transaction.
+    
+    Links of a note that mentions several of the merged entities collapse into
+    one link, instead of violating the (message_id, entity_id) primary key.
+    
+    Args:
+        cursor: A cursor of a connection with an open transaction
+        merge_map: A dictionary mapping the ids of entities to remove to the ids of the entities they merge into
+    
+    Returns:
+        The number of links that were moved to a merge target
+    """
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS entity_merge_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+    cursor.execute("DELETE FROM entity_merge_map")
+    cursor.executemany("INSERT INTO entity_merge_map (old_id, new_id) VALUES (?, ?)", list(merge_map.items()))
+    
+    # Copy the links to the targets; existing links are kept as they are
+    cursor.execute("""
+        INSERT OR IGNORE INTO note_entities (message_id, entity_id)
+        SELECT ne.message_id, mm.new_id
+        FROM note_entities ne
+        JOIN entity_merge_map mm ON mm.old_id = ne.entity_id
+    """)
+    moved = cursor.rowcount
+    
+    cursor.execute("DELETE FROM note_entities WHERE entity_id IN (SELECT old_id FROM entity_merge_map)")
+    cursor.execute("DELETE FROM entities WHERE id IN (SELECT old_id FROM entity_merge_map)")
+    cursor.execute("DELETE FROM entity_merge_map")
+    return moved
+
 @app.route('/api/entities/merge', methods=['POST'])
 def merge_entities():
     """API endpoint to merge multiple entities into one."""
@@ -411,16 +1688,8 @@ def merge_entities():
         
         merged_id = cursor.lastrowid
         
-        # Update all note_entities references to point to the merged entity
-        placeholders = ','.join(['?'] * len(entity_ids))
-        cursor.execute(f"""
-            UPDATE note_entities
-            SET entity_id = ?
-            WHERE entity_id IN ({placeholders})
-        """, [merged_id] + entity_ids)
-        
-        # Delete the old entities
-        cursor.execute(f"DELETE FROM entities WHERE id IN ({placeholders})", entity_ids)
+        # Point all links at the merged entity and delete the old entities
+        apply_entity_merges(cursor, {entity_id: merged_id for entity_id in entity_ids})
         
         # Commit the transaction
         conn.commit()
@@ -439,12 +1708,158 @@ def merge_entities():
     finally:
         conn.close()
 
+@app.route('/api/entities/duplicates')
+@conditional
+def get_duplicate_entities():
+    """
+    API endpoint to propose clusters of duplicate entities (see entity_dedup.py).
+    
+    Optional parameters: threshold (minimum similarity, 0-1) and type.
+    
+    The clusters are computed in the background. Until they are ready for the
+    current database revision, the answer is 202 with status "pending" and a
+    Retry-After header.
+    """
+    threshold = request.args.get('threshold', default=0.8, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({'error': 'threshold must be between 0 and 1'}), 400
+    entity_type = request.args.get('type') or None
+    
+    revision, _ = get_db_revision()
+    with duplicate_clusters_lock:
+        cached = duplicate_clusters.get((threshold, entity_type))
+    if cached and cached[0] == revision:
+        return jsonify({'clusters': cached[1]})
+    
+    find_duplicates_in_background(threshold, entity_type)
+    return jsonify({'status': 'pending'}), 202, {'Retry-After': str(DUPLICATES_RETRY_AFTER)}
+
+@app.route('/api/entities/merge/bulk', methods=['POST'])
+def bulk_merge_entities():
+    """
+    API endpoint to merge many groups of entities in one transaction.
+    
+    Each group names the entity to keep (target_id, one of entity_ids) and may
+    set its new type, label and color. The clusters of /api/entities/duplicates
+    can be sent as they are.
+    """
+    data = request.json
+    
+    if not data or not isinstance(data.get('groups'), list) or not data['groups']:
+        return jsonify({'error': 'Missing required field: groups'}), 400
+    
+    merge_map = {}
+    targets = {}
+    for group in data['groups']:
+        entity_ids = group.get('entity_ids') or [entity['id'] for entity in group.get('entities', [])]
+        target_id = group.get('target_id')
+        
+        if len(set(entity_ids)) < 2 or target_id not in entity_ids:
+            return jsonify({'error': 'Each group needs at least two entity_ids and a target_id among them'}), 400
+        
+        for entity_id in set(entity_ids) - {target_id}:
+            if entity_id in merge_map or entity_id in targets:
+                return jsonify({'error': f'Entity {entity_id} appears in more than one group'}), 400
+            merge_map[entity_id] = target_id
+        if target_id in merge_map or target_id in targets:
+            return jsonify({'error': f'Entity {target_id} appears in more than one group'}), 400
+        targets[target_id] = {key: group[key] for key in ('type', 'label', 'color') if key in group}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        
+        all_ids = list(merge_map) + list(targets)
+        placeholders = ','.join(['?'] * len(all_ids))
+        cursor.execute(f"SELECT COUNT(*) AS count FROM entities WHERE id IN ({placeholders})", all_ids)
+        if cursor.fetchone()['count'] != len(all_ids):
+            conn.rollback()
+            return jsonify({'error': 'Entity not found'}), 404
+        
+        for target_id, fields in targets.items():
+            if fields:
+                assignments = ', '.join(f"{key} = ?" for key in fields)
+                cursor.execute(
+                    f"UPDATE entities SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    list(fields.values()) + [target_id]
+                )
+        
+        links_moved = apply_entity_merges(cursor, merge_map)
+        conn.commit()
+        
+        return jsonify({
+            'success': True,
+            'groups': len(targets),
+            'merged_entities': len(merge_map),
+            'links_moved': links_moved
+        })
+    
+    except Exception as e:
+        conn.rollback()
+        print(f"Error merging entities: {e}")
+        return jsonify({'error': f'Error merging entities: {str(e)}'}), 500
+    
+    finally:
+        conn.close()
+
 @app.route('/api/config/llm', methods=['GET'])
 def get_llm_config_endpoint():
     """API endpoint to get the current LLM configuration."""
     llm_config = config.get_llm_config()
     return jsonify(llm_config)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of the web app (HTTP, SQLite, LLM calls and scheduler)."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def profiles_access_allowed():
+    """
+    Check access to the stored profiles.
+    
+    With a profiling secret, the request needs ?key= with an unexpired
+    signature of /debug/profiles (python profiler.py sign /debug/profiles);
+    without one, profiles are only served in debug mode.
+    """
+    if profiler.secret:
+        return profiler.verify('/debug/profiles', request.args.get('key'))
+    return app.debug
+
+@app.route('/debug/profiles')
+def list_profiles():
+    """List the stored request profiles, newest first."""
+    if not profiler.active:
+        return jsonify({'error': 'Profiling is not enabled'}), 404
+    if not profiles_access_allowed():
+        return jsonify({'error': 'A valid key is required'}), 403
+    return jsonify(profiler.list_profiles(request.args.get('key')))
+
+@app.route('/debug/profiles/<route>/<name>')
+def get_profile(route, name):
+    """Download a profile in collapsed-stack format (for flamegraph.pl or speedscope)."""
+    if not profiler.active:
+        return jsonify({'error': 'Profiling is not enabled'}), 404
+    if not profiles_access_allowed():
+        return jsonify({'error': 'A valid key is required'}), 403
+    return send_from_directory(profiler.output_dir.resolve(), f"{route}/{name}", mimetype='text/plain')
+
+@app.route('/api/llm/routing')
+def get_routing_stats():
+    """API endpoint to get per-provider latency and error statistics of the router."""
+    if not routing_enabled():
+        return jsonify({'enabled': False})
+    
+    stats = get_llm_router().routing_stats()
+    stats['enabled'] = True
+    return jsonify(stats)
+
+@app.route('/api/llm/scheduler')
+def get_scheduler_stats():
+    """API endpoint to get queue depth and current limits of the LLM request scheduler."""
+    return jsonify(rate_limiter.scheduler.stats())
+
 @app.route('/api/config/llm', methods=['PUT'])
 def update_llm_config_endpoint():
     """API endpoint to update the LLM configuration."""
@@ -459,6 +1874,9 @@ def update_llm_config_endpoint():
     
     # Update configuration
     try:
+        global llm_router
+        llm_router = None  # Rebuilt with the new provider settings on next use
+        
         if provider:
             config.update_llm_config(provider=provider)
         
@@ -476,7 +1894,7 @@ def update_llm_config_endpoint():
         return jsonify({'error': f'Error updating configuration: {str(e)}'}), 500
 
 @app.route('/api/messages/<int:message_id>/extract-entities', methods=['POST'])
-def extract_entities_endpoint(message_id):
+async def extract_entities_endpoint(message_id):
     """API endpoint to manually trigger entity extraction for a message."""
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -492,7 +1910,7 @@ def extract_entities_endpoint(message_id):
     conn.close()
     
     # Extract and save entities
-    entities, error_msg = extract_and_save_entities(message_id, message['transcript'])
+    entities, error_msg = await async_extract_and_save_entities(message_id, message['transcript'])
     
     if error_msg:
         return jsonify({
@@ -506,8 +1924,207 @@ def extract_entities_endpoint(message_id):
         'entities': entities
     })
 
+async def extract_messages(messages, concurrency):
+    """
+    Extract and save the entities of many messages concurrently.
+    
+    Args:
+        messages: Dicts with id and transcript
+        concurrency: Maximum number of extractions in flight
+        
+    Returns:
+        A tuple of (number of messages with entities, error message or None)
+    """
+    async with get_async_llm_client() as llm_client:
+        if not await llm_client.check_connectivity():
+            return 0, f"LLM service ({llm_client.provider}) is not reachable. Please check your configuration and ensure the service is running."
+        
+        results = await llm_client.extract_many([message['transcript'] for message in messages], concurrency)
+    
+    with_entities = 0
+    for message, entities in zip(messages, results):
+        if entities:
+            save_message_entities(message['id'], entities)
+            with_entities += 1
+    return with_entities, None
+
+@app.route('/api/messages/extract-entities', methods=['POST'])
+async def bulk_extract_entities_endpoint():
+    """
+    API endpoint to extract entities for many messages concurrently (e.g. a backfill).
+    
+    The body selects the messages either by 'message_ids' or, with
+    'only_missing', all messages without entities (up to 'limit').
+    'concurrency' bounds the extractions in flight (default 50).
+    """
+    data = request.json or {}
+    if not isinstance(data, dict) or not isinstance(data.get('message_ids') or [], list):
+        return jsonify({'error': 'Expected a JSON object with a list of message_ids'}), 400
+    try:
+        concurrency = max(1, min(int(data.get('concurrency', 50)), 500))
+        limit = int(data.get('limit', 1000))
+        message_ids = [int(message_id) for message_id in data.get('message_ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'message_ids, limit and concurrency must be integers'}), 400
+    
+    if routing_enabled():
+        return jsonify({'error': 'Bulk extraction is not available with provider routing enabled'}), 400
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    if message_ids:
+        placeholders = ','.join(['?'] * len(message_ids))
+        cursor.execute(f"SELECT id, transcript FROM messages WHERE id IN ({placeholders})", message_ids)
+    elif data.get('only_missing'):
+        cursor.execute("""
+            SELECT id, transcript FROM messages
+            WHERE id NOT IN (SELECT message_id FROM note_entities)
+            ORDER BY id
+            LIMIT ?
+        """, (limit,))
+    else:
+        conn.close()
+        return jsonify({'error': 'Specify message_ids or only_missing'}), 400
+    
+    messages = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    with_entities, error_msg = await extract_messages(messages, concurrency)
+    if error_msg:
+        return jsonify({'error': error_msg}), 500
+    
+    return jsonify({
+        'success': True,
+        'processed': len(messages),
+        'with_entities': with_entities
+    })
+
+@app.route('/api/export')
+def export_endpoint():
+    """
+    API endpoint to download all messages with their entities as NDJSON.
+    
+    The file is streamed while it is read from the database, so memory use
+    does not depend on the number of messages. Clients that accept gzip get
+    it compressed on the fly. start_date and end_date limit the export.
+    """
+    lines = export_ndjson(get_db_connection, start_date=request.args.get('start_date'),
+                          end_date=request.args.get('end_date'))
+    headers = {
+        'Content-Disposition': f'attachment; filename="transcripts-{datetime.now().strftime("%Y%m%d")}.ndjson"',
+        'X-Accel-Buffering': 'no'
+    }
+    
+    if request.accept_encodings['gzip']:
+        def compressed():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            chunk = []
+            for line in lines:
+                chunk.append(line.encode('utf-8'))
+                if len(chunk) >= 1000:
+                    yield compressor.compress(b''.join(chunk))
+                    chunk = []
+            yield compressor.compress(b''.join(chunk)) + compressor.flush()
+        
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+        return Response(stream_with_context(compressed()), mimetype='application/x-ndjson', headers=headers)
+    
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/api/import', methods=['POST'])
+async def import_endpoint():
+    """
+    API endpoint to import an NDJSON export (as produced by /api/export).
+    
+    The body is read line by line (gzip if sent with Content-Encoding: gzip)
+    and inserted in large transactions. Entities are matched by type and
+    label; messages that already exist with the same timestamp and
+    transcript are skipped unless keep_duplicates is set. Messages without
+    entities are not extracted during the import; with extract=true they are
+    extracted afterwards, otherwise use POST /api/messages/extract-entities
+    with only_missing later.
+    """
+    body = request.stream
+    if request.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.GzipFile(fileobj=body)
+    
+    conn = get_db_connection()
+    try:
+        result = import_ndjson(conn, io.TextIOWrapper(body, encoding='utf-8'),
+                               skip_duplicates=request.args.get('keep_duplicates') != 'true')
+    except (ArchiveError, UnicodeDecodeError, OSError) as e:
+        return jsonify({'error': f'Invalid import file: {e}'}), 400
+    finally:
+        conn.close()
+    
+    if result['imported']:
+        update_semantic_index()
+    
+    response = {'success': True, **result}
+    if result['without_entities'] and request.args.get('extract') == 'true':
+        conn = get_db_connection()
+        messages = [dict(row) for row in conn.execute("""
+            SELECT id, transcript FROM messages
+            WHERE id BETWEEN ? AND ? AND id NOT IN (SELECT message_id FROM note_entities)
+            ORDER BY id
+        """, (result['first_id'], result['last_id'])).fetchall()]
+        conn.close()
+        
+        with_entities, error_msg = await extract_messages(messages, 50)
+        response['extraction'] = {'processed': len(messages), 'with_entities': with_entities, 'error': error_msg}
+    
+    return jsonify(response)
+
+@app.route('/api/messages/<int:message_id>/extract-entities/stream', methods=['POST'])
+def stream_extract_entities_endpoint(message_id):
+    """
+    API endpoint to extract entities for a message, streamed as Server-Sent Events.
+    
+    Emits 'token' events with raw LLM output, 'entity' events as soon as each
+    entity is complete, and a final 'done' event with the saved entities
+    (or an 'error' event).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Check if the message exists and get its transcript
+    cursor.execute("SELECT transcript FROM messages WHERE id = ?", (message_id,))
+    message = cursor.fetchone()
+    conn.close()
+    
+    if not message:
+        return jsonify({'error': 'Message not found'}), 404
+    
+    transcript = message['transcript']
+    
+    def generate():
+        try:
+            llm_client = get_llm_client()
+            
+            if not llm_client.is_connected and not llm_client.check_connectivity():
+                error_msg = f"LLM service ({llm_client.provider}) is not reachable. Please check your configuration and ensure the service is running."
+                yield sse_event('error', {'error': error_msg})
+                return
+            
+            for event, data in llm_client.stream_entities(transcript):
+                if event == 'done':
+                    if data:
+                        save_message_entities(message_id, data)
+                    yield sse_event('done', {'success': True, 'entities': data})
+                else:
+                    yield sse_event(event, data)
+        
+        except Exception as e:
+            error_msg = f"Error extracting entities: {e}"
+            print(error_msg)
+            yield sse_event('error', {'error': error_msg})
+    
+    return sse_response(generate())
+
 @app.route('/api/test/extract', methods=['POST'])
-def test_extract_entities():
+async def test_extract_entities():
     """API endpoint to test entity extraction with custom parameters."""
     data = request.json
     
@@ -529,70 +2146,24 @@ def test_extract_entities():
     provider_config = llm_config.get(provider, {})
     
     try:
-        # Create LLM client with the specified provider
-        llm_client = LLMClient(provider=provider, config=provider_config)
-        
-        # Check if LLM is connected
-        if not llm_client.is_connected and not llm_client.check_connectivity():
-            error_msg = f"LLM service ({provider}) is not reachable. Please check your configuration and ensure the service is running."
-            return jsonify({
-                'error': error_msg,
-                'entities': []
-            }), 500
-        
-        # Store the original method to restore it later
-        original_method = llm_client._create_extraction_prompt
-        
-        # Override the prompt method to use our custom prompt
-        def custom_prompt_method(text):
-            # If the custom prompt contains {text}, replace it with the actual text
-            # Otherwise, append the text at the end (after "Text to analyze:")
-            if "{text}" in custom_prompt:
-                return custom_prompt.replace("{text}", text)
-            else:
-                # Find the "Text to analyze:" line and append the text after it
-                lines = custom_prompt.split('\n')
-                for i, line in enumerate(lines):
-                    if "Text to analyze:" in line:
-                        # If there's content after "Text to analyze:", replace it
-                        if line.strip() != "Text to analyze:":
-                            lines[i] = "Text to analyze:"
-                        # Add the text on the next line
-                        lines.insert(i + 1, text)
-                        break
-                else:
-                    # If "Text to analyze:" not found, just append the text at the end
-                    lines.append("Text to analyze:")
-                    lines.append(text)
-                
-                return '\n'.join(lines)
-        
-        # Monkey patch the method
-        llm_client._create_extraction_prompt = custom_prompt_method
-        
-        # Get the raw response before parsing
-        raw_response = ""
-        
-        # Override the _parse_llm_response method to capture the raw response
-        original_parse_method = llm_client._parse_llm_response
-        def capture_response_method(response_text):
-            nonlocal raw_response
-            raw_response = response_text
-            return original_parse_method(response_text)
-        
-        llm_client._parse_llm_response = capture_response_method
-        
-        # Extract entities
-        entities = llm_client.extract_entities(note)
-        
-        # Restore original methods
-        llm_client._create_extraction_prompt = original_method
-        llm_client._parse_llm_response = original_parse_method
+        async with AsyncLLMClient(provider=provider, config=provider_config, prompt_template=custom_prompt) as llm_client:
+            # Check if LLM is connected
+            if not await llm_client.check_connectivity():
+                error_msg = f"LLM service ({provider}) is not reachable. Please check your configuration and ensure the service is running."
+                return jsonify({
+                    'error': error_msg,
+                    'entities': []
+                }), 500
+            
+            result = await llm_client.run_extraction(note)
         
         return jsonify({
             'success': True,
-            'entities': entities,
-            'raw_response': raw_response
+            'entities': result['entities'],
+            'raw_response': result['raw_response'],
+            'tokens': result['tokens'],
+            'latency_ms': round(result['latency'] * 1000, 1),
+            'parse_failed': result['parse_failed']
         })
         
     except Exception as e:
@@ -603,81 +2174,119 @@ def test_extract_entities():
             'entities': []
         }), 500
 
-if __name__ == '__main__':
-    # Ensure the database exists
-    if not Path('transcripts.db').exists():
-        conn = sqlite3.connect('transcripts.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            transcript TEXT NOT NULL
-        )
-        ''')
-        
-        # Create entities table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS entities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT NOT NULL,
-            label TEXT NOT NULL,
-            color TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Create note_entities junction table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS note_entities (
-            message_id INTEGER NOT NULL,
-            entity_id INTEGER NOT NULL,
-            PRIMARY KEY (message_id, entity_id),
-            FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE,
-            FOREIGN KEY (entity_id) REFERENCES entities(id) ON DELETE CASCADE
-        )
-        ''')
+@app.route('/api/test/extract/stream', methods=['POST'])
+def test_extract_entities_stream():
+    """
+    Streaming variant of /api/test/extract using Server-Sent Events.
+    
+    Emits 'token', 'entity', and a final 'done' event with all entities and the
+    raw response (or an 'error' event).
+    """
+    data = request.json
+    
+    if not data or 'note' not in data or 'provider' not in data or 'prompt' not in data:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    note = data['note']
+    provider = data['provider']
+    custom_prompt = data['prompt']
+    
+    if not note.strip():
+        return jsonify({'error': 'Note cannot be empty'}), 400
+    
+    if not custom_prompt.strip():
+        return jsonify({'error': 'Prompt cannot be empty'}), 400
+    
+    # Get provider-specific config
+    llm_config = config.get_llm_config()
+    provider_config = llm_config.get(provider, {})
+    
+    def generate():
+        try:
+            llm_client = LLMClient(provider=provider, config=provider_config, prompt_template=custom_prompt)
+            
+            if not llm_client.is_connected and not llm_client.check_connectivity():
+                error_msg = f"LLM service ({provider}) is not reachable. Please check your configuration and ensure the service is running."
+                yield sse_event('error', {'error': error_msg})
+                return
+            
+            raw_parts = []
+            for event, payload in llm_client.stream_entities(note):
+                if event == 'token':
+                    raw_parts.append(payload)
+                if event == 'done':
+                    yield sse_event('done', {
+                        'success': True,
+                        'entities': payload,
+                        'raw_response': ''.join(raw_parts)
+                    })
+                else:
+                    yield sse_event(event, payload)
         
-        conn.commit()
-        conn.close()
+        except Exception as e:
+            error_msg = f"Error extracting entities: {str(e)}"
+            print(error_msg)
+            yield sse_event('error', {'error': error_msg})
+    
+    return sse_response(generate())
+
+# Upper bounds for one evaluation run from the test page
+MAX_EVALUATION_NOTES = 500
+MAX_EVALUATION_RUNS = 12
+
+@app.route('/api/test/evaluate', methods=['POST'])
+async def test_evaluate_endpoint():
+    """
+    API endpoint to compare prompts and provider/model setups on labeled notes.
+    
+    The body has 'prompts' (list of {name, prompt}; a missing prompt means
+    the built-in one), 'setups' (list of {provider, model}), 'sample_size'
+    (default 50), 'seed', 'concurrency' (per combination, default 10) and
+    optionally 'min_f1' to get the cheapest setup reaching it. The notes are
+    sampled from messages with linked entities, which serve as the labels.
+    """
+    data = request.json or {}
+    prompts = data.get('prompts') or [{'name': DEFAULT_PROMPT_NAME, 'prompt': None}]
+    setups = data.get('setups') or [{'provider': config.get_llm_config().get('provider', 'ollama')}]
+    sample_size = max(1, min(int(data.get('sample_size', 50)), MAX_EVALUATION_NOTES))
+    concurrency = max(1, min(int(data.get('concurrency', 10)), 100))
+    
+    for setup in setups:
+        if setup.get('provider') not in ('ollama', 'openai', 'anthropic'):
+            return jsonify({'error': f"Unsupported provider: {setup.get('provider')}"}), 400
+    for prompt in prompts:
+        if not prompt.get('name'):
+            return jsonify({'error': 'Every prompt needs a name'}), 400
+        if prompt.get('prompt') is not None and not prompt['prompt'].strip():
+            return jsonify({'error': f"Prompt {prompt['name']} is empty"}), 400
+    if len(prompts) * len(setups) > MAX_EVALUATION_RUNS:
+        return jsonify({'error': f'At most {MAX_EVALUATION_RUNS} combinations of prompts and setups'}), 400
+    
+    conn = get_db_connection()
+    corpus = load_corpus(conn, sample_size, int(data.get('seed', 0)))
+    conn.close()
+    
+    if not corpus:
+        return jsonify({'error': 'No labeled notes found (messages need linked entities)'}), 400
+    
+    reports = await evaluate(corpus, prompts, setups, config.get_llm_config(), concurrency)
+    
+    response = {'success': True, 'notes': len(corpus), 'reports': reports}
+    if data.get('min_f1') is not None:
+        response['recommended'] = recommend(reports, float(data['min_f1']))
+    return jsonify(response)
+
+if __name__ == '__main__':
+    # Ensure the database and its tables exist
+    created = not Path(DB_PATH).exists()
+    init_db()
+    if created:
         print("Created empty database file with schema")
-    else:
-        # Ensure the new tables exist even if the database file already exists
-        conn = sqlite3.connect('transcripts.db')
-        cursor = conn.cursor()
-        
-        # Check if entities table exists, create if not
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entities'")
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS entities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                label TEXT NOT NULL,
-                color TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            print("Created entities table")
-        
-        # Check if note_entities table exists, create if not
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='note_entities'")
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS note_entities (
-                message_id INTEGER NOT NULL,
-                entity_id INTEGER NOT NULL,
-                PRIMARY KEY (message_id, entity_id),
-                FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE,
-                FOREIGN KEY (entity_id) REFERENCES entities(id) ON DELETE CASCADE
-            )
-            ''')
-            print("Created note_entities table")
-            
-        conn.commit()
-        conn.close()
+    
+    # Embed the memos recorded while the server was not running (in the process
+    # serving requests, not in the reloader that watches the files)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        update_semantic_index()
     
     # Create static and templates directories if they don't exist
     os.makedirs('static', exist_ok=True)
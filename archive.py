@@ -0,0 +1,247 @@
+"""
+Export and import of messages with their entities as NDJSON.
+
+The format has one JSON object per line: a header, then one line per
+message with its entities, e.g.
+
+    {"format": "transprogram", "version": 1, "exported_at": "2025-07-01T12:00:00"}
+    {"id": 1, "timestamp": "2025-06-30T09:12:44", "transcript": "...", "entities": [{"type": "person", "label": "Sarah Müller", "color": "#FF5733"}]}
+
+Exports are read in keyset batches, so memory use does not grow with the
+archive and each batch releases the database lock before the next one
+(trans.pyw can keep writing). Imports insert in large transactions (the
+links with executemany), reuse existing entities with the same (type, label) and skip
+messages that already exist with the same timestamp and transcript, so an
+interrupted import can simply be run again. Messages without entities are
+left for the bulk extraction (POST /api/messages/extract-entities with
+only_missing).
+
+From the command line (files ending in .gz are compressed):
+
+    python archive.py export transcripts.ndjson.gz
+    python archive.py import transcripts.ndjson.gz --db other.db
+"""
+
+import sys
+import json
+import gzip
+import time
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any
+
+from llm_client import LLMClient
+
+FORMAT_NAME = "transprogram"
+FORMAT_VERSION = 1
+
+def export_ndjson(connect: Callable, batch_size: int = 1000, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None) -> Iterator[str]:
+    """
+    Generate the NDJSON lines of an export.
+
+    Args:
+        connect: Function returning a new database connection
+        batch_size: Number of messages read per query
+        start_date, end_date: Only messages with a timestamp in this range (both required)
+
+    Yields:
+        Lines including the trailing newline, starting with the header
+    """
+    yield json.dumps({"format": FORMAT_NAME, "version": FORMAT_VERSION,
+                      "exported_at": datetime.now().isoformat(timespec="seconds")}) + "\n"
+
+    date_filter, date_params = "", []
+    if start_date and end_date:
+        date_filter, date_params = " AND timestamp BETWEEN ? AND ?", [start_date, end_date]
+
+    last_id = 0
+    conn = connect()
+    try:
+        while True:
+            # fetchall() ends each statement, so no read lock is held between batches
+            messages = conn.execute(
+                f"SELECT id, timestamp, transcript FROM messages WHERE id > ?{date_filter} ORDER BY id LIMIT ?",
+                [last_id] + date_params + [batch_size]
+            ).fetchall()
+            if not messages:
+                break
+
+            entities = {}
+            for message_id, entity_type, label, color in conn.execute("""
+                SELECT ne.message_id, e.type, e.label, e.color
+                FROM note_entities ne
+                JOIN entities e ON e.id = ne.entity_id
+                WHERE ne.message_id BETWEEN ? AND ?
+                ORDER BY ne.message_id, e.type, e.label
+            """, (messages[0][0], messages[-1][0])).fetchall():
+                entities.setdefault(message_id, []).append({"type": entity_type, "label": label, "color": color})
+
+            for message_id, timestamp, transcript in messages:
+                yield json.dumps({
+                    "id": message_id,
+                    "timestamp": timestamp,
+                    "transcript": transcript,
+                    "entities": entities.get(message_id, [])
+                }, ensure_ascii=False) + "\n"
+            last_id = messages[-1][0]
+    finally:
+        conn.close()
+
+class ArchiveError(ValueError):
+    """Raised for lines that are not part of a valid export."""
+
+def import_ndjson(conn: sqlite3.Connection, lines: Iterable, batch_size: int = 10000,
+                  skip_duplicates: bool = True) -> Dict[str, Any]:
+    """
+    Import an NDJSON export into a database.
+
+    Messages get new ids (the archive's ids are only used within the file).
+    Every batch is one transaction, so a failed import keeps the batches
+    before the failing line.
+
+    Args:
+        conn: Database connection (not in a transaction)
+        lines: The lines of the file, as str or bytes
+        batch_size: Number of messages per transaction
+        skip_duplicates: Skip messages that exist with the same timestamp and transcript
+
+    Returns:
+        A dictionary with the numbers of imported and skipped messages, new
+        entities, links and imported messages without entities, the first
+        and last imported message id and the duration in seconds
+    """
+    started = time.perf_counter()
+    entity_ids = {(entity_type, label): entity_id
+                  for entity_id, entity_type, label in conn.execute("SELECT id, type, label FROM entities")}
+    result = {"imported": 0, "skipped": 0, "entities_created": 0, "links": 0, "without_entities": 0,
+              "first_id": None, "last_id": None}
+
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ArchiveError(f"Line {line_number}: invalid JSON ({e})")
+
+        if "format" in record:
+            if record["format"] != FORMAT_NAME or record.get("version", 0) > FORMAT_VERSION:
+                raise ArchiveError(f"Line {line_number}: unsupported format {record['format']} {record.get('version')}")
+            continue
+        if not isinstance(record.get("timestamp"), str) or not isinstance(record.get("transcript"), str):
+            raise ArchiveError(f"Line {line_number}: a message needs timestamp and transcript")
+        if not all(isinstance(entity.get("type"), str) and isinstance(entity.get("label"), str)
+                   for entity in record.get("entities") or []):
+            raise ArchiveError(f"Line {line_number}: an entity needs type and label")
+
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _import_batch(conn, batch, entity_ids, skip_duplicates, result)
+            batch = []
+
+    if batch:
+        _import_batch(conn, batch, entity_ids, skip_duplicates, result)
+
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+def _import_batch(conn: sqlite3.Connection, batch: List[Dict[str, Any]], entity_ids: Dict[tuple, int],
+                  skip_duplicates: bool, result: Dict[str, Any]) -> None:
+    """Insert one batch of messages, their new entities and links in one transaction."""
+    cursor = conn.cursor()
+    # Take the write lock first, so no duplicate is inserted between the check and the insert
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if skip_duplicates:
+            existing = set()
+            for record in batch:
+                row = cursor.execute(
+                    "SELECT 1 FROM messages WHERE timestamp = ? AND transcript = ? LIMIT 1",
+                    (record["timestamp"], record["transcript"])
+                ).fetchone()
+                if row:
+                    existing.add(id(record))
+            result["skipped"] += len(existing)
+            batch = [record for record in batch if id(record) not in existing]
+
+        messages, links = [], set()
+        for record in batch:
+            # Inserted one by one, so that AUTOINCREMENT assigns the ids and never reuses those of deleted messages
+            cursor.execute("INSERT INTO messages (timestamp, transcript) VALUES (?, ?)",
+                           (record["timestamp"], record["transcript"]))
+            message_id = cursor.lastrowid
+            messages.append(message_id)
+            if not record.get("entities"):
+                result["without_entities"] += 1
+
+            for entity in record.get("entities") or []:
+                key = (entity["type"], entity["label"])
+                if key not in entity_ids:
+                    color = entity.get("color") or LLMClient.DEFAULT_COLORS.get(entity["type"], LLMClient.DEFAULT_COLORS["other"])
+                    cursor.execute("INSERT INTO entities (type, label, color) VALUES (?, ?, ?)", key + (color,))
+                    entity_ids[key] = cursor.lastrowid
+                    result["entities_created"] += 1
+                links.add((message_id, entity_ids[key]))
+
+        cursor.executemany("INSERT INTO note_entities (message_id, entity_id) VALUES (?, ?)", sorted(links))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Entities created in the failed transaction do not exist anymore
+        entity_ids.clear()
+        entity_ids.update({(entity_type, label): entity_id for entity_id, entity_type, label
+                           in conn.execute("SELECT id, type, label FROM entities")})
+        raise
+
+    result["imported"] += len(messages)
+    result["links"] += len(links)
+    if messages:
+        result["first_id"] = result["first_id"] or messages[0]
+        result["last_id"] = messages[-1]
+
+def open_archive(path: str, mode: str):
+    """Open an archive file for reading ("r") or writing ("w"), compressed if it ends in .gz; "-" is stdin/stdout."""
+    if path == "-":
+        # A second file object on the same descriptor, so that closing it leaves stdin/stdout open
+        stream = sys.stdin if mode == "r" else sys.stdout
+        return open(stream.fileno(), mode, encoding="utf-8", closefd=False)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+if __name__ == "__main__":
+    import os
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or import messages and entities as NDJSON")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help="NDJSON file (.gz for compression, - for stdin/stdout)")
+    parser.add_argument("--db", default=os.environ.get("TRANSCRIPTS_DB", "transcripts.db"), help="Database file")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Messages per transaction (import)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Import messages even if they exist with the same timestamp and transcript")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        started = time.perf_counter()
+        count = -1
+        with open_archive(args.file, "w") as output:
+            for count, line in enumerate(export_ndjson(lambda: sqlite3.connect(args.db))):
+                output.write(line)
+        print(f"Exported {count} messages in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    else:
+        from app import init_db
+        init_db(args.db)
+        conn = sqlite3.connect(args.db)
+        with open_archive(args.file, "r") as archive:
+            result = import_ndjson(conn, archive, args.batch_size, not args.keep_duplicates)
+        conn.close()
+        print(f"Imported {result['imported']} messages ({result['skipped']} duplicates skipped), "
+              f"{result['entities_created']} new entities, {result['links']} links in {result['seconds']}s")
+        if result["without_entities"]:
+            print(f"{result['without_entities']} messages have no entities; extract them with "
+                  f"POST /api/messages/extract-entities {{\"only_missing\": true}}")
@@ -0,0 +1,228 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple, Any
+
+import httpx
+
+from rate_limiter import RateScheduler, RequestSlot
+from llm_client import LLMClient, LLMResponseError
+
+class AsyncLLMClient(LLMClient):
+    """
+    Asynchronous variant of LLMClient for running many extractions concurrently.
+
+    Uses httpx.AsyncClient for Ollama and the async SDK clients for OpenAI and
+    Anthropic; prompt, request bodies and response parsing are shared with
+    LLMClient. An in-flight request costs a coroutine instead of a thread.
+
+    The HTTP and SDK clients are bound to the event loop they were created on,
+    so use one instance per loop, preferably as an async context manager:
+
+        async with AsyncLLMClient("ollama", config) as client:
+            entities = await client.extract_entities(text)
+    """
+
+    def __init__(self, provider: str = "ollama", config: Optional[Dict[str, Any]] = None,
+                 scheduler: Optional[RateScheduler] = None, timeout: float = 120.0,
+                 prompt_template: Optional[str] = None):
+        """
+        Initialize the async LLM client.
+
+        Unlike LLMClient, no connectivity check is made here because it would
+        block; it runs on the first extraction instead.
+
+        Args:
+            provider: The LLM provider to use ('ollama', 'openai', or 'anthropic')
+            config: Configuration for the LLM provider
+            scheduler: Rate scheduler for provider requests, defaults to the shared one
+            timeout: Timeout for a single provider request in seconds
+            prompt_template: Extraction prompt to use instead of EXTRACTION_PROMPT (see fill_prompt_template)
+        """
+        self._configure(provider, config, scheduler, prompt_template)
+        self.timeout = timeout
+
+        # None until checked on first use
+        self.is_connected = None
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._sdk_client = None
+
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP and SDK clients."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._sdk_client is not None:
+            await self._sdk_client.close()
+            self._sdk_client = None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._http is None:
+            # Allow as many pooled connections as the scheduler could let through
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+            )
+        return self._http
+
+    def _async_sdk_client(self):
+        """Return the async OpenAI or Anthropic SDK client, creating it on first use."""
+        if self._sdk_client is None:
+            if self.provider == "openai":
+                import openai
+                self._sdk_client = openai.AsyncOpenAI(api_key=self.config["api_key"], timeout=self.timeout)
+            elif self.provider == "anthropic":
+                import anthropic
+                self._sdk_client = anthropic.AsyncAnthropic(api_key=self.config["api_key"], timeout=self.timeout)
+        return self._sdk_client
+
+    async def check_connectivity(self) -> bool:
+        """
+        Check if the LLM service is reachable.
+
+        Only Ollama is probed over the network; for the cloud providers a
+        configured API key is taken as reachable, and request errors surface
+        on the first extraction instead.
+
+        Returns:
+            True if the service is reachable, False otherwise
+        """
+        try:
+            if self.provider == "ollama":
+                response = await self._http_client().get(f"{self.config['base_url']}/api/tags", timeout=5)
+                self.is_connected = response.status_code == 200
+            else:
+                if not self.config.get("api_key"):
+                    print(f"{self.provider} API key is not configured")
+                self.is_connected = bool(self.config.get("api_key"))
+        except Exception as e:
+            print(f"Error checking connectivity to {self.provider}: {e}")
+            self.is_connected = False
+        return self.is_connected
+
+    async def extract_entities(self, text: str, raise_errors: bool = False) -> List[Dict[str, str]]:
+        """
+        Extract entities from the given text using the configured LLM provider.
+
+        Args:
+            text: The text to extract entities from
+            raise_errors: If True, raise on unreachable service, request errors and
+                unparseable responses instead of returning an empty list
+
+        Returns:
+            A list of entity dictionaries with 'type', 'label', and 'color' keys
+
+        Raises:
+            LLMResponseError: If raise_errors is set and the service is unreachable
+                or the response contained no JSON
+        """
+        if not self.is_connected and not await self.check_connectivity():
+            if raise_errors:
+                raise LLMResponseError(f"{self.provider} LLM service is not reachable")
+            print(f"Cannot extract entities: {self.provider} LLM service is not reachable")
+            return []
+
+        try:
+            result = await self.run_extraction(text)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error extracting entities with {self.provider}: {e}")
+            return []
+
+        # A truncated response still counts when its valid prefix had entities
+        if raise_errors and result["parse_failed"] and not result["entities"]:
+            raise LLMResponseError(f"Could not parse the {self.provider} response")
+
+        return result["entities"]
+
+    async def run_extraction(self, text: str) -> Dict[str, Any]:
+        """
+        Run one extraction and report the details needed to compare setups.
+
+        Provider errors are raised; the connectivity check is left to the caller.
+
+        Args:
+            text: The text to extract entities from
+
+        Returns:
+            A dictionary with entities, raw_response, tokens (as reported by
+            the provider, 0 if unknown), latency in seconds (without waiting
+            for the rate scheduler) and parse_failed
+        """
+        prompt = self._create_extraction_prompt(text)
+
+        if self.provider == "ollama":
+            response_text, slot = await self._complete_with_ollama(prompt)
+        elif self.provider == "openai":
+            response_text, slot = await self._complete_with_openai(prompt)
+        else:
+            response_text, slot = await self._complete_with_anthropic(prompt)
+
+        # Parsing is synchronous, so the parse outcome stays with this thread
+        self._local.parse_failed = False
+        entities = self._parse_llm_response(response_text)
+
+        return {
+            "entities": entities,
+            "raw_response": response_text,
+            "tokens": slot.tokens_used or 0,
+            "latency": slot.latency,
+            "parse_failed": self._local.parse_failed
+        }
+
+    async def extract_many(self, texts: List[str], concurrency: int = 100) -> List[List[Dict[str, str]]]:
+        """
+        Extract entities from many texts concurrently.
+
+        The rate scheduler still applies, so concurrency is only an upper bound.
+
+        Args:
+            texts: The texts to extract entities from
+            concurrency: Maximum number of extractions in flight
+
+        Returns:
+            The entities for each text, in input order (empty lists for failures)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def extract(text):
+            async with semaphore:
+                return await self.extract_entities(text)
+
+        return await asyncio.gather(*(extract(text) for text in texts))
+
+    async def _complete_with_ollama(self, prompt: str) -> Tuple[str, RequestSlot]:
+        """Get the raw completion from local Ollama, with the finished slot (usage and latency)."""
+        async with self._request_slot(prompt) as slot:
+            response = await self._http_client().post(
+                f"{self.config['base_url']}/api/generate",
+                json=self._ollama_payload(prompt, stream=False)
+            )
+            response.raise_for_status()
+            result = response.json()
+            slot.record_usage(result.get("prompt_eval_count", 0) + result.get("eval_count", 0))
+        return result["response"], slot
+
+    async def _complete_with_openai(self, prompt: str) -> Tuple[str, RequestSlot]:
+        """Get the raw completion from the OpenAI API, with the finished slot."""
+        client = self._async_sdk_client()
+        async with self._request_slot(prompt) as slot:
+            response = await client.chat.completions.create(**self._openai_request(prompt))
+            if response.usage:
+                slot.record_usage(response.usage.total_tokens)
+        return response.choices[0].message.content, slot
+
+    async def _complete_with_anthropic(self, prompt: str) -> Tuple[str, RequestSlot]:
+        """Get the raw completion (tool input JSON or text) from the Anthropic API, with the finished slot."""
+        client = self._async_sdk_client()
+        async with self._request_slot(prompt) as slot:
+            response = await client.messages.create(**self._anthropic_request(prompt))
+            slot.record_usage(response.usage.input_tokens + response.usage.output_tokens)
+        return self._anthropic_response_text(response), slot
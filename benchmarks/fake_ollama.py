@@ -0,0 +1,224 @@
+"""
+Local stand-in for the Ollama API, for benchmarks and load tests.
+
+Implements `GET /api/tags`, `POST /api/generate` (streaming and not) and
+`POST /api/embed`. The "extraction" picks capitalized words from the text in
+the prompt, so responses vary with the input without running a model; the
+embeddings are hashed words. Latency and the share of malformed responses
+are configurable.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11435 --latency 0.5 --jitter 0.2 --malformed-rate 0.05
+
+Then point the "ollama" base_url in config.json at http://localhost:11435.
+"""
+
+import re
+import json
+import hashlib
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words that start sentences in German memos but are no entities
+STOPWORDS = {"Erinnerung", "Meeting", "Notiz", "Idee", "Heute", "Reise", "Kurzes", "Update", "Nicht", "Gedanken",
+             "Das", "Die", "Der", "Ich", "Mal", "Bitte", "Außerdem", "Termin", "Frist", "Projekt", "Angebot",
+             "Ansprechpartner", "Kosten", "Team", "Unterlagen", "Gespräch", "Zahlen", "Folien", "Thema", "Workshop",
+             "Punkte", "Schritt", "Nächster"}
+
+COMPANY_WORDS = ("GmbH", "AG", "Systems", "Consulting")
+
+EMBEDDING_DIMENSIONS = 64
+
+
+def guess_type(label: str) -> str:
+    """Guess an entity type from the shape of a label."""
+    if label.endswith(COMPANY_WORDS):
+        return "company"
+    if " " in label:
+        return "person"
+    return "topic"
+
+
+class FakeOllama:
+    """Configuration and behaviour of the stand-in server."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, malformed_rate: float = 0.0,
+                 token_delay: float = 0.0, seed: int = None):
+        """
+        Args:
+            latency: Base response time in seconds
+            jitter: Random extra time in seconds (uniform 0..jitter)
+            malformed_rate: Share of responses that are truncated or wrapped in prose
+            token_delay: Delay between streamed chunks in seconds
+            seed: Random seed for reproducible latencies and failures
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.malformed_rate = malformed_rate
+        self.token_delay = token_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def delay(self) -> float:
+        """Return the simulated processing time of one request."""
+        return self.latency + self.jitter * self._random()
+
+    def completion(self, prompt: str) -> str:
+        """Build the model output for a prompt, malformed at the configured rate."""
+        with self._lock:
+            self.requests += 1
+
+        text = prompt
+        if "Text to analyze:" in prompt:
+            text = prompt.split("Text to analyze:", 1)[1].split("Return ONLY", 1)[0]
+
+        labels = []
+        for word in re.findall(r"\b[A-ZÄÖÜ][\wäöüß-]+(?: [A-ZÄÖÜ][\wäöüß-]+)*", text):
+            if word not in STOPWORDS and word not in labels:
+                labels.append(word)
+        output = json.dumps({"entities": [{"type": guess_type(label), "label": label} for label in labels]})
+
+        if self._random() < self.malformed_rate:
+            if self._random() < 0.5:
+                # Cut off mid-object, as when max_tokens is reached
+                output = output[:max(1, len(output) * 2 // 3)]
+            else:
+                output = f"Here are the entities I found:\n```json\n{output}\n```"
+        return output
+
+    def embedding(self, text: str) -> list:
+        """Build a deterministic vector from the words of a text (texts sharing words are similar)."""
+        with self._lock:
+            self.requests += 1
+        vector = [0.0] * EMBEDDING_DIMENSIONS
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[digest[0] % EMBEDDING_DIMENSIONS] += 1.0 if digest[1] & 1 else -1.0
+        return vector
+
+
+def make_handler(fake: FakeOllama):
+    """Create the request handler class bound to a FakeOllama instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": "fake:latest"}]})
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path == "/api/embed":
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                texts = request.get("input", "")
+                texts = [texts] if isinstance(texts, str) else texts
+                time.sleep(fake.delay())
+                self._send_json({"model": request.get("model"), "embeddings": [fake.embedding(text) for text in texts]})
+                return
+            if self.path != "/api/generate":
+                self._send_json({"error": "not found"}, 404)
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = request.get("prompt", "")
+            output = fake.completion(prompt)
+            prompt_tokens, output_tokens = len(prompt) // 4, len(output) // 4
+
+            time.sleep(fake.delay())
+
+            if not request.get("stream", True):
+                self._send_json({
+                    "model": request.get("model"),
+                    "response": output,
+                    "done": True,
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": output_tokens
+                })
+                return
+
+            # Stream NDJSON chunks like Ollama
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            chunks = [output[i:i + 8] for i in range(0, len(output), 8)]
+            for chunk in chunks:
+                self._write_chunk({"response": chunk, "done": False})
+                if fake.token_delay:
+                    time.sleep(fake.token_delay)
+            self._write_chunk({"response": "", "done": True,
+                               "prompt_eval_count": prompt_tokens, "eval_count": output_tokens})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, payload):
+            data = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(port: int = 0, host: str = "127.0.0.1", **options) -> ThreadingHTTPServer:
+    """
+    Start the stand-in server in a daemon thread.
+
+    Args:
+        port: Port to listen on, 0 picks a free one
+        host: Interface to bind
+        **options: Passed to FakeOllama (latency, jitter, malformed_rate, ...)
+
+    Returns:
+        The running server; its URL is http://host:server.server_port
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(FakeOllama(**options)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama stand-in with configurable latency and failures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.5, help="Base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency in seconds")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of malformed responses (0-1)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Delay between streamed chunks in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakeOllama(
+        latency=args.latency, jitter=args.jitter, malformed_rate=args.malformed_rate,
+        token_delay=args.token_delay, seed=args.seed
+    )))
+    server.daemon_threads = True
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
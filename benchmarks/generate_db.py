@@ -0,0 +1,211 @@
+"""
+Generate a synthetic transcripts.db for benchmarks and load tests.
+
+Messages are German voice-memo style sentences that mention people,
+companies, projects, places, topics and dates from a fixed vocabulary.
+Entities and note_entities links are created for the mentions, with a
+skewed popularity (a few entities appear in many notes) and some
+near-duplicate labels ("Sarah Müller" / "sarah müller" / "S. Müller"),
+as produced by real LLM extraction.
+
+Usage:
+    python benchmarks/generate_db.py --messages 100000 --output bench_100k.db
+"""
+
+import sys
+import random
+import argparse
+import sqlite3
+import time
+from itertools import accumulate
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import init_db, rebuild_aggregates
+from llm_client import LLMClient
+
+# Fixed so that the same seed always produces the same database
+END_DATE = datetime(2025, 6, 30, 18, 0, 0)
+
+FIRST_NAMES = ["Sarah", "Thomas", "Anna", "Michael", "Julia", "Stefan", "Laura", "Markus", "Lena", "Andreas",
+               "Katrin", "Jonas", "Miriam", "Felix", "Sabine", "Tobias", "Nina", "Daniel", "Claudia", "Lukas"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz",
+              "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Neumann", "Schwarz", "Braun", "Zimmermann"]
+COMPANY_PREFIXES = ["Nord", "Süd", "Alpen", "Rhein", "Spree", "Data", "Smart", "Green", "Blue", "Meta", "Hanse", "Isar"]
+COMPANY_SUFFIXES = ["Tech GmbH", "Solutions AG", "Logistik GmbH", "Consulting", "Systems", "Energie AG", "Software GmbH"]
+PROJECTS = ["Apollo", "Phoenix", "Nordlicht", "Kompass", "Leuchtturm", "Atlas", "Merkur", "Orion", "Brücke", "Horizont",
+            "Fundament", "Wegweiser", "Polaris", "Zugvogel", "Quelle"]
+LOCATIONS = ["Berlin", "Hamburg", "München", "Köln", "Frankfurt", "Stuttgart", "Leipzig", "Dresden", "Hannover",
+             "Nürnberg", "Bremen", "Wien", "Zürich", "Düsseldorf", "Freiburg"]
+TOPICS = ["Budgetplanung", "Kundenfeedback", "Personalplanung", "Datenschutz", "Cloud-Migration", "Quartalszahlen",
+          "Onboarding", "Marketingkampagne", "Lieferkette", "Preisgestaltung", "Code-Review", "Barrierefreiheit",
+          "Energiekosten", "Vertragsverlängerung", "Teamevent"]
+DATES = ["nächsten Montag", "Ende des Monats", "Q3", "Freitag", "übermorgen", "Anfang Juli", "nächste Woche",
+         "bis Mittwoch", "im Herbst", "2025"]
+
+TEMPLATES = [
+    "Erinnerung: {person} wegen {topic} anrufen, Termin {date}.",
+    "Meeting mit {person} von {company} in {location} zum Projekt {project}.",
+    "{person} meint, dass {project} {date} fertig sein muss. {topic} klären.",
+    "Notiz zu {topic}: {company} hat sich gemeldet, {person} übernimmt das.",
+    "Idee für {project}: mit {company} über {topic} sprechen, evtl. Workshop in {location}.",
+    "Heute mit {person} und {person2} über {topic} gesprochen. Nächster Schritt {date}.",
+    "Reise nach {location} planen, {person} fragen ob {company} die Kosten übernimmt.",
+    "Kurzes Update zu {project}: {topic} ist erledigt, offene Punkte mit {person} besprechen.",
+    "Nicht vergessen: Angebot an {company} schicken, Ansprechpartner {person}, Frist {date}.",
+    "Gedanken zu {topic}. Das sollten wir im Team in {location} nochmal aufgreifen.",
+]
+FILLERS = [
+    " Außerdem noch die Unterlagen vom letzten Mal durchsehen.",
+    " Das war eigentlich ein gutes Gespräch, aber wir müssen schneller werden.",
+    " Mal schauen, ob das so klappt.",
+    " Bitte auch an die Folien denken und die Zahlen aktualisieren.",
+    " Ich glaube, das Thema wird uns noch eine Weile beschäftigen.",
+    "",
+]
+
+
+def label_variants(label):
+    """Spellings of the same entity that LLM extraction tends to produce."""
+    variants = [label, label.lower()]
+    parts = label.split()
+    if len(parts) == 2:
+        variants.append(f"{parts[0][0]}. {parts[1]}")
+    return variants
+
+
+def build_vocabulary(rng, size):
+    """
+    Build the pool of entities that messages can mention.
+
+    Returns:
+        A dict mapping entity type to a list of canonical labels
+    """
+    people = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    companies = [f"{prefix} {suffix}" for prefix in COMPANY_PREFIXES for suffix in COMPANY_SUFFIXES]
+    rng.shuffle(people)
+    rng.shuffle(companies)
+    return {
+        "person": people[:max(20, size // 2)],
+        "company": companies[:max(10, size // 6)],
+        "project": PROJECTS,
+        "location": LOCATIONS,
+        "topic": TOPICS,
+        "date": DATES,
+    }
+
+
+_zipf_weights = {}
+
+def pick(rng, items):
+    """Pick an item with a Zipf-like popularity (the n-th item is n times rarer than the first)."""
+    if len(items) not in _zipf_weights:
+        _zipf_weights[len(items)] = list(accumulate(1.0 / rank for rank in range(1, len(items) + 1)))
+    return rng.choices(items, cum_weights=_zipf_weights[len(items)])[0]
+
+
+def generate(output, messages, days, seed):
+    """
+    Generate a database with the given number of messages.
+
+    Args:
+        output: Path of the database file to create (must not exist)
+        messages: Number of messages
+        days: Number of days the timestamps are spread over, ending at END_DATE
+        seed: Random seed, the same seed produces the same database
+    """
+    rng = random.Random(seed)
+    output = Path(output)
+    if output.exists():
+        raise SystemExit(f"{output} already exists")
+
+    init_db(str(output))
+    conn = sqlite3.connect(str(output))
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    # Bulk load without the triggers; init_db recreates them afterwards, and the
+    # aggregates they would have maintained are rebuilt in one pass
+    for (trigger,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+        conn.execute(f"DROP TRIGGER {trigger}")
+
+    vocabulary = build_vocabulary(rng, max(50, messages // 200))
+    entity_ids = {}  # (type, label) -> id
+    entity_rows = []
+
+    def entity_id(entity_type, label):
+        key = (entity_type, label)
+        if key not in entity_ids:
+            entity_ids[key] = len(entity_rows) + 1
+            color = LLMClient.DEFAULT_COLORS.get(entity_type, LLMClient.DEFAULT_COLORS["other"])
+            entity_rows.append((entity_ids[key], entity_type, label, color))
+        return entity_ids[key]
+
+    start = END_DATE - timedelta(days=days)
+    span = int((END_DATE - start).total_seconds())
+    offsets = sorted(rng.randrange(span) for _ in range(messages))
+
+    started = time.perf_counter()
+    batch_messages = []
+    batch_links = []
+    for message_id, offset in enumerate(offsets, start=1):
+        mentions = {
+            "person": pick(rng, vocabulary["person"]),
+            "person2": pick(rng, vocabulary["person"]),
+            "company": pick(rng, vocabulary["company"]),
+            "project": pick(rng, vocabulary["project"]),
+            "location": pick(rng, vocabulary["location"]),
+            "topic": pick(rng, vocabulary["topic"]),
+            "date": pick(rng, vocabulary["date"]),
+        }
+        template = rng.choice(TEMPLATES)
+        transcript = template.format(**mentions) + rng.choice(FILLERS)
+        timestamp = (start + timedelta(seconds=offset, microseconds=rng.randrange(1000000))).isoformat()
+        batch_messages.append((message_id, timestamp, transcript))
+
+        # Link the entities the template actually mentions, sometimes in a variant spelling
+        links = set()
+        for key, label in mentions.items():
+            if "{" + key + "}" not in template:
+                continue
+            entity_type = "person" if key == "person2" else key
+            if rng.random() < 0.05:
+                label = rng.choice(label_variants(label))
+            links.add(entity_id(entity_type, label))
+        batch_links.extend((message_id, link) for link in links)
+
+        if len(batch_messages) >= 10000:
+            conn.executemany("INSERT INTO messages (id, timestamp, transcript) VALUES (?, ?, ?)", batch_messages)
+            batch_messages = []
+        if len(batch_links) >= 10000:
+            conn.executemany("INSERT INTO note_entities (message_id, entity_id) VALUES (?, ?)", batch_links)
+            batch_links = []
+
+    conn.executemany("INSERT INTO messages (id, timestamp, transcript) VALUES (?, ?, ?)", batch_messages)
+    conn.executemany("INSERT INTO note_entities (message_id, entity_id) VALUES (?, ?)", batch_links)
+    conn.executemany("INSERT INTO entities (id, type, label, color) VALUES (?, ?, ?, ?)", entity_rows)
+    rebuild_aggregates(conn.cursor())
+    conn.commit()
+
+    link_count = conn.execute("SELECT COUNT(*) FROM note_entities").fetchone()[0]
+    conn.close()
+    init_db(str(output))
+    print(f"Generated {output}: {messages} messages, {len(entity_rows)} entities, {link_count} links "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic transcripts.db")
+    parser.add_argument("--messages", type=int, default=10000, help="Number of messages (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--output", default=None, help="Database file (default: bench_<messages>.db)")
+    parser.add_argument("--days", type=int, default=3 * 365, help="Days the messages are spread over")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    generate(args.output or f"bench_{args.messages}.db", args.messages, args.days, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+End-to-end load test of the note ingestion path.
+
+Starts the web app (threaded Werkzeug server) on a copy of a benchmark
+database, with the LLM replaced by the local Ollama stand-in, and runs:
+
+- writer clients that create notes (POST /api/messages) and edit them
+  (PUT /api/messages/<id>), both of which run entity extraction
+- reader clients that poll /api/messages and /api/stats like the web UI
+- a separate process that inserts memos exactly like trans.pyw's log_message
+
+It reports throughput, p50/p95/p99 latency, HTTP errors and SQLite lock
+errors per stage. With --ramp, the number of writer and reader clients is
+multiplied stage by stage to find the concurrency ceiling.
+
+Usage:
+    python benchmarks/generate_db.py --messages 10000 --output bench_10000.db
+    python benchmarks/load_test.py --db bench_10000.db --writers 4 --readers 8 --duration 30
+    python benchmarks/load_test.py --db bench_10000.db --ramp 1,2,4,8 --save load_results.json
+
+Run from the repository root, so that config.json is found.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+SAMPLE_TRANSCRIPTS = [
+    "Erinnerung: Sarah Müller wegen Budgetplanung anrufen, Termin nächsten Montag.",
+    "Meeting mit Thomas Weber von Nord Tech GmbH in Hamburg zum Projekt Apollo.",
+    "Idee für Kompass: mit Alpen Systems über Datenschutz sprechen, evtl. Workshop in München.",
+    "Kurzes Update zu Phoenix: Onboarding ist erledigt, offene Punkte mit Julia Koch besprechen.",
+]
+
+
+def free_port():
+    """Return a TCP port that is free right now."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered, q):
+    """Return the q-quantile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Recorder:
+    """Thread-safe collection of (operation, latency, outcome) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # operation -> list of latencies
+        self.errors = {}  # operation -> error count
+
+    def record(self, operation, latency, ok):
+        with self._lock:
+            self.samples.setdefault(operation, []).append(latency)
+            if not ok:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, duration):
+        """Summarize the samples per operation (latencies in milliseconds)."""
+        result = {}
+        for operation, latencies in sorted(self.samples.items()):
+            ordered = sorted(latencies)
+            result[operation] = {
+                "requests": len(ordered),
+                "throughput_rps": round(len(ordered) / duration, 2),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+                "errors": self.errors.get(operation, 0),
+            }
+        return result
+
+
+def timed_request(session, recorder, operation, method, url, **kwargs):
+    """Send a request and record its latency; returns the response or None."""
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=120, **kwargs)
+    except requests.RequestException:
+        recorder.record(operation, time.perf_counter() - started, False)
+        return None
+    recorder.record(operation, time.perf_counter() - started, response.status_code < 400)
+    return response
+
+
+def writer_client(base_url, recorder, stop, seed):
+    """Create notes and edit the ones created before, until stopped."""
+    rng = random.Random(seed)
+    session = requests.Session()
+    created = []
+    while not stop.is_set():
+        if created and rng.random() < 0.3:
+            timed_request(session, recorder, "PUT /api/messages/<id>", "PUT",
+                          f"{base_url}/api/messages/{rng.choice(created)}",
+                          json={"transcript": rng.choice(SAMPLE_TRANSCRIPTS) + " (bearbeitet)"})
+        else:
+            response = timed_request(session, recorder, "POST /api/messages", "POST", f"{base_url}/api/messages",
+                                     json={"timestamp": datetime.now().isoformat(),
+                                           "transcript": rng.choice(SAMPLE_TRANSCRIPTS)})
+            if response is not None and response.status_code == 201:
+                created.append(response.json()["id"])
+
+
+def reader_client(base_url, recorder, stop, seed, poll_interval):
+    """Poll the message list and the statistics like the web UI, until stopped."""
+    rng = random.Random(seed)
+    session = requests.Session()
+    while not stop.is_set():
+        timed_request(session, recorder, "GET /api/messages", "GET", f"{base_url}/api/messages")
+        timed_request(session, recorder, "GET /api/stats", "GET", f"{base_url}/api/stats")
+        stop.wait(poll_interval * (0.5 + rng.random()))
+
+
+def recorder_process(db_path, rate, duration, results):
+    """
+    Insert memos like trans.pyw's log_message, at `rate` memos per second.
+
+    Each insert opens its own connection with the default timeout, exactly
+    as log_message does.
+    """
+    latencies, lock_errors, other_errors = [], 0, 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn = sqlite3.connect(str(db_path))
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO messages (timestamp, transcript) VALUES (?, ?)",
+                (datetime.now().isoformat(), random.choice(SAMPLE_TRANSCRIPTS))
+            )
+            conn.commit()
+            conn.close()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                lock_errors += 1
+            else:
+                other_errors += 1
+        time.sleep(max(0.0, 1.0 / rate - (time.perf_counter() - started)))
+    results.put({"latencies": latencies, "lock_errors": lock_errors, "other_errors": other_errors})
+
+
+def serve(port, db_path, llm_url):
+    """Run the web app for the load test (called in the server subprocess)."""
+    os.environ["TRANSCRIPTS_DB"] = db_path
+    import app as app_module
+    app_module.init_db()  # Bring older benchmark databases up to the current schema
+    app_module.config.config["llm"]["provider"] = "ollama"
+    app_module.config.config["llm"]["ollama"] = {"base_url": llm_url, "model": "loadtest"}
+    app_module.config.config["routing"]["enabled"] = False
+    app_module.app.run(host="127.0.0.1", port=port, threaded=True, debug=False, use_reloader=False)
+
+
+def wait_for(url, timeout=30):
+    """Wait until a URL answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up")
+
+
+def run_stage(base_url, db_path, writers, readers, duration, memo_rate, poll_interval, server_log):
+    """Run one load stage and return its results."""
+    recorder = Recorder()
+    stop = threading.Event()
+    log_offset = server_log.stat().st_size
+
+    results_queue = multiprocessing.Queue()
+    memo_writer = multiprocessing.Process(target=recorder_process,
+                                          args=(db_path, memo_rate, duration, results_queue))
+    memo_writer.start()
+
+    threads = [threading.Thread(target=writer_client, args=(base_url, recorder, stop, i))
+               for i in range(writers)]
+    threads += [threading.Thread(target=reader_client, args=(base_url, recorder, stop, 1000 + i, poll_interval))
+                for i in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    memo_results = results_queue.get()
+    memo_writer.join()
+
+    # The app does not catch SQLite errors, so they show up as tracebacks in the server log
+    with open(server_log, "r", encoding="utf-8", errors="replace") as f:
+        f.seek(log_offset)
+        server_lock_errors = f.read().count("database is locked")
+
+    memo_latencies = sorted(memo_results["latencies"])
+    return {
+        "writers": writers,
+        "readers": readers,
+        "duration_s": round(elapsed, 1),
+        "operations": recorder.summary(elapsed),
+        "trans_log_message": {
+            "inserts": len(memo_latencies),
+            "p50_ms": round(percentile(memo_latencies, 0.50) * 1000, 1) if memo_latencies else None,
+            "p99_ms": round(percentile(memo_latencies, 0.99) * 1000, 1) if memo_latencies else None,
+            "lock_errors": memo_results["lock_errors"],
+            "other_errors": memo_results["other_errors"],
+        },
+        "server_lock_errors": server_lock_errors,
+    }
+
+
+def print_stage(stage):
+    print(f"\n=== {stage['writers']} writers, {stage['readers']} readers, {stage['duration_s']}s ===")
+    print(f"{'operation':26} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for operation, result in stage["operations"].items():
+        print(f"{operation:26} {result['requests']:9} {result['throughput_rps']:8.2f} {result['p50_ms']:9.1f} "
+              f"{result['p95_ms']:9.1f} {result['p99_ms']:9.1f} {result['errors']:7}")
+    memo = stage["trans_log_message"]
+    print(f"{'trans.pyw log_message':26} {memo['inserts']:9} {'':8} {memo['p50_ms'] or 0:9.1f} {'':9} "
+          f"{memo['p99_ms'] or 0:9.1f} {memo['lock_errors'] + memo['other_errors']:7}")
+    print(f"SQLite lock errors: {stage['server_lock_errors']} in the app, "
+          f"{memo['lock_errors']} in the trans.pyw writer")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the note ingestion path")
+    parser.add_argument("--db", required=True, help="Database generated by benchmarks/generate_db.py")
+    parser.add_argument("--writers", type=int, default=4, help="Clients creating and editing notes")
+    parser.add_argument("--readers", type=int, default=8, help="Clients polling /api/messages and /api/stats")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    parser.add_argument("--ramp", default=None,
+                        help="Comma-separated multipliers of writers/readers, one stage each (e.g. 1,2,4,8)")
+    parser.add_argument("--memo-rate", type=float, default=1.0, help="trans.pyw inserts per second")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Mean pause between reader polls in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latency of the LLM stand-in in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Random extra LLM latency in seconds")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of malformed LLM responses")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--serve", nargs=3, metavar=("PORT", "DB", "LLM_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(int(args.serve[0]), args.serve[1], args.serve[2])
+        return
+
+    from fake_ollama import start_server
+
+    workdir = Path(tempfile.mkdtemp(prefix="transprogram-load-"))
+    db_path = workdir / "transcripts.db"
+    shutil.copy(args.db, db_path)
+    server_log = workdir / "server.log"
+
+    llm = start_server(latency=args.llm_latency, jitter=args.llm_jitter, malformed_rate=args.malformed_rate)
+    llm_url = f"http://127.0.0.1:{llm.server_port}"
+
+    port = free_port()
+    with open(server_log, "w") as log:
+        server = subprocess.Popen([sys.executable, __file__, "--db", args.db, "--serve", str(port), str(db_path), llm_url],
+                                  stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    stages = []
+    try:
+        wait_for(f"{base_url}/api/stats")
+        multipliers = [int(m) for m in args.ramp.split(",")] if args.ramp else [1]
+        for multiplier in multipliers:
+            stage = run_stage(base_url, db_path, args.writers * multiplier, args.readers * multiplier,
+                              args.duration, args.memo_rate, args.poll_interval, server_log)
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        server.terminate()
+        server.wait()
+        llm.shutdown()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"created_at": datetime.now().isoformat(timespec="seconds"),
+                       "settings": {k: v for k, v in vars(args).items() if k != "serve"},
+                       "stages": stages}, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved results to {args.save}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
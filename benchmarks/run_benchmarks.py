@@ -0,0 +1,293 @@
+"""
+Benchmarks for the web app's hot paths against a synthetic database.
+
+Runs the endpoints through Flask's test client (no network), extraction
+against the local Ollama stand-in with zero latency, and response parsing
+in isolation. The database is copied first, because merging and extraction
+modify it.
+
+Usage:
+    python benchmarks/generate_db.py --messages 100000 --output bench_100000.db
+    python benchmarks/run_benchmarks.py --db bench_100000.db --save benchmarks/baselines/100k.json
+    python benchmarks/run_benchmarks.py --db bench_100000.db --compare benchmarks/baselines/100k.json
+
+Run from the repository root, so that config.json is found.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_ollama import FakeOllama, start_server
+
+# name -> (setup function, default number of iterations)
+BENCHMARKS = {}
+
+
+def benchmark(name, iterations=20):
+    """Register a benchmark. The decorated function gets the context and returns the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, iterations)
+        return setup
+    return register
+
+
+class BenchContext:
+    """Shared state of a benchmark run."""
+
+    def __init__(self, app_module, db_path, seed):
+        self.app = app_module
+        self.client = app_module.app.test_client()
+        self.db_path = db_path
+        self.rng = random.Random(seed)
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+
+@benchmark("get_messages", iterations=5)
+def bench_get_messages(ctx):
+    def run():
+        response = ctx.client.get("/api/messages")
+        return response.status_code == 200
+    return run
+
+
+@benchmark("get_messages_month", iterations=20)
+def bench_get_messages_month(ctx):
+    last = ctx.query("SELECT MAX(timestamp) FROM messages")[0][0]
+    end = datetime.fromisoformat(last)
+    start = end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def run():
+        response = ctx.client.get("/api/messages", query_string={
+            "start_date": start.isoformat(), "end_date": end.isoformat()
+        })
+        return response.status_code == 200
+    return run
+
+
+@benchmark("get_stats", iterations=50)
+def bench_get_stats(ctx):
+    def run():
+        return ctx.client.get("/api/stats").status_code == 200
+    return run
+
+
+@benchmark("get_all_entities", iterations=50)
+def bench_get_all_entities(ctx):
+    def run():
+        return ctx.client.get("/api/entities").status_code == 200
+    return run
+
+
+@benchmark("merge_entities", iterations=20)
+def bench_merge_entities(ctx):
+    # Merge pairs of entities of the same type; each pair is used once
+    rows = ctx.query("SELECT id, type, label, color FROM entities ORDER BY id")
+    by_type = {}
+    for row in rows:
+        by_type.setdefault(row[1], []).append(row)
+    pairs = []
+    for entities in by_type.values():
+        ctx.rng.shuffle(entities)
+        pairs.extend(zip(entities[0::2], entities[1::2]))
+    ctx.rng.shuffle(pairs)
+
+    def run():
+        first, second = pairs.pop()
+        response = ctx.client.post("/api/entities/merge", json={
+            "entity_ids": [first[0], second[0]],
+            "merged_entity": {"type": first[1], "label": first[2], "color": first[3]}
+        })
+        return response.status_code == 200
+    return run
+
+
+@benchmark("extract_and_save_entities", iterations=50)
+def bench_extract_and_save_entities(ctx):
+    # Every n-th message, spread over the whole table
+    count = ctx.query("SELECT COUNT(*) FROM messages")[0][0]
+    messages = ctx.query("SELECT id, transcript FROM messages WHERE id % ? = 0 LIMIT 1000", (max(1, count // 1000),))
+
+    def run():
+        message_id, transcript = ctx.rng.choice(messages)
+        entities, error = ctx.app.extract_and_save_entities(message_id, transcript)
+        return error is None
+    return run
+
+
+@benchmark("semantic_search", iterations=50)
+def bench_semantic_search(ctx):
+    # Exhaustive search over an index built with the dependency-free hashing embedder
+    from semantic_index import SemanticIndex, HashingEmbedder
+
+    index = SemanticIndex(str(Path(ctx.db_path).parent / "embeddings"), HashingEmbedder(), batch_size=1000)
+    started = time.perf_counter()
+    index.sync(ctx.app.get_db_connection)
+    print(f"{'(semantic index build)':28} {index.size} vectors in {time.perf_counter() - started:.1f}s")
+    queries = ["Budgetplanung mit dem Team", "Reise nach Hamburg", "Angebot schicken", "Kundenfeedback Projekt"]
+
+    def run():
+        return len(index.search(ctx.rng.choice(queries), 10)) == 10
+    return run
+
+
+@benchmark("parse_llm_response", iterations=50)
+def bench_parse_llm_response(ctx):
+    # 100 responses per iteration, a third of them truncated or wrapped in prose
+    from llm_client import LLMClient
+
+    fake = FakeOllama(malformed_rate=0.3, seed=1)
+    client = LLMClient("ollama", ctx.app.config.get_llm_config()["ollama"])
+    transcripts = [row[0] for row in ctx.query("SELECT transcript FROM messages ORDER BY id LIMIT 100")]
+    responses = [fake.completion(f"Text to analyze:\n{text}\nReturn ONLY") for text in transcripts]
+
+    def run():
+        for response in responses:
+            client._parse_llm_response(response)
+        return True
+    return run
+
+
+def summarize(timings):
+    """Summarize timings (seconds) as milliseconds."""
+    ordered = sorted(timings)
+    return {
+        "iterations": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def run_benchmarks(db, names, iterations=None, seed=42):
+    """
+    Run the selected benchmarks on a copy of the database.
+
+    Returns:
+        A dictionary with run metadata and results per benchmark
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="transprogram-bench-"))
+    db_copy = workdir / "transcripts.db"
+    shutil.copy(db, db_copy)
+
+    # Point the app at the copy and at a stand-in LLM without latency
+    os.environ["TRANSCRIPTS_DB"] = str(db_copy)
+    server = start_server(latency=0.0)
+    import app as app_module
+    app_module.init_db()  # Bring older benchmark databases up to the current schema
+    app_module.config.config["llm"]["provider"] = "ollama"
+    app_module.config.config["llm"]["ollama"] = {
+        "base_url": f"http://127.0.0.1:{server.server_port}", "model": "benchmark"
+    }
+    app_module.config.config["routing"]["enabled"] = False
+
+    ctx = BenchContext(app_module, str(db_copy), seed)
+    messages = ctx.query("SELECT COUNT(*) FROM messages")[0][0]
+    entities = ctx.query("SELECT COUNT(*) FROM entities")[0][0]
+    links = ctx.query("SELECT COUNT(*) FROM note_entities")[0][0]
+
+    results = {}
+    for name in names:
+        setup, default_iterations = BENCHMARKS[name]
+        run = setup(ctx)
+        run()  # Warm-up
+        timings, errors = [], 0
+        for _ in range(iterations or default_iterations):
+            started = time.perf_counter()
+            ok = run()
+            timings.append(time.perf_counter() - started)
+            errors += 0 if ok else 1
+        results[name] = summarize(timings)
+        results[name]["errors"] = errors
+        print(f"{name:28} median {results[name]['median_ms']:10.3f} ms   p95 {results[name]['p95_ms']:10.3f} ms"
+              + (f"   errors {errors}" if errors else ""))
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "messages": messages,
+            "entities": entities,
+            "note_entities": links,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Print current medians against a baseline.
+
+    Returns:
+        The names of the benchmarks that got slower than threshold x baseline
+    """
+    regressions = []
+    print(f"\n{'benchmark':28} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:28} {'-':>12} {result['median_ms']:12.3f}")
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        marker = "  SLOWER" if ratio > threshold else ("  faster" if ratio < 1 / threshold else "")
+        print(f"{name:28} {base['median_ms']:12.3f} {result['median_ms']:12.3f} {ratio:8.2f}{marker}")
+        if ratio > threshold:
+            regressions.append(name)
+    if baseline["meta"].get("messages") != current["meta"]["messages"]:
+        print("\nNote: the baseline was measured on a database of a different size")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--db", required=True, help="Database generated by benchmarks/generate_db.py")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--iterations", type=int, default=None, help="Iterations per benchmark (default: per benchmark)")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a saved baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Ratio to the baseline median counted as a regression (exit code 1)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.db, args.only or list(BENCHMARKS), args.iterations)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
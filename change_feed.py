@@ -0,0 +1,111 @@
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Any
+
+class ChangeFeed:
+    """
+    Watches the change_log table, which database triggers fill on every write
+    to messages, entities and note_entities.
+
+    One background thread polls the newest change id and wakes up the
+    waiting event streams; each stream then reads the changes after its own
+    position, so reconnecting clients can resume with Last-Event-ID. Writes
+    from other processes (trans.pyw) are seen because the triggers live in
+    the database. Old rows are pruned by a trigger (see init_db in app.py).
+    """
+
+    def __init__(self, connect: Callable, interval: float = 0.5):
+        """
+        Initialize the feed.
+
+        Args:
+            connect: Function returning a new database connection (with sqlite3.Row rows)
+            interval: Seconds between polls of the change log
+        """
+        self.connect = connect
+        self.interval = interval
+
+        self._latest_id = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _query_latest_id(self) -> int:
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) AS id FROM change_log").fetchone()['id']
+        finally:
+            conn.close()
+
+    def _ensure_started(self) -> None:
+        """Start the watcher thread on first use."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._latest_id = self._query_latest_id()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                latest_id = self._query_latest_id()
+            except Exception as e:
+                print(f"Error polling the change log: {e}")
+                continue
+
+            with self._condition:
+                if latest_id != self._latest_id:
+                    self._latest_id = latest_id
+                    self._condition.notify_all()
+
+    def latest_id(self) -> int:
+        """Return the id of the newest change."""
+        self._ensure_started()
+        with self._condition:
+            return self._latest_id
+
+    def wait(self, after_id: int, timeout: float) -> int:
+        """
+        Wait until there is a change newer than after_id.
+
+        Args:
+            after_id: The id of the last change the caller has seen
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            The id of the newest change (not greater than after_id on timeout)
+        """
+        self._ensure_started()
+        with self._condition:
+            self._condition.wait_for(lambda: self._latest_id > after_id, timeout=timeout)
+            return self._latest_id
+
+    def changes_since(self, after_id: int, limit: int = 5000) -> List[Dict[str, Any]]:
+        """
+        Read the changes after a given id.
+
+        Args:
+            after_id: The id of the last change the caller has seen
+            limit: Maximum number of changes returned
+
+        Returns:
+            A list of dicts with id, table_name, operation and row_id, oldest first
+        """
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, table_name, operation, row_id FROM change_log WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def oldest_id(self) -> int:
+        """Return the id of the oldest change still in the log (0 if empty)."""
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COALESCE(MIN(id), 0) AS id FROM change_log").fetchone()['id']
+        finally:
+            conn.close()
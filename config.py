@@ -24,6 +24,57 @@ class Config:
                 "api_key": "",
                 "model": "claude-3-opus-20240229"
             }
+        },
+        # Latency-aware routing across providers (used instead of "provider" when enabled)
+        "routing": {
+            "enabled": False,
+            "providers": ["ollama", "openai", "anthropic"],
+            "hedge": True,
+            "hedge_after_seconds": None,  # None = p95 latency of the primary provider
+            "min_samples": 5,
+            "max_error_rate": 0.5,
+            "window_seconds": 300
+        },
+        # Per-provider request scheduling (0 = no budget)
+        "rate_limits": {
+            "ollama": {
+                "requests_per_minute": 0,
+                "tokens_per_minute": 0,
+                "max_concurrency": 2
+            },
+            "openai": {
+                "requests_per_minute": 500,
+                "tokens_per_minute": 30000,
+                "max_concurrency": 8
+            },
+            "anthropic": {
+                "requests_per_minute": 50,
+                "tokens_per_minute": 40000,
+                "max_concurrency": 4
+            }
+        },
+        # On-demand request profiling (see profiler.py)
+        "profiling": {
+            "enabled": False,
+            "sample_rate": 0.01,  # Fraction of requests profiled while enabled
+            "routes": [],  # URL rules to sample, e.g. "/api/messages"; empty = all
+            "secret": "",  # Allows profiling single requests with a signed ?profile= parameter
+            "interval_ms": 5,
+            "output_dir": "profiles",
+            "max_profiles": 200,
+            "signature_ttl": 3600  # Seconds a signature from "python profiler.py sign" stays valid
+        },
+        # Semantic search over the transcripts (see semantic_index.py)
+        "semantic_search": {
+            "enabled": False,
+            "provider": "ollama",  # "ollama", "sentence_transformers" or "hashing"
+            "model": "nomic-embed-text",
+            "base_url": "",  # Empty = the Ollama URL of the llm section
+            "dtype": "float32",  # "float16" halves the index size but makes exhaustive searches slower
+            "index_dir": "embeddings",
+            "batch_size": 32,
+            "clusters": 0,  # Coarse clustering for large archives (0 = search all vectors)
+            "nprobe": 8  # Clusters searched per query
         }
     }
     
@@ -92,6 +143,42 @@ class Config:
         """
         return self.config.get("llm", self.DEFAULT_CONFIG["llm"])
     
+    def get_routing_config(self) -> Dict[str, Any]:
+        """
+        Get the provider routing configuration.
+        
+        Returns:
+            A dictionary with the routing settings
+        """
+        return self.config.get("routing", self.DEFAULT_CONFIG["routing"])
+    
+    def get_rate_limit_config(self) -> Dict[str, Any]:
+        """
+        Get the per-provider rate limits for the LLM request scheduler.
+        
+        Returns:
+            A dictionary mapping provider names to their limits
+        """
+        return self.config.get("rate_limits", self.DEFAULT_CONFIG["rate_limits"])
+    
+    def get_profiling_config(self) -> Dict[str, Any]:
+        """
+        Get the request profiling configuration.
+        
+        Returns:
+            A dictionary with the profiling settings
+        """
+        return self.config.get("profiling", self.DEFAULT_CONFIG["profiling"])
+    
+    def get_semantic_search_config(self) -> Dict[str, Any]:
+        """
+        Get the semantic search configuration.
+        
+        Returns:
+            A dictionary with the embedding and index settings
+        """
+        return self.config.get("semantic_search", self.DEFAULT_CONFIG["semantic_search"])
+    
     def update_llm_config(self, provider: Optional[str] = None, **kwargs) -> None:
         """
         Update the LLM configuration.
@@ -0,0 +1,276 @@
+"""
+Finds entities that probably name the same thing, e.g. "Sarah Müller",
+"sarah müller" and "S. Müller", or "Acme Corp" and "ACME Corporation".
+
+Labels are normalized (case, punctuation, word order, legal suffixes) and
+split into character trigrams. Only entities of the same type that share
+enough of their rarest trigrams to reach the threshold are compared (prefix
+filtering with an inverted index), and trigrams that occur in very many
+labels are left out, so the work grows with the number of similar pairs
+instead of the square of the entity count. Pairs above the similarity
+threshold are joined into clusters.
+
+To print the proposed clusters of a database:
+
+    python entity_dedup.py transcripts.db --threshold 0.8
+"""
+
+import re
+import sys
+import math
+import sqlite3
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Any
+
+# Dropped from labels before comparing, unless nothing else is left
+LEGAL_SUFFIXES = {"ag", "co", "corp", "corporation", "gmbh", "inc", "kg", "llc", "ltd", "mbh", "se", "ug"}
+
+# Similarity given to "S. Müller" / "Sarah Müller" when the abbreviation fits only one label
+ABBREVIATION_SCORE = 0.9
+
+def label_tokens(label: str) -> List[str]:
+    """Split a label into lowercase words without punctuation."""
+    text = unicodedata.normalize("NFKC", label).casefold()
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+def is_abbreviated(tokens: List[str]) -> bool:
+    """Check whether all words but the last are initials, as in "S. Müller"."""
+    return len(tokens) >= 2 and all(len(token) == 1 for token in tokens[:-1])
+
+def initials_conflict(a: List[str], b: List[str]) -> bool:
+    """
+    Check whether two labels with the same number of words differ in the first
+    letter of a word, as "T. Schneider" and "S. Schneider" or "Anna Koch" and
+    "Jana Koch", which trigrams alone would count as similar.
+    """
+    return len(a) == len(b) and any(x[0] != y[0] for x, y in zip(a, b))
+
+def normalize_label(label: str) -> str:
+    """
+    Build the comparison key of a label.
+
+    Returns:
+        The lowercase words in sorted order, without punctuation and legal suffixes
+    """
+    tokens = label_tokens(label)
+    words = [token for token in tokens if token not in LEGAL_SUFFIXES]
+    return " ".join(sorted(words or tokens))
+
+def trigrams(key: str) -> set:
+    """Get the character trigrams of a key, padded so that word starts and ends count."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DisjointSet:
+    """Union-find over entity positions, for building clusters from pairs."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+class DuplicateFinder:
+    """Proposes clusters of duplicate entities."""
+
+    def __init__(self, threshold: float = 0.8, max_block_size: int = 500):
+        """
+        Initialize the finder.
+
+        Args:
+            threshold: Minimum trigram similarity (Dice coefficient, 0-1) of a duplicate pair
+            max_block_size: Trigrams shared by more labels than this are not used to find candidates
+        """
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+
+    def find_clusters(self, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Find clusters of duplicate entities.
+
+        Args:
+            entities: Dicts with id, type and label, optionally message_count
+
+        Returns:
+            A list of clusters, largest first. Each has target_id (the entity to
+            keep: the most used one), score (the lowest similarity that joined
+            the cluster) and entities (the dicts passed in).
+        """
+        by_type = defaultdict(list)
+        for entity in entities:
+            by_type[entity["type"]].append(entity)
+
+        clusters = []
+        for group in by_type.values():
+            clusters.extend(self._find_in_type(group))
+
+        clusters.sort(key=lambda cluster: (-len(cluster["entities"]), -cluster["score"], cluster["target_id"]))
+        return clusters
+
+    def _find_in_type(self, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cluster the entities of one type."""
+        tokens = [label_tokens(entity["label"]) for entity in entities]
+        keys = [normalize_label(entity["label"]) for entity in entities]
+        grams = [trigrams(key) for key in keys]
+        pairs = {}  # (i, j) with i < j -> similarity
+
+        # Identical keys are always duplicates
+        by_key = defaultdict(list)
+        for i, key in enumerate(keys):
+            by_key[key].append(i)
+        for positions in by_key.values():
+            for j in positions[1:]:
+                pairs[(positions[0], j)] = 1.0
+
+        # Candidates share two of their rarest trigrams (prefix filtering): with a
+        # similarity of at least t, two labels share at least t / (2 - t) of the
+        # trigrams of each, so with the trigrams of every label sorted by
+        # frequency, the first two they share are among the first
+        # len - ceil(len * t / (2 - t)) + 2 of both. Very short labels may share
+        # only one trigram.
+        frequency = Counter(gram for entity_grams in grams for gram in entity_grams)
+        min_share = self.threshold / (2 - self.threshold)
+        abbreviated = [is_abbreviated(entity_tokens) for entity_tokens in tokens]
+
+        postings = defaultdict(list)
+        required = []  # position -> number of shared trigrams it needs in the prefixes (1 or 2)
+        for i, entity_grams in enumerate(grams):
+            ordered = sorted(entity_grams, key=lambda gram: (frequency[gram], gram))
+            # (rounded down a little, so that pairs exactly at the threshold are kept)
+            min_overlap = math.ceil(len(ordered) * min_share - 1e-9)
+            required.append(min(2, min_overlap))
+            shared = Counter()
+            for gram in ordered[:len(ordered) - min_overlap + required[i]]:
+                if frequency[gram] > self.max_block_size:
+                    break
+                shared.update(postings[gram])
+                postings[gram].append(i)
+
+            if required[i] == 1:
+                candidates = list(shared)
+            else:
+                candidates = [j for j, count in shared.items() if count >= required[j]]
+            for j in candidates:
+                score = 2 * len(entity_grams & grams[j]) / (len(entity_grams) + len(grams[j]))
+                # Abbreviations are matched by _abbreviation_pairs, which checks that they are unambiguous
+                if (score < self.threshold or keys[i] == keys[j] or abbreviated[i] != abbreviated[j]
+                        or initials_conflict(tokens[i], tokens[j])):
+                    continue
+                pairs[(j, i)] = max(score, pairs.get((j, i), 0.0))
+
+        for (i, j), score in self._abbreviation_pairs(entities, keys).items():
+            pairs[(i, j)] = max(score, pairs.get((i, j), 0.0))
+
+        sets = DisjointSet(len(entities))
+        for i, j in pairs:
+            sets.union(i, j)
+
+        members = defaultdict(list)
+        for i in range(len(entities)):
+            members[sets.find(i)].append(i)
+        scores = defaultdict(lambda: 1.0)
+        for (i, j), score in pairs.items():
+            root = sets.find(i)
+            scores[root] = min(scores[root], score)
+
+        clusters = []
+        for root, positions in members.items():
+            if len(positions) < 2:
+                continue
+            cluster_entities = [entities[i] for i in positions]
+            target = max(cluster_entities, key=self._target_rank)
+            clusters.append({
+                "target_id": target["id"],
+                "score": round(scores[root], 3),
+                "entities": cluster_entities,
+            })
+        return clusters
+
+    @staticmethod
+    def _target_rank(entity: Dict[str, Any]):
+        """Prefer the most used entity, then capitalized and longer labels."""
+        label = entity["label"]
+        return (entity.get("message_count", 0), label != label.lower(), len(label), -entity["id"])
+
+    @staticmethod
+    def _abbreviation_pairs(entities: List[Dict[str, Any]], keys: List[str]) -> Dict[tuple, float]:
+        """
+        Pair abbreviated labels ("S. Müller") with the one full label they fit.
+
+        Abbreviations that fit several different labels ("Sarah Müller" and
+        "Stefan Müller") are ambiguous and left alone.
+        """
+        full = defaultdict(set)  # "s müller" -> keys of full labels
+        positions = defaultdict(list)  # key -> positions
+        abbreviated = []
+        for i, entity in enumerate(entities):
+            tokens = label_tokens(entity["label"])
+            if len(tokens) < 2:
+                continue
+            short = " ".join([token[0] for token in tokens[:-1]] + tokens[-1:])
+            if is_abbreviated(tokens):
+                abbreviated.append((i, short))
+            else:
+                full[short].add(keys[i])
+                positions[keys[i]].append(i)
+
+        pairs = {}
+        for i, short in abbreviated:
+            if len(full[short]) == 1:
+                (key,) = full[short]
+                for j in positions[key]:
+                    pairs[(min(i, j), max(i, j))] = ABBREVIATION_SCORE
+        return pairs
+
+def load_entities(conn: sqlite3.Connection, entity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Read the entities with their usage counts.
+
+    Args:
+        conn: Database connection
+        entity_type: Only entities of this type
+
+    Returns:
+        A list of dicts with id, type, label, color and message_count
+    """
+    query = """
+        SELECT e.id, e.type, e.label, e.color, COALESCE(u.message_count, 0) AS message_count
+        FROM entities e
+        LEFT JOIN entity_usage u ON u.entity_id = e.id
+    """
+    params = []
+    if entity_type:
+        query += " WHERE e.type = ?"
+        params.append(entity_type)
+    query += " ORDER BY e.id"
+
+    cursor = conn.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print clusters of probably duplicate entities")
+    parser.add_argument("db", nargs="?", default="transcripts.db", help="Database file")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum similarity (0-1)")
+    parser.add_argument("--type", default=None, help="Only entities of this type")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    clusters = DuplicateFinder(args.threshold).find_clusters(load_entities(conn, args.type))
+    conn.close()
+
+    for cluster in clusters:
+        labels = ", ".join(f"{entity['label']} ({entity['message_count']})" for entity in cluster["entities"])
+        print(f"[{cluster['entities'][0]['type']}] {cluster['score']:.2f}  {labels}")
+    print(f"{len(clusters)} clusters", file=sys.stderr)
@@ -0,0 +1,268 @@
+"""
+Compares extraction prompts and provider/model setups on labeled notes.
+
+The labels are the entities currently linked to the notes (note_entities),
+so a corpus sampled from a curated database measures how close a setup
+comes to the entities that were kept. Every prompt runs with every setup;
+all combinations run concurrently, and the shared rate scheduler keeps each
+provider within its limits.
+
+For each combination the report has precision, recall and F1 overall and per
+entity type, the mean and tail latency, the tokens per note and the share of
+responses that could not be parsed. Entities match when their type and
+normalized label are equal, so "sarah müller" counts for "Sarah Müller".
+
+From the command line:
+
+    python extraction_eval.py --sample 100 --setup ollama:gemma3:12b --setup openai:gpt-4o-mini \\
+        --prompt kurz=prompts/kurz.txt --min-f1 0.8
+"""
+
+import sys
+import copy
+import json
+import random
+import asyncio
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional, Any
+
+from async_llm_client import AsyncLLMClient
+from entity_dedup import normalize_label
+
+# Name of the prompt variant that uses the client's built-in prompt
+DEFAULT_PROMPT_NAME = "default"
+
+def load_corpus(conn: sqlite3.Connection, sample_size: int = 50, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Sample labeled notes: messages with at least one linked entity.
+
+    The same seed gives the same sample as long as the labeled messages do
+    not change, so runs on different days stay comparable.
+
+    Args:
+        conn: Database connection
+        sample_size: Number of notes
+        seed: Random seed for the sample
+
+    Returns:
+        A list of dicts with id, transcript and entities (dicts with type and label)
+    """
+    labeled = [row[0] for row in conn.execute("SELECT DISTINCT message_id FROM note_entities ORDER BY message_id")]
+    sample = sorted(random.Random(seed).sample(labeled, min(sample_size, len(labeled))))
+    if not sample:
+        return []
+
+    placeholders = ",".join(["?"] * len(sample))
+    corpus = {message_id: {"id": message_id, "transcript": transcript, "entities": []}
+              for message_id, transcript in conn.execute(
+                  f"SELECT id, transcript FROM messages WHERE id IN ({placeholders})", sample)}
+    for message_id, entity_type, label in conn.execute(f"""
+        SELECT ne.message_id, e.type, e.label
+        FROM note_entities ne
+        JOIN entities e ON e.id = ne.entity_id
+        WHERE ne.message_id IN ({placeholders})
+    """, sample):
+        corpus[message_id]["entities"].append({"type": entity_type, "label": label})
+    return [corpus[message_id] for message_id in sample]
+
+def entity_keys(entities: List[Dict[str, str]]) -> set:
+    """Get the (type, normalized label) pairs that are compared."""
+    return {(entity["type"], normalize_label(entity["label"])) for entity in entities}
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Return the q-quantile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def ratios(true_positives: int, false_positives: int, false_negatives: int) -> Dict[str, float]:
+    """Compute precision, recall and F1 from match counts."""
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+def summarize(prompt_name: str, provider: str, model: str, corpus: List[Dict[str, Any]],
+              results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Build the report of one combination.
+
+    Args:
+        prompt_name, provider, model: The combination
+        corpus: The labeled notes
+        results: The run_extraction results per note, None where the request failed
+
+    Returns:
+        The report (see evaluate)
+    """
+    counts = defaultdict(lambda: [0, 0, 0])  # type -> [true positives, false positives, false negatives]
+    latencies, tokens, parse_failures, errors = [], [], 0, 0
+
+    for note, result in zip(corpus, results):
+        expected = entity_keys(note["entities"])
+        if result is None:
+            errors += 1
+            predicted = set()
+        else:
+            predicted = entity_keys(result["entities"])
+            latencies.append(result["latency"])
+            tokens.append(result["tokens"])
+            parse_failures += result["parse_failed"]
+
+        for key in predicted & expected:
+            counts[key[0]][0] += 1
+        for key in predicted - expected:
+            counts[key[0]][1] += 1
+        for key in expected - predicted:
+            counts[key[0]][2] += 1
+
+    totals = [sum(type_counts[i] for type_counts in counts.values()) for i in range(3)]
+    by_type = {
+        entity_type: {**ratios(*type_counts), "support": type_counts[0] + type_counts[2]}
+        for entity_type, type_counts in sorted(counts.items())
+    }
+    latencies.sort()
+    answered = len(latencies)
+
+    return {
+        "prompt": prompt_name,
+        "provider": provider,
+        "model": model,
+        "notes": len(corpus),
+        "errors": errors,
+        **ratios(*totals),
+        "by_type": by_type,
+        "latency_mean_ms": round(sum(latencies) / answered * 1000, 1) if answered else None,
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if answered else None,
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if answered else None,
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if answered else None,
+        "tokens_per_note": round(sum(tokens) / answered, 1) if answered else None,
+        "parse_failure_rate": round(parse_failures / answered, 3) if answered else None,
+    }
+
+async def evaluate_combination(corpus: List[Dict[str, Any]], prompt: Dict[str, Any], provider: str,
+                               provider_config: Dict[str, Any], concurrency: int) -> Dict[str, Any]:
+    """Run the corpus through one prompt and setup and summarize the results."""
+    async with AsyncLLMClient(provider=provider, config=provider_config,
+                              prompt_template=prompt.get("prompt")) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(note):
+            async with semaphore:
+                try:
+                    return await client.run_extraction(note["transcript"])
+                except Exception as e:
+                    print(f"Error evaluating {provider}/{client.config['model']} on message {note['id']}: {e}")
+                    return None
+
+        results = await asyncio.gather(*(run(note) for note in corpus))
+        return summarize(prompt["name"], provider, client.config["model"], corpus, results)
+
+async def evaluate(corpus: List[Dict[str, Any]], prompts: List[Dict[str, Any]], setups: List[Dict[str, Any]],
+                   llm_config: Dict[str, Any], concurrency: int = 10) -> List[Dict[str, Any]]:
+    """
+    Evaluate every prompt with every setup.
+
+    Args:
+        corpus: Labeled notes from load_corpus
+        prompts: Dicts with name and prompt (a template as in fill_prompt_template;
+            None for the built-in prompt)
+        setups: Dicts with provider and optionally model (defaults to the configured one)
+        llm_config: The "llm" configuration section with the provider settings
+        concurrency: Maximum extractions in flight per combination
+
+    Returns:
+        One report per combination, in the order prompts x setups, with prompt,
+        provider, model, notes, errors (failed requests), precision, recall,
+        f1, by_type (precision, recall, f1 and support per entity type),
+        latency_mean_ms, latency_p50_ms, latency_p95_ms, latency_p99_ms,
+        tokens_per_note and parse_failure_rate
+    """
+    runs = []
+    for prompt in prompts:
+        for setup in setups:
+            # A copy per client, so a model override does not leak into the configuration
+            provider_config = copy.deepcopy(llm_config.get(setup["provider"], {}))
+            if setup.get("model"):
+                provider_config["model"] = setup["model"]
+            runs.append(evaluate_combination(corpus, prompt, setup["provider"], provider_config, concurrency))
+    return list(await asyncio.gather(*runs))
+
+def recommend(reports: List[Dict[str, Any]], min_f1: float) -> Optional[Dict[str, Any]]:
+    """
+    Pick the cheapest combination that is accurate enough.
+
+    Args:
+        reports: Reports from evaluate
+        min_f1: Minimum overall F1
+
+    Returns:
+        The report with the fewest tokens per note (then the lowest p95
+        latency) among those reaching min_f1 without failed requests, or None
+    """
+    candidates = [report for report in reports
+                  if report["f1"] >= min_f1 and not report["errors"] and report["tokens_per_note"] is not None]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda report: (report["tokens_per_note"], report["latency_p95_ms"]))
+
+if __name__ == "__main__":
+    import os
+    import argparse
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Compare extraction prompts and providers on labeled notes")
+    parser.add_argument("--db", default=os.environ.get("TRANSCRIPTS_DB", "transcripts.db"), help="Database file")
+    parser.add_argument("--sample", type=int, default=50, help="Number of labeled notes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the sample")
+    parser.add_argument("--setup", action="append", default=[],
+                        help="provider or provider:model, repeatable (default: the configured provider)")
+    parser.add_argument("--prompt", action="append", default=[],
+                        help="name=file with a prompt template, repeatable (the built-in prompt is always included)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Extractions in flight per combination")
+    parser.add_argument("--min-f1", type=float, default=None, help="Recommend the cheapest setup with at least this F1")
+    parser.add_argument("--json", action="store_true", help="Print the full reports as JSON")
+    args = parser.parse_args()
+
+    llm_config = Config().get_llm_config()
+    setups = [dict(zip(("provider", "model"), setup.split(":", 1))) for setup in args.setup]
+    setups = setups or [{"provider": llm_config.get("provider", "ollama")}]
+    prompts = [{"name": DEFAULT_PROMPT_NAME, "prompt": None}]
+    for prompt in args.prompt:
+        name, path = prompt.split("=", 1)
+        with open(path, encoding="utf-8") as f:
+            prompts.append({"name": name, "prompt": f.read()})
+
+    conn = sqlite3.connect(args.db)
+    corpus = load_corpus(conn, args.sample, args.seed)
+    conn.close()
+    if not corpus:
+        raise SystemExit("No labeled notes found (messages need linked entities)")
+
+    reports = asyncio.run(evaluate(corpus, prompts, setups, llm_config, args.concurrency))
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    else:
+        print(f"{len(corpus)} notes\n")
+        print(f"{'prompt':<12} {'provider/model':<32} {'P':>6} {'R':>6} {'F1':>6} {'mean ms':>9} {'p95 ms':>9} "
+              f"{'tokens':>8} {'parse err':>9} {'errors':>6}")
+        for report in reports:
+            print(f"{report['prompt']:<12} {report['provider'] + '/' + report['model']:<32} "
+                  f"{report['precision']:>6.3f} {report['recall']:>6.3f} {report['f1']:>6.3f} "
+                  f"{report['latency_mean_ms'] or 0:>9.1f} {report['latency_p95_ms'] or 0:>9.1f} "
+                  f"{report['tokens_per_note'] or 0:>8.1f} {report['parse_failure_rate'] or 0:>9.3f} {report['errors']:>6}")
+            for entity_type, scores in report["by_type"].items():
+                print(f"{'':<12}   {entity_type:<30} {scores['precision']:>6.3f} {scores['recall']:>6.3f} "
+                      f"{scores['f1']:>6.3f}  ({scores['support']})")
+
+    if args.min_f1 is not None:
+        best = recommend(reports, args.min_f1)
+        if best:
+            print(f"\nRecommended: {best['provider']}/{best['model']} with prompt {best['prompt']} "
+                  f"(F1 {best['f1']}, {best['tokens_per_note']} tokens per note, p95 {best['latency_p95_ms']} ms)",
+                  file=sys.stderr)
+        else:
+            print(f"\nNo setup reaches F1 {args.min_f1} without errors", file=sys.stderr)
@@ -1,8 +1,47 @@
 import os
 import json
 import random
+import threading
 import requests
-from typing import Dict, List, Optional, Tuple, Union, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Union, Any
+
+import metrics
+import rate_limiter
+from rate_limiter import RateScheduler, RequestSlot
+
+class LLMResponseError(Exception):
+    """Raised when an LLM provider is unreachable or returns no usable entity JSON."""
+
+
+def fill_prompt_template(template: str, text: str) -> str:
+    """
+    Insert the text to analyze into an extraction prompt template.
+    
+    Args:
+        template: The prompt, optionally containing {text}
+        text: The note text to analyze
+    
+    Returns:
+        The complete prompt. Without {text}, the text goes after the
+        "Text to analyze:" line, or at the end if there is none.
+    """
+    if "{text}" in template:
+        return template.replace("{text}", text)
+    
+    lines = template.split('\n')
+    for i, line in enumerate(lines):
+        if "Text to analyze:" in line:
+            # Content after "Text to analyze:" is replaced by the text
+            if line.strip() != "Text to analyze:":
+                lines[i] = "Text to analyze:"
+            lines.insert(i + 1, text)
+            break
+    else:
+        lines.append("Text to analyze:")
+        lines.append(text)
+    
+    return '\n'.join(lines)
+
 
 class LLMClient:
     """
@@ -21,82 +60,100 @@ class LLMClient:
         "other": "#808080"       # Gray
     }
     
-    def __init__(self, provider: str = "ollama", config: Optional[Dict[str, Any]] = None):
+    # Entity types the extraction prompt and schema know about
+    ENTITY_TYPES = ["person", "project", "company", "topic", "location", "date"]
+    
+    # Compact schema for the providers' structured-output modes.
+    # The root is an object because OpenAI and Anthropic require one.
+    ENTITY_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "entities": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": ENTITY_TYPES + ["other"]},
+                        "label": {"type": "string"}
+                    },
+                    "required": ["type", "label"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["entities"],
+        "additionalProperties": False
+    }
+    
+    # A single entity is ~15 tokens, so this leaves room for ~30 entities
+    DEFAULT_MAX_TOKENS = 512
+    
+    # Default extraction prompt; {text} is replaced by the note
+    EXTRACTION_PROMPT = """
+Extract the following entity types from this text:
+- person: Names of people mentioned
+- project: Project names or initiatives
+- company: Company or organization names
+- topic: Key topics or subjects discussed
+- location: Places mentioned
+- date: Dates or time periods mentioned
+
+Text to analyze:
+{text}
+
+Return ONLY a JSON object with an "entities" array of objects with 'type' and 'label' properties, like this:
+{"entities": [
+  {"type": "person", "label": "John Smith"},
+  {"type": "company", "label": "Acme Corp"},
+  {"type": "topic", "label": "AI Development"}
+]}
+
+Do not include any explanations or other text, just the JSON object.
+"""
+    
+    def __init__(self, provider: str = "ollama", config: Optional[Dict[str, Any]] = None,
+                 scheduler: Optional[RateScheduler] = None, prompt_template: Optional[str] = None):
         """
         Initialize the LLM client.
         
         Args:
             provider: The LLM provider to use ('ollama', 'openai', or 'anthropic')
             config: Configuration for the LLM provider
+            scheduler: Rate scheduler for provider requests, defaults to the shared one
+            prompt_template: Extraction prompt to use instead of EXTRACTION_PROMPT (see fill_prompt_template)
         """
-        self.provider = provider.lower()
-        self.config = config or {}
-        
-        # Set default configurations if not provided
-        if self.provider == "ollama":
-            self.config.setdefault("base_url", "http://host.docker.internal:11434")
-            self.config.setdefault("model", "gemma3:12b")
-        elif self.provider == "openai":
-            self.config.setdefault("api_key", os.environ.get("OPENAI_API_KEY", ""))
-            self.config.setdefault("model", "gpt-4o")
-        elif self.provider == "anthropic":
-            self.config.setdefault("api_key", os.environ.get("ANTHROPIC_API_KEY", ""))
-            self.config.setdefault("model", "claude-3-opus-20240229")
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        self._configure(provider, config, scheduler, prompt_template)
         
         # Check connectivity during initialization
         self.is_connected = self.check_connectivity()
         if not self.is_connected:
             print(f"Warning: Could not connect to {self.provider} LLM service. Entity extraction may not work.")
     
-    def extract_entities(self, text: str) -> List[Dict[str, str]]:
-        """
-        Extract entities from the given text using the configured LLM provider.
-        
-        Args:
-            text: The text to extract entities from
-            
-        Returns:
-            A list of entity dictionaries with 'type', 'label', and 'color' keys
-        """
-        if self.provider == "ollama":
-            return self._extract_with_ollama(text)
-        elif self.provider == "openai":
-            return self._extract_with_openai(text)
-        elif self.provider == "anthropic":
-            return self._extract_with_anthropic(text)
-        else:
-            raise ValueError(f"Unsupported provider: {self.provider}")
-    
-    def _extract_with_ollama(self, text: str) -> List[Dict[str, str]]:
+    def _extract_with_ollama(self, text: str, raise_errors: bool = False) -> List[Dict[str, str]]:
         """Extract entities using local Ollama."""
         try:
             prompt = self._create_extraction_prompt(text)
             
-            response = requests.post(
-                f"{self.config['base_url']}/api/generate",
-                json={
-                    "model": self.config["model"],
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,  # Low temperature for more deterministic results
-                    }
-                }
-            )
-            
-            response.raise_for_status()
-            result = response.json()
+            with self._request_slot(prompt) as slot:
+                response = requests.post(
+                    f"{self.config['base_url']}/api/generate",
+                    json=self._ollama_payload(prompt, stream=False)
+                )
+                
+                response.raise_for_status()
+                result = response.json()
+                slot.record_usage(result.get("prompt_eval_count", 0) + result.get("eval_count", 0))
             
             # Parse the response to extract entities
             return self._parse_llm_response(result["response"])
             
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error extracting entities with Ollama: {e}")
             return []
     
-    def _extract_with_openai(self, text: str) -> List[Dict[str, str]]:
+    def _extract_with_openai(self, text: str, raise_errors: bool = False) -> List[Dict[str, str]]:
         """Extract entities using OpenAI API."""
         try:
             import openai
@@ -104,23 +161,21 @@ class LLMClient:
             
             prompt = self._create_extraction_prompt(text)
             
-            response = client.chat.completions.create(
-                model=self.config["model"],
-                messages=[
-                    {"role": "system", "content": "You are an expert at extracting named entities from text."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Low temperature for more deterministic results
-            )
+            with self._request_slot(prompt) as slot:
+                response = client.chat.completions.create(**self._openai_request(prompt))
+                if response.usage:
+                    slot.record_usage(response.usage.total_tokens)
             
             # Parse the response to extract entities
             return self._parse_llm_response(response.choices[0].message.content)
             
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error extracting entities with OpenAI: {e}")
             return []
     
-    def _extract_with_anthropic(self, text: str) -> List[Dict[str, str]]:
+    def _extract_with_anthropic(self, text: str, raise_errors: bool = False) -> List[Dict[str, str]]:
         """Extract entities using Anthropic API."""
         try:
             import anthropic
@@ -128,46 +183,194 @@ class LLMClient:
             
             prompt = self._create_extraction_prompt(text)
             
-            response = client.messages.create(
-                model=self.config["model"],
-                max_tokens=1000,
-                system="You are an expert at extracting named entities from text.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Low temperature for more deterministic results
-            )
+            with self._request_slot(prompt) as slot:
+                response = client.messages.create(**self._anthropic_request(prompt))
+                slot.record_usage(response.usage.input_tokens + response.usage.output_tokens)
             
             # Parse the response to extract entities
-            return self._parse_llm_response(response.content[0].text)
+            return self._parse_llm_response(self._anthropic_response_text(response))
             
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error extracting entities with Anthropic: {e}")
             return []
     
+    def _ollama_payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        """Build the request body for Ollama's /api/generate."""
+        payload = {
+            "model": self.config["model"],
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": 0.1,  # Low temperature for more deterministic results
+                "num_predict": self.config["max_tokens"],
+            }
+        }
+        if self.config["structured_output"]:
+            # Ollama constrains the output to the given JSON schema
+            payload["format"] = self.ENTITY_SCHEMA
+        return payload
+    
+    def _openai_request(self, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        """Build the keyword arguments for OpenAI's chat.completions.create."""
+        kwargs = {
+            "model": self.config["model"],
+            "messages": [
+                {"role": "system", "content": "You are an expert at extracting named entities from text."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,  # Low temperature for more deterministic results
+            "max_tokens": self.config["max_tokens"],
+        }
+        if self.config["structured_output"]:
+            kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "entities",
+                    "schema": self.ENTITY_SCHEMA,
+                    "strict": True
+                }
+            }
+        if stream:
+            kwargs["stream"] = True
+            # Report token usage in a final chunk so the scheduler can account for it
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
+    
+    def _anthropic_request(self, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        """Build the keyword arguments for Anthropic's messages.create."""
+        kwargs = {
+            "model": self.config["model"],
+            "max_tokens": self.config["max_tokens"],
+            "system": "You are an expert at extracting named entities from text.",
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,  # Low temperature for more deterministic results
+        }
+        if self.config["structured_output"]:
+            # Force a call to a single tool whose input is the entity schema
+            kwargs["tools"] = [{
+                "name": "record_entities",
+                "description": "Record the entities extracted from the text.",
+                "input_schema": self.ENTITY_SCHEMA
+            }]
+            kwargs["tool_choice"] = {"type": "tool", "name": "record_entities"}
+        if stream:
+            kwargs["stream"] = True
+        return kwargs
+    
+    def stream_entities(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Extract entities while the LLM is still generating its response.
+        
+        Unlike extract_entities, provider errors are raised to the caller so they
+        can be reported on the open stream.
+        
+        Args:
+            text: The text to extract entities from
+            
+        Yields:
+            ('token', str) for each chunk of raw response text,
+            ('entity', dict) as soon as an entity object is complete, and
+            finally ('done', list) with all entities parsed from the full response
+        """
+        prompt = self._create_extraction_prompt(text)
+        
+        if self.provider == "ollama":
+            chunks = self._stream_ollama(prompt)
+        elif self.provider == "openai":
+            chunks = self._stream_openai(prompt)
+        elif self.provider == "anthropic":
+            chunks = self._stream_anthropic(prompt)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        
+        parser = JSONArrayStreamParser()
+        raw_parts = []
+        
+        for chunk in chunks:
+            if not chunk:
+                continue
+            raw_parts.append(chunk)
+            yield "token", chunk
+            for entity in self._normalize_entities(parser.feed(chunk)):
+                yield "entity", entity
+        
+        yield "done", self._parse_llm_response("".join(raw_parts))
+    
+    def _stream_ollama(self, prompt: str) -> Iterator[str]:
+        """Yield response chunks from Ollama's streaming API."""
+        with self._request_slot(prompt, track_latency=False) as slot, requests.post(
+            f"{self.config['base_url']}/api/generate",
+            json=self._ollama_payload(prompt, stream=True),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            # Ollama streams one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                yield data.get("response", "")
+                if data.get("done"):
+                    slot.record_usage(data.get("prompt_eval_count", 0) + data.get("eval_count", 0))
+                    break
+    
+    def _stream_openai(self, prompt: str) -> Iterator[str]:
+        """Yield response chunks from OpenAI's streaming API."""
+        import openai
+        client = openai.OpenAI(api_key=self.config["api_key"])
+        
+        with self._request_slot(prompt, track_latency=False) as slot:
+            for chunk in client.chat.completions.create(**self._openai_request(prompt, stream=True)):
+                if chunk.usage:
+                    slot.record_usage(chunk.usage.total_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    
+    def _stream_anthropic(self, prompt: str) -> Iterator[str]:
+        """Yield response chunks (text or tool input JSON) from Anthropic's streaming API."""
+        import anthropic
+        client = anthropic.Anthropic(api_key=self.config["api_key"])
+        
+        with self._request_slot(prompt, track_latency=False) as slot:
+            input_tokens = 0
+            for event in client.messages.create(**self._anthropic_request(prompt, stream=True)):
+                if event.type == "message_start":
+                    input_tokens = event.message.usage.input_tokens
+                elif event.type == "message_delta":
+                    slot.record_usage(input_tokens + event.usage.output_tokens)
+                elif event.type == "content_block_delta":
+                    if event.delta.type == "input_json_delta":
+                        yield event.delta.partial_json
+                    elif event.delta.type == "text_delta":
+                        yield event.delta.text
+    
+    def _request_slot(self, prompt: str, track_latency: bool = True) -> RequestSlot:
+        """Get a scheduler slot for a request with the given prompt."""
+        return self.scheduler.slot(
+            self.provider,
+            self._estimate_tokens(prompt),
+            track_latency=track_latency,
+            model=self.config["model"]
+        )
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Estimate the tokens a request will use (~4 characters per token plus the completion budget)."""
+        return len(prompt) // 4 + self.config["max_tokens"]
+    
+    def _anthropic_response_text(self, response: Any) -> str:
+        """Return the tool input (as JSON) or the text of an Anthropic response."""
+        for block in response.content:
+            if getattr(block, "type", None) == "tool_use":
+                return json.dumps(block.input)
+        return "".join(getattr(block, "text", "") for block in response.content)
+    
     def _create_extraction_prompt(self, text: str) -> str:
         """Create a prompt for entity extraction."""
-        return f"""
-Extract the following entity types from this text:
-- person: Names of people mentioned
-- project: Project names or initiatives
-- company: Company or organization names
-- topic: Key topics or subjects discussed
-- location: Places mentioned
-- date: Dates or time periods mentioned
-
-Text to analyze:
-{text}
-
-Return ONLY a JSON array of objects with 'type' and 'label' properties, like this:
-[
-  {{"type": "person", "label": "John Smith"}},
-  {{"type": "company", "label": "Acme Corp"}},
-  {{"type": "topic", "label": "AI Development"}}
-]
-
-Do not include any explanations or other text, just the JSON array.
-"""
+        return fill_prompt_template(self.prompt_template or self.EXTRACTION_PROMPT, text)
     
     def check_connectivity(self) -> bool:
         """
@@ -219,34 +422,89 @@ Do not include any explanations or other text, just the JSON array.
             print(f"Error checking connectivity to {self.provider}: {e}")
             return False
     
-    def extract_entities(self, text: str) -> List[Dict[str, str]]:
+    def _configure(self, provider: str, config: Optional[Dict[str, Any]], scheduler: Optional[RateScheduler],
+                   prompt_template: Optional[str]) -> None:
+        """Set up the provider, configuration and per-thread state (shared with AsyncLLMClient)."""
+        self.provider = provider.lower()
+        self.config = config or {}
+        self.scheduler = scheduler or rate_limiter.scheduler
+        self.prompt_template = prompt_template
+        
+        # Per-thread parse outcome, so one client can serve concurrent requests
+        self._local = threading.local()
+        self._local.parse_failed = False
+        
+        self._apply_provider_defaults()
+    
+    def _apply_provider_defaults(self) -> None:
+        """Fill in default configuration values for the provider."""
+        # Set default configurations if not provided
+        if self.provider == "ollama":
+            self.config.setdefault("base_url", "http://host.docker.internal:11434")
+            self.config.setdefault("model", "gemma3:12b")
+        elif self.provider == "openai":
+            self.config.setdefault("api_key", os.environ.get("OPENAI_API_KEY", ""))
+            self.config.setdefault("model", "gpt-4o")
+        elif self.provider == "anthropic":
+            self.config.setdefault("api_key", os.environ.get("ANTHROPIC_API_KEY", ""))
+            self.config.setdefault("model", "claude-3-opus-20240229")
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        
+        # Use the provider's native JSON mode unless disabled (e.g. for old Ollama versions)
+        self.config.setdefault("structured_output", True)
+        self.config.setdefault("max_tokens", self.DEFAULT_MAX_TOKENS)
+    
+    def extract_entities(self, text: str, raise_errors: bool = False) -> List[Dict[str, str]]:
         """
         Extract entities from the given text using the configured LLM provider.
         
         Args:
             text: The text to extract entities from
+            raise_errors: If True, raise on unreachable service, request errors and
+                unparseable responses instead of returning an empty list
             
         Returns:
             A list of entity dictionaries with 'type', 'label', and 'color' keys
+        
+        Raises:
+            LLMResponseError: If raise_errors is set and the service is unreachable
+                or the response contained no JSON
         """
         # Check connectivity before attempting extraction
         if not self.is_connected and not self.check_connectivity():
+            if raise_errors:
+                raise LLMResponseError(f"{self.provider} LLM service is not reachable")
             print(f"Cannot extract entities: {self.provider} LLM service is not reachable")
             return []
         
+        self._local.parse_failed = False
+        
         if self.provider == "ollama":
-            return self._extract_with_ollama(text)
+            entities = self._extract_with_ollama(text, raise_errors)
         elif self.provider == "openai":
-            return self._extract_with_openai(text)
+            entities = self._extract_with_openai(text, raise_errors)
         elif self.provider == "anthropic":
-            return self._extract_with_anthropic(text)
+            entities = self._extract_with_anthropic(text, raise_errors)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
+        
+        # A truncated response still counts when its valid prefix had entities
+        if raise_errors and self._local.parse_failed and not entities:
+            raise LLMResponseError(f"Could not parse the {self.provider} response")
+        
+        return entities
     
     def _parse_llm_response(self, response_text: str) -> List[Dict[str, str]]:
         """
         Parse the LLM response to extract entities.
         
+        Accepts both the structured-output form ({"entities": [...]}) and a bare
+        JSON array. If the response is truncated or malformed, the entities that
+        were completed before the error are returned instead of nothing. The
+        extraction still counts as a parse failure in the metrics, but
+        raise_errors only raises when nothing could be recovered.
+        
         Args:
             response_text: The raw text response from the LLM
             
@@ -254,31 +512,132 @@ Do not include any explanations or other text, just the JSON array.
             A list of entity dictionaries with 'type', 'label', and 'color' keys
         """
         try:
-            # Try to find JSON in the response
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
+            try:
+                payload = json.loads(response_text)
+            except json.JSONDecodeError:
+                payload = None
             
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                entities = json.loads(json_str)
-                
-                # Add colors to entities
-                for entity in entities:
-                    entity_type = entity.get("type", "other").lower()
-                    entity["color"] = self.DEFAULT_COLORS.get(entity_type, self.DEFAULT_COLORS["other"])
-                
-                return entities
+            if isinstance(payload, dict):
+                payload = payload.get("entities")
+            
+            if isinstance(payload, list):
+                items = payload
             else:
-                print("No valid JSON found in LLM response")
-                return []
+                items = self._recover_json_objects(response_text)
+                self._record_parse_failure()
+                if not items:
+                    print("No valid JSON found in LLM response")
+                    print(f"Response text: {response_text}")
+            
+            return self._normalize_entities(items)
                 
-        except json.JSONDecodeError as e:
-            print(f"Error parsing LLM response as JSON: {e}")
-            print(f"Response text: {response_text}")
-            return []
         except Exception as e:
+            self._record_parse_failure()
             print(f"Unexpected error parsing LLM response: {e}")
             return []
+    
+    def _record_parse_failure(self) -> None:
+        """Flag the current extraction as unparseable and count it."""
+        self._local.parse_failed = True
+        metrics.LLM_PARSE_FAILURES.labels(provider=self.provider, model=self.config.get("model")).inc()
+    
+    def _recover_json_objects(self, response_text: str) -> List[Any]:
+        """
+        Decode the complete elements of the first JSON array in the text.
+        
+        Decoding stops at the first element that is not valid JSON, so a
+        truncated array yields its valid prefix.
+        
+        Args:
+            response_text: The raw text response from the LLM
+            
+        Returns:
+            The decoded array elements, possibly empty
+        """
+        return JSONArrayStreamParser().feed(response_text)
+    
+    def _normalize_entities(self, items: List[Any]) -> List[Dict[str, str]]:
+        """
+        Drop malformed items and add colors to the rest.
+        
+        Args:
+            items: Decoded JSON elements from the LLM response
+            
+        Returns:
+            A list of entity dictionaries with 'type', 'label', and 'color' keys
+        """
+        entities = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            label = item.get("label")
+            if not isinstance(label, str) or not label.strip():
+                continue
+            entity_type = str(item.get("type") or "other").lower()
+            entities.append({
+                "type": entity_type,
+                "label": label.strip(),
+                "color": self.DEFAULT_COLORS.get(entity_type, self.DEFAULT_COLORS["other"])
+            })
+        return entities
+
+class JSONArrayStreamParser:
+    """
+    Incrementally decodes the elements of the first JSON array in a text stream.
+    
+    Feed it chunks of text as they arrive; each call returns the elements that
+    were completed by that chunk. An element that cannot be decoded yet is kept
+    in the buffer until more text arrives.
+    """
+    
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = -1  # Position after the last decoded element, -1 before the '['
+        self._closed = False
+    
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Add a chunk of text and return the newly completed array elements.
+        
+        Args:
+            chunk: The next piece of the response text
+            
+        Returns:
+            The elements that could be decoded, possibly empty
+        """
+        self._buffer += chunk
+        if self._closed:
+            return []
+        
+        if self._pos < 0:
+            start_idx = self._buffer.find('[')
+            if start_idx < 0:
+                return []
+            self._pos = start_idx + 1
+        
+        items = []
+        length = len(self._buffer)
+        
+        while self._pos < length:
+            # Skip separators between elements
+            pos = self._pos
+            while pos < length and self._buffer[pos] in " \t\r\n,":
+                pos += 1
+            self._pos = pos
+            if pos >= length:
+                break
+            if self._buffer[pos] == ']':
+                self._closed = True
+                break
+            try:
+                item, self._pos = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete (or invalid) element, wait for more text
+                break
+            items.append(item)
+        
+        return items
 
 # Example usage:
 # client = LLMClient(provider="ollama", config={"model": "llama3"})
@@ -0,0 +1,241 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Tuple, Any
+
+from llm_client import LLMClient, LLMResponseError
+from profiler import bind_to_profile
+
+class ProviderStats:
+    """
+    Rolling latency and error statistics for one provider.
+
+    Only samples from the last `window_seconds` are kept, so a provider that
+    was marked unhealthy becomes eligible again once its old errors expire.
+    """
+
+    def __init__(self, window_size: int = 100, window_seconds: float = 300.0):
+        """
+        Initialize the statistics.
+
+        Args:
+            window_size: Maximum number of samples kept
+            window_seconds: Maximum age of a sample in seconds
+        """
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=window_size)  # (recorded_at, latency, ok)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record the latency and outcome of a request."""
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        """Return the samples that are still inside the time window."""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarize the recent samples.
+
+        Returns:
+            A dictionary with sample count, error rate and p50/p95 latency of
+            successful requests (None when there are no successes)
+        """
+        samples = self._recent()
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+
+        def percentile(q):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {
+            'samples': len(samples),
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95)
+        }
+
+
+class LLMRouter:
+    """
+    Routes entity extraction across the configured LLM providers.
+
+    Providers are ranked by health and median latency. A request goes to the
+    best provider; if it fails, the next one is tried. With hedging enabled, a
+    second request is sent to the next provider when the first one is slower
+    than the hedge threshold, and the first valid result wins.
+    """
+
+    # Hedge threshold used until a provider has enough samples for its p95
+    DEFAULT_HEDGE_AFTER = 10.0
+
+    # Requests that lose a hedge race keep running here until they finish
+    _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+    def __init__(self, llm_config: Dict[str, Any], routing_config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            llm_config: The 'llm' configuration section with per-provider settings
+            routing_config: The 'routing' configuration section
+        """
+        self.llm_config = llm_config
+        routing_config = routing_config or {}
+
+        self.providers = [
+            provider for provider in routing_config.get("providers", ["ollama", "openai", "anthropic"])
+            if self._is_configured(provider)
+        ]
+        self.hedge = routing_config.get("hedge", True)
+        self.hedge_after = routing_config.get("hedge_after_seconds")
+        self.min_samples = routing_config.get("min_samples", 5)
+        self.max_error_rate = routing_config.get("max_error_rate", 0.5)
+
+        self.stats = {
+            provider: ProviderStats(window_seconds=routing_config.get("window_seconds", 300.0))
+            for provider in self.providers
+        }
+        self._clients: Dict[str, LLMClient] = {}
+        self._clients_lock = threading.Lock()
+
+    def _is_configured(self, provider: str) -> bool:
+        """Cloud providers are only routed to when an API key is configured."""
+        provider_config = self.llm_config.get(provider)
+        if provider_config is None:
+            return False
+        if provider == "ollama":
+            return True
+        return bool(provider_config.get("api_key"))
+
+    def client(self, provider: str) -> LLMClient:
+        """Return the cached client for a provider, creating it on first use."""
+        with self._clients_lock:
+            if provider not in self._clients:
+                self._clients[provider] = LLMClient(provider=provider, config=self.llm_config.get(provider, {}))
+            return self._clients[provider]
+
+    def rank(self) -> List[str]:
+        """
+        Order the providers from best to worst.
+
+        Healthy providers come first, sorted by median latency; providers
+        without enough samples keep their configured order behind them.
+        """
+        def key(item):
+            index, provider = item
+            snapshot = self.stats[provider].snapshot()
+            known = snapshot['samples'] >= self.min_samples
+            unhealthy = known and snapshot['error_rate'] > self.max_error_rate
+            p50 = snapshot['p50'] if known and snapshot['p50'] is not None else float('inf')
+            return (unhealthy, p50, index)
+
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+
+    def best_client(self) -> LLMClient:
+        """
+        Return the client of the best-ranked provider (for streaming, which is not hedged).
+
+        Raises:
+            LLMResponseError: If no provider is configured
+        """
+        ranked = self.rank()
+        if not ranked:
+            raise LLMResponseError("No LLM provider is configured")
+        return self.client(ranked[0])
+
+    def _hedge_delay(self, provider: str) -> float:
+        """Return how long to wait for a provider before hedging."""
+        if self.hedge_after is not None:
+            return float(self.hedge_after)
+        snapshot = self.stats[provider].snapshot()
+        if snapshot['samples'] >= self.min_samples and snapshot['p95'] is not None:
+            return snapshot['p95']
+        return self.DEFAULT_HEDGE_AFTER
+
+    def _call(self, provider: str, text: str) -> List[Dict[str, str]]:
+        """Run one extraction and record its latency and outcome."""
+        started = time.monotonic()
+        try:
+            entities = self.client(provider).extract_entities(text, raise_errors=True)
+        except Exception:
+            self.stats[provider].record(time.monotonic() - started, False)
+            raise
+        self.stats[provider].record(time.monotonic() - started, True)
+        return entities
+
+    def extract_entities(self, text: str) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Extract entities with the fastest healthy provider, hedging and failing over.
+
+        Args:
+            text: The text to extract entities from
+
+        Returns:
+            A tuple of (entities, provider that produced them)
+
+        Raises:
+            LLMResponseError: If no provider is configured or all providers failed
+        """
+        pending = self.rank()
+        if not pending:
+            raise LLMResponseError("No LLM provider is configured")
+
+        in_flight = {}
+        errors = []
+
+        def launch():
+            provider = pending.pop(0)
+            in_flight[self._executor.submit(bind_to_profile(self._call), provider, text)] = provider
+            return provider
+
+        hedge_deadline = time.monotonic() + self._hedge_delay(launch())
+
+        while in_flight:
+            timeout = None
+            if self.hedge and pending:
+                timeout = max(0.0, hedge_deadline - time.monotonic())
+
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # The running request is slower than the threshold: hedge
+                hedged = launch()
+                print(f"Hedging entity extraction to {hedged}")
+                hedge_deadline = time.monotonic() + self._hedge_delay(hedged)
+                continue
+
+            for future in done:
+                provider = in_flight.pop(future)
+                try:
+                    return future.result(), provider
+                except Exception as e:
+                    print(f"Entity extraction with {provider} failed: {e}")
+                    errors.append(f"{provider}: {e}")
+
+            # Fail over to the next provider if nothing else is running
+            if not in_flight and pending:
+                hedge_deadline = time.monotonic() + self._hedge_delay(launch())
+
+        raise LLMResponseError("All LLM providers failed (" + "; ".join(errors) + ")")
+
+    def routing_stats(self) -> Dict[str, Any]:
+        """
+        Return the current ranking and per-provider statistics.
+
+        Returns:
+            A dictionary with the provider ranking and a snapshot per provider
+        """
+        return {
+            'ranking': self.rank(),
+            'providers': {provider: stats.snapshot() for provider, stats in self.stats.items()}
+        }
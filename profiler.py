@@ -0,0 +1,348 @@
+"""
+On-demand sampling profiler for individual web requests.
+
+While a request is profiled, a background thread snapshots the stack of the
+request thread every few milliseconds and counts identical stacks. Profiles
+are written per route in the collapsed-stack format read by flamegraph.pl,
+speedscope and inferno, e.g.:
+
+    flamegraph.pl profiles/api_messages/20250101-120000-000000_GET_812ms.folded > messages.svg
+
+A request is profiled when profiling is enabled and it is picked by the
+sample rate, or when it carries a valid, unexpired signature in `?profile=`.
+To sign a path with the configured secret (valid for an hour by default):
+
+    python profiler.py sign /api/messages [--ttl 3600]
+
+The same kind of signature for /debug/profiles, passed as `?key=`, gives
+access to the stored profiles.
+"""
+
+import re
+import sys
+import hmac
+import time
+import random
+import hashlib
+import inspect
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+# Default lifetime of a signature made with RequestProfiler.sign
+SIGNATURE_TTL = 3600
+
+class StackSampler:
+    """
+    Periodically samples the stack of one thread.
+
+    Helper threads doing work for the request (the event loop thread of an
+    async view, pool threads of hedged LLM requests) are sampled too, under
+    their own root frame, while they are attached with bind_to_profile().
+    Other threads, such as concurrent requests, are left out.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Initialize the sampler.
+
+        Args:
+            thread_id: Ident of the thread to profile
+            interval: Time between samples in seconds
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._attached: Dict[int, str] = {}  # Helper thread ident -> name
+
+    def start(self) -> "StackSampler":
+        """Start sampling in a background thread."""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        """
+        Stop sampling.
+
+        Returns:
+            A Counter mapping collapsed stacks to their sample counts
+        """
+        self.duration = time.perf_counter() - self.started
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    @contextmanager
+    def attached(self):
+        """Sample the current (helper) thread too while the block runs."""
+        thread = threading.current_thread()
+        nested = thread.ident in self._attached
+        self._attached[thread.ident] = thread.name
+        try:
+            yield
+        finally:
+            if not nested:
+                self._attached.pop(thread.ident, None)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id in frames:
+                self.stacks[self._fold(frames[self.thread_id])] += 1
+            for thread_id, name in list(self._attached.items()):
+                if thread_id in frames:
+                    self.stacks[f"[{name}];{self._fold(frames[thread_id])}"] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        """Collapse a stack into 'root;...;leaf' with one entry per function."""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            path = Path(code.co_filename)
+            names.append(f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+# The sampler of the request profiled in the current context, if any
+current_sampler: ContextVar[Optional[StackSampler]] = ContextVar("current_sampler", default=None)
+
+def bind_to_profile(func: Callable) -> Callable:
+    """
+    Wrap a function that will run in another thread for the current request.
+
+    If the request is being profiled, the thread running the function is
+    sampled with it for the duration of the call. Call this in the request
+    (or one of its attached threads), e.g. when submitting to an executor.
+
+    Args:
+        func: A function or coroutine function
+
+    Returns:
+        The wrapped function, or func itself if the request is not profiled
+    """
+    sampler = current_sampler.get()
+    if sampler is None:
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with sampler.attached():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with sampler.attached():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and stores their profiles by route.
+
+    With profiling disabled and no secret configured, `active` is False and
+    the request hooks return immediately.
+    """
+
+    def __init__(self, profiling_config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the profiler.
+
+        Args:
+            profiling_config: The 'profiling' configuration section
+        """
+        profiling_config = profiling_config or {}
+        self.enabled = bool(profiling_config.get("enabled", False))
+        self.sample_rate = float(profiling_config.get("sample_rate", 0.0))
+        self.routes = set(profiling_config.get("routes") or [])
+        self.secret = profiling_config.get("secret") or ""
+        self.interval = profiling_config.get("interval_ms", 5) / 1000.0
+        self.output_dir = Path(profiling_config.get("output_dir", "profiles"))
+        self.max_profiles = int(profiling_config.get("max_profiles", 200))
+        self.signature_ttl = int(profiling_config.get("signature_ttl", SIGNATURE_TTL))
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether any request can be profiled at all."""
+        return self.enabled or bool(self.secret)
+
+    def sign(self, path: str, ttl: Optional[int] = None) -> str:
+        """
+        Sign a request path and an expiry time with the configured secret.
+
+        Args:
+            path: The request path, e.g. '/api/messages'
+            ttl: Seconds the signature stays valid, defaults to signature_ttl
+
+        Returns:
+            The value to pass as `?profile=` to profile requests to this path
+            (or as `?key=` for /debug/profiles), '<expiry>.<hmac>'
+        """
+        expires = int(time.time()) + (self.signature_ttl if ttl is None else ttl)
+        return f"{expires}.{self._signature(path, expires)}"
+
+    def verify(self, path: str, signature: Optional[str]) -> bool:
+        """
+        Check a signature made with sign().
+
+        Returns:
+            True if a secret is configured and the signature matches the path and has not expired
+        """
+        if not signature or not self.secret:
+            return False
+        expires, _, digest = signature.partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(digest, self._signature(path, int(expires)))
+
+    def _signature(self, path: str, expires: int) -> str:
+        """Compute the HMAC of a path and an expiry time."""
+        message = f"{path}\n{expires}".encode("utf-8")
+        return hmac.new(self.secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+    def should_profile(self, route: str, path: str, signature: Optional[str] = None) -> bool:
+        """
+        Decide whether to profile a request.
+
+        Args:
+            route: The URL rule that matched the request
+            path: The request path
+            signature: The `profile` query parameter, if any
+
+        Returns:
+            True if the request should be profiled
+        """
+        if signature and self.secret:
+            return self.verify(path, signature)
+        if not self.enabled:
+            return False
+        if self.routes and route not in self.routes:
+            return False
+        return random.random() < self.sample_rate
+
+    def start(self) -> StackSampler:
+        """Start profiling the current thread (and helper threads bound with bind_to_profile)."""
+        sampler = StackSampler(threading.get_ident(), self.interval).start()
+        current_sampler.set(sampler)
+        return sampler
+
+    @staticmethod
+    def route_key(route: str) -> str:
+        """Turn a URL rule into a directory name, e.g. '/api/messages/<int:message_id>' -> 'api_messages_int_message_id'."""
+        return re.sub(r"[^A-Za-z0-9-]+", "_", route).strip("_") or "index"
+
+    def save(self, sampler: StackSampler, route: str, method: str) -> Optional[Path]:
+        """
+        Stop a sampler and write its profile.
+
+        Args:
+            sampler: The running sampler of the request
+            route: The URL rule that matched the request
+            method: The HTTP method of the request
+
+        Returns:
+            The path of the written profile, or None if nothing was sampled
+        """
+        stacks = sampler.stop()
+        current_sampler.set(None)
+        if not stacks:
+            return None
+
+        directory = self.output_dir / self.route_key(route)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = directory / f"{timestamp}_{method}_{round(sampler.duration * 1000)}ms.folded"
+
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self._prune()
+        except OSError as e:
+            print(f"Error saving profile to {path}: {e}")
+            return None
+        return path
+
+    def _profile_files(self) -> List[Path]:
+        """Return all stored profiles, newest first."""
+        if not self.output_dir.exists():
+            return []
+        files = self.output_dir.glob("*/*.folded")
+        return sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def _prune(self) -> None:
+        """Delete the oldest profiles beyond max_profiles."""
+        with self._lock:
+            for path in self._profile_files()[self.max_profiles:]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def list_profiles(self, key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List the stored profiles.
+
+        Args:
+            key: Access signature to append to the download URLs
+
+        Returns:
+            A list of dictionaries with route, name, method, duration, samples
+            and creation time, newest first
+        """
+        profiles = []
+        for path in self._profile_files():
+            parts = path.stem.split("_")
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    samples = sum(int(line.rsplit(" ", 1)[1]) for line in f if line.strip())
+            except (OSError, ValueError, IndexError):
+                samples = None
+            profiles.append({
+                'route': path.parent.name,
+                'name': path.name,
+                'method': parts[1] if len(parts) > 2 else None,
+                'duration_ms': int(parts[2][:-2]) if len(parts) > 2 and parts[2][:-2].isdigit() else None,
+                'samples': samples,
+                'created_at': datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+                'url': f"/debug/profiles/{path.parent.name}/{path.name}" + (f"?key={key}" if key else "")
+            })
+        return profiles
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Sign a request path for on-demand profiling")
+    parser.add_argument("command", choices=["sign"])
+    parser.add_argument("path", help="Request path, e.g. /api/messages (or /debug/profiles for access to the profiles)")
+    parser.add_argument("--ttl", type=int, default=None, help="Seconds the signature stays valid")
+    args = parser.parse_args()
+
+    profiler = RequestProfiler(Config().get_profiling_config())
+    if not profiler.secret:
+        print("No profiling secret configured (profiling.secret in config.json)")
+        sys.exit(1)
+    parameter = "key" if args.path == "/debug/profiles" else "profile"
+    print(f"{args.path}?{parameter}={profiler.sign(args.path, args.ttl)}")
@@ -0,0 +1,598 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional, Any
+
+import metrics
+
+class SchedulerTimeout(Exception):
+    """Raised when a request could not get a slot from the scheduler in time."""
+
+
+class ProviderLimiter:
+    """
+    Request scheduler for a single LLM provider.
+
+    Enforces requests- and tokens-per-minute budgets with token buckets and
+    limits the number of requests in flight. The concurrency limit adapts with
+    AIMD: it grows by one per window of successful requests and is cut on
+    429/503 responses or when latency rises well above the observed baseline.
+    """
+
+    # Multiplicative decrease factors
+    OVERLOAD_BACKOFF = 0.5   # On 429/503
+    LATENCY_BACKOFF = 0.9    # On latency above tolerance × baseline
+
+    # Weight of the newest sample in the latency moving average
+    LATENCY_ALPHA = 0.2
+
+    def __init__(
+        self,
+        provider: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 4,
+        min_concurrency: int = 1,
+        latency_tolerance: float = 2.0
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            provider: Name of the provider, for reporting
+            requests_per_minute: Request budget, 0 for unlimited
+            tokens_per_minute: Token budget (prompt + completion), 0 for unlimited
+            max_concurrency: Upper bound for requests in flight
+            min_concurrency: Lower bound for requests in flight
+            latency_tolerance: Latency above this multiple of the baseline counts as overload
+        """
+        self.provider = provider
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.latency_tolerance = latency_tolerance
+
+        self._cond = threading.Condition()
+
+        # Waiting requests (sync and async) in arrival order; see acquire() and acquire_async()
+        self._waiters = deque()
+
+        # Start halfway and let AIMD find the real capacity
+        self.concurrency_limit = float(max(self.min_concurrency, self.max_concurrency // 2))
+        self.in_flight = 0
+        self.waiting = 0
+
+        # Token buckets start full so an idle provider can take a burst
+        self._request_tokens = float(requests_per_minute)
+        self._token_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+
+        self.latency_ewma: Optional[float] = None
+        self.latency_baseline: Optional[float] = None
+
+        self.completed = 0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        """Refill both token buckets for the time elapsed since the last refill."""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_tokens = min(
+                float(self.requests_per_minute),
+                self._request_tokens + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_tokens = min(
+                float(self.tokens_per_minute),
+                self._token_tokens + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _wait_time(self, now: float, tokens: float) -> float:
+        """Return how long a request must wait before it can start (0 if it can start now)."""
+        waits = [self._blocked_until - now]
+
+        if self.in_flight >= int(self.concurrency_limit):
+            # Woken up by release(); the timeout only guards against missed notifications
+            waits.append(1.0)
+        if self.requests_per_minute and self._request_tokens < 1:
+            waits.append((1 - self._request_tokens) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._token_tokens < tokens:
+            waits.append((tokens - self._token_tokens) * 60.0 / self.tokens_per_minute)
+
+        return max(waits)
+
+    def acquire(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Block until the request may start.
+
+        Waits in the same FIFO as acquire_async(), so a thread does not
+        overtake coroutines that queued before it (and vice versa).
+
+        Args:
+            estimated_tokens: Expected prompt + completion tokens of the request
+            timeout: Maximum seconds to wait, None to wait indefinitely
+
+        Raises:
+            SchedulerTimeout: If no slot became available within the timeout
+        """
+        tokens = self._clamp_tokens(estimated_tokens)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._waiters and self._wait_time(now, tokens) <= 0:
+                self._take(tokens)
+                return
+            waiter = SyncWaiter(self._cond, tokens)
+            self._waiters.append(waiter)
+            self.waiting += 1
+
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    self._grant_waiters(now, wake_head=False)
+                    if waiter.granted:
+                        return
+                    wait = self._wait_time(now, tokens) if self._waiters[0] is waiter else None
+
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise SchedulerTimeout(
+                                f"No {self.provider} request slot available within {timeout:.0f}s"
+                            )
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            except BaseException:
+                if waiter.granted:
+                    self._untake(tokens)
+                else:
+                    self._waiters.remove(waiter)
+                self._grant_waiters(time.monotonic(), wake_head=True)
+                self._cond.notify_all()
+                raise
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Asynchronous variant of acquire() that waits without blocking the event loop.
+
+        Sync and async waiters share one FIFO and are served first come, first
+        served: slots are handed out from its head, by release() or when the
+        head's budget has refilled. Only the head sleeps until its refill time;
+        the others sleep until they are granted a slot or become the head.
+
+        Args:
+            estimated_tokens: Expected prompt + completion tokens of the request
+            timeout: Maximum seconds to wait, None to wait indefinitely
+
+        Raises:
+            SchedulerTimeout: If no slot became available within the timeout
+        """
+        tokens = self._clamp_tokens(estimated_tokens)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._waiters and self._wait_time(now, tokens) <= 0:
+                self._take(tokens)
+                return
+            waiter = AsyncWaiter(asyncio.get_running_loop(), tokens)
+            self._waiters.append(waiter)
+            self.waiting += 1
+
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    self._refill(now)
+                    self._grant_waiters(now, wake_head=False)
+                    if waiter.granted:
+                        return
+                    # Cleared under the lock, so a wake-up from another thread cannot get lost
+                    waiter.event.clear()
+                    wait = self._wait_time(now, tokens) if self._waiters[0] is waiter else None
+
+                if deadline is not None:
+                    if now >= deadline:
+                        raise SchedulerTimeout(
+                            f"No {self.provider} request slot available within {timeout:.0f}s"
+                        )
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                if waiter.granted:
+                    # Granted while timing out or being cancelled: hand the slot back
+                    self._untake(tokens)
+                else:
+                    self._waiters.remove(waiter)
+                self._grant_waiters(time.monotonic(), wake_head=True)
+                self._cond.notify_all()
+            raise
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def _grant_waiters(self, now: float, wake_head: bool) -> None:
+        """
+        Start queued requests from the head of the FIFO while they fit. Caller holds the lock.
+
+        Args:
+            now: Current monotonic time (buckets already refilled)
+            wake_head: Also wake a head that cannot start yet, so it sleeps until its own
+                refill time (a head that moved up is always woken)
+        """
+        granted = False
+        while self._waiters:
+            head = self._waiters[0]
+            if self._wait_time(now, head.tokens) > 0:
+                # A new head has to start timing its own refill
+                if wake_head or granted:
+                    head.wake()
+                return
+            self._waiters.popleft()
+            self._take(head.tokens)
+            head.granted = True
+            granted = True
+            if not head.wake():
+                self._untake(head.tokens)
+
+    def _clamp_tokens(self, estimated_tokens: int) -> float:
+        """Clamp a token estimate to the budget, as a larger request could never start."""
+        return min(float(estimated_tokens), float(self.tokens_per_minute or estimated_tokens))
+
+    def _take(self, tokens: float) -> None:
+        """Start a request: occupy a concurrency slot and charge the budgets. Caller holds the lock."""
+        self.in_flight += 1
+        if self.requests_per_minute:
+            self._request_tokens -= 1
+        if self.tokens_per_minute:
+            self._token_tokens -= tokens
+
+    def _untake(self, tokens: float) -> None:
+        """Undo _take() for a request that never started. Caller holds the lock."""
+        self.in_flight = max(0, self.in_flight - 1)
+        if self.requests_per_minute:
+            self._request_tokens += 1
+        if self.tokens_per_minute:
+            self._token_tokens += tokens
+
+    def release(
+        self,
+        latency: Optional[float],
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        estimated_tokens: int = 0,
+        tokens_used: Optional[int] = None
+    ) -> None:
+        """
+        Mark a request as finished and adapt the limits to its outcome.
+
+        Args:
+            latency: Seconds the request took, None if not comparable (e.g. streamed)
+            status: HTTP status of a failed request (0 if there was none), None on success
+            retry_after: Seconds the provider asked us to wait, if any
+            estimated_tokens: The estimate that was passed to acquire()
+            tokens_used: Actual tokens reported by the provider, if known
+        """
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+
+            # Correct the token bucket with the real usage
+            if self.tokens_per_minute and tokens_used is not None:
+                self._token_tokens -= tokens_used - estimated_tokens
+
+            if status in (429, 503):
+                self.throttled += 1
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._decrease(now, self.OVERLOAD_BACKOFF)
+            elif status is None:
+                self.completed += 1
+                if latency is not None:
+                    self._observe_latency(latency)
+                if latency is not None and self.latency_ewma > self.latency_tolerance * self.latency_baseline:
+                    self._decrease(now, self.LATENCY_BACKOFF)
+                else:
+                    # Additive increase: +1 per window of concurrency_limit requests
+                    self.concurrency_limit = min(
+                        float(self.max_concurrency),
+                        self.concurrency_limit + 1.0 / self.concurrency_limit
+                    )
+
+            self._refill(now)
+            self._grant_waiters(now, wake_head=True)
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        """Update the latency moving average and the baseline (lowest average seen)."""
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.LATENCY_ALPHA * (latency - self.latency_ewma)
+
+        if self.latency_baseline is None or self.latency_ewma < self.latency_baseline:
+            self.latency_baseline = self.latency_ewma
+        else:
+            # Let the baseline drift up slowly so one lucky request does not pin it forever
+            self.latency_baseline += 0.01 * (self.latency_ewma - self.latency_baseline)
+
+    def _decrease(self, now: float, factor: float) -> None:
+        """Multiplicatively decrease the concurrency limit, at most once per latency period."""
+        # Requests already in flight when we backed off report the same overload
+        cooldown = self.latency_ewma or 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit * factor)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the current state of the limiter.
+
+        Returns:
+            A dictionary with queue depth, in-flight count and current limits
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'provider': self.provider,
+                'queue_depth': self.waiting,
+                'in_flight': self.in_flight,
+                'concurrency_limit': int(self.concurrency_limit),
+                'max_concurrency': self.max_concurrency,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'requests_available': round(self._request_tokens, 1) if self.requests_per_minute else None,
+                'tokens_available': round(self._token_tokens) if self.tokens_per_minute else None,
+                'blocked_for': round(max(0.0, self._blocked_until - now), 1),
+                'latency_ewma': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                'latency_baseline': round(self.latency_baseline, 3) if self.latency_baseline is not None else None,
+                'completed': self.completed,
+                'throttled': self.throttled
+            }
+
+
+class SyncWaiter:
+    """A request queued in ProviderLimiter.acquire(), waiting on the limiter's condition."""
+
+    def __init__(self, cond: threading.Condition, tokens: float):
+        self.cond = cond
+        self.tokens = tokens
+        self.granted = False
+
+    def wake(self) -> bool:
+        """Wake the waiting threads (the caller holds the condition's lock)."""
+        self.cond.notify_all()
+        return True
+
+
+class AsyncWaiter:
+    """A request queued in ProviderLimiter.acquire_async(), woken from any thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tokens: float):
+        self.loop = loop
+        self.tokens = tokens
+        self.granted = False
+        self.event = asyncio.Event()
+
+    def wake(self) -> bool:
+        """
+        Wake the waiting coroutine; safe to call from threads other than its event loop.
+
+        Returns:
+            False if the event loop is closed, so the coroutine will never run again
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+            return True
+        except RuntimeError:
+            return False
+
+
+class RequestSlot:
+    """
+    Context manager for one scheduled request, usable with both `with` and
+    `async with`.
+
+    Acquires a slot on enter and releases it on exit. The status code and
+    Retry-After header are taken from the exception raised by the request, if
+    any (requests' HTTPError and the OpenAI/Anthropic SDK errors all carry
+    the HTTP response).
+    """
+
+    def __init__(self, limiter: ProviderLimiter, estimated_tokens: int, timeout: Optional[float],
+                 track_latency: bool = True, model: str = ""):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.timeout = timeout
+        self.track_latency = track_latency
+        self.model = model
+        self.tokens_used: Optional[int] = None
+        self.latency: Optional[float] = None  # Seconds from acquiring the slot to the response
+        self._started = 0.0
+
+    def record_usage(self, tokens_used: Optional[int]) -> None:
+        """Record the actual number of tokens the request consumed."""
+        self.tokens_used = tokens_used
+
+    def __enter__(self) -> "RequestSlot":
+        self.limiter.acquire(self.estimated_tokens, self.timeout)
+        self._started = time.monotonic()
+        return self
+
+    async def __aenter__(self) -> "RequestSlot":
+        await self.limiter.acquire_async(self.estimated_tokens, self.timeout)
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        status = None
+        retry_after = None
+
+        if exc is not None:
+            response = getattr(exc, "response", None)
+            status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+            headers = getattr(response, "headers", None)
+            if headers is not None:
+                retry_after = parse_retry_after(headers.get("retry-after"))
+            if status is None:
+                # Connection errors and the like: count as a failure without adapting limits
+                status = 0
+
+        latency = time.monotonic() - self._started
+        self.latency = latency
+        self._record_metrics(latency, status)
+
+        self.limiter.release(
+            latency if self.track_latency else None,
+            status=status,
+            retry_after=retry_after,
+            estimated_tokens=self.estimated_tokens,
+            tokens_used=self.tokens_used
+        )
+        return False
+
+
+    def _record_metrics(self, latency: float, status: Optional[int]) -> None:
+        """Record the request duration and token usage."""
+        provider = self.limiter.provider
+        if status is None:
+            outcome = "ok"
+        elif status in (429, 503):
+            outcome = "throttled"
+        else:
+            outcome = "error"
+        metrics.LLM_REQUEST_SECONDS.labels(provider=provider, model=self.model, outcome=outcome).observe(latency)
+        if self.tokens_used:
+            metrics.LLM_TOKENS.labels(provider=provider, model=self.model).inc(self.tokens_used)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Either a number of seconds or an HTTP date
+
+    Returns:
+        The number of seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateScheduler:
+    """
+    Process-wide registry of provider limiters shared by all LLM clients.
+    """
+
+    # Used for providers without an entry in the configuration
+    DEFAULT_LIMITS = {
+        "max_concurrency": 4
+    }
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None, timeout: Optional[float] = 120.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            limits: Per-provider keyword arguments for ProviderLimiter
+            timeout: Default maximum seconds a request waits for a slot
+        """
+        self._lock = threading.Lock()
+        self._limits = dict(limits or {})
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self.timeout = timeout
+
+    def configure(self, limits: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Replace the per-provider limits. Limiters are recreated on next use.
+
+        Args:
+            limits: Per-provider keyword arguments for ProviderLimiter
+        """
+        with self._lock:
+            self._limits = dict(limits)
+            self._limiters = {}
+
+    def limiter(self, provider: str) -> ProviderLimiter:
+        """Return the limiter for a provider, creating it on first use."""
+        with self._lock:
+            if provider not in self._limiters:
+                limits = self._limits.get(provider, self.DEFAULT_LIMITS)
+                self._limiters[provider] = ProviderLimiter(provider, **limits)
+            return self._limiters[provider]
+
+    def slot(self, provider: str, estimated_tokens: int = 0, timeout: Optional[float] = None,
+             track_latency: bool = True, model: str = "") -> RequestSlot:
+        """
+        Get a context manager that holds a request slot for the provider.
+
+        Args:
+            provider: The LLM provider the request goes to
+            estimated_tokens: Expected prompt + completion tokens
+            timeout: Maximum seconds to wait, defaults to the scheduler timeout
+            track_latency: False for requests whose duration is not comparable,
+                such as streams that stay open while the consumer reads them
+            model: Model name, used as a metrics label
+        """
+        return RequestSlot(
+            self.limiter(provider),
+            estimated_tokens,
+            self.timeout if timeout is None else timeout,
+            track_latency,
+            model
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the state of every limiter that has been used."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.provider: limiter.stats() for limiter in limiters}
+
+
+# Shared scheduler used by LLMClient unless another one is passed in
+scheduler = RateScheduler()
+
+
+def _scheduler_gauge(key: str):
+    """Return a metrics callback reporting one stats field per provider of the shared scheduler."""
+    return lambda: {(provider, ): stats[key] for provider, stats in scheduler.stats().items()}
+
+
+metrics.Gauge("llm_scheduler_queue_depth", "LLM requests waiting for a scheduler slot",
+              ["provider"], callback=_scheduler_gauge("queue_depth"))
+metrics.Gauge("llm_scheduler_in_flight", "LLM requests currently running",
+              ["provider"], callback=_scheduler_gauge("in_flight"))
+metrics.Gauge("llm_scheduler_concurrency_limit", "Current adaptive concurrency limit",
+              ["provider"], callback=_scheduler_gauge("concurrency_limit"))
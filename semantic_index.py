@@ -0,0 +1,496 @@
+"""
+Semantic search over the transcripts with a memory-mapped embedding index.
+
+Each message is turned into a normalized vector by an embedder (an Ollama
+embedding model, a local sentence-transformers model, or a dependency-free
+hashing embedder). The vectors are appended to a flat float16/float32 matrix
+file that is memory-mapped and searched with batched dot products, so the
+index does not have to fit in memory. For large corpora, an optional coarse
+clustering (k-means, as in an IVF index) limits a search to the rows of the
+clusters closest to the query.
+
+The index follows the database through the change_log table: sync() embeds
+only messages that were inserted or changed since the last sync, including
+those recorded by trans.pyw. If the change log has been pruned in between,
+the stored transcript hashes tell which messages need new vectors.
+
+Files in the index directory:
+    meta.json      dimension, dtype, model, row count, last change log id
+    vectors.bin    one row per indexed message (dtype x dimension)
+    ids.bin        message id per row (int64, -1 = deleted)
+    hashes.bin     hash of the embedded transcript per row (uint64)
+    centroids.npy  cluster centers (only with clustering)
+    lists.bin      cluster of each row (int32, only with clustering)
+
+To build or update the index and to cluster it from the command line:
+
+    python semantic_index.py sync
+    python semantic_index.py cluster --clusters 1024
+"""
+
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import numpy as np
+import requests
+
+class OllamaEmbedder:
+    """Embeds texts with the embedding endpoint of an Ollama server."""
+
+    def __init__(self, base_url: str, model: str, timeout: float = 60.0):
+        """
+        Initialize the embedder.
+
+        Args:
+            base_url: URL of the Ollama server
+            model: Name of the embedding model, e.g. "nomic-embed-text"
+            timeout: Request timeout in seconds
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return one vector per text as a float32 matrix."""
+        response = requests.post(
+            f"{self.base_url}/api/embed",
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+class SentenceTransformerEmbedder:
+    """Embeds texts with a local sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model: str):
+        # Imported here, because the package (and torch) are only needed for this embedder
+        from sentence_transformers import SentenceTransformer
+        self.model = model
+        self._model = SentenceTransformer(model)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return one vector per text as a float32 matrix."""
+        return np.asarray(self._model.encode(texts), dtype=np.float32)
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder that hashes words, word pairs and word prefixes
+    into a fixed number of dimensions.
+
+    It finds memos that share (inflected) words rather than meaning, and is
+    meant for tests and benchmarks or as a fallback without a model.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.model = f"hashing-{dimensions}"
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.casefold())
+        return words + [word[:5] for word in words if len(word) > 5] + [" ".join(pair) for pair in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return one vector per text as a float32 matrix."""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimensions] += 1.0 if digest & (1 << 63) else -1.0
+        return vectors
+
+def create_embedder(search_config: Dict[str, Any], llm_config: Dict[str, Any]):
+    """
+    Create the embedder selected in the semantic_search configuration.
+
+    Args:
+        search_config: The semantic_search configuration section
+        llm_config: The llm configuration section (for the Ollama URL)
+
+    Returns:
+        An object with an embed(texts) method and a model attribute
+    """
+    provider = search_config.get("provider", "ollama")
+    if provider == "ollama":
+        base_url = search_config.get("base_url") or llm_config.get("ollama", {}).get("base_url", "http://localhost:11434")
+        return OllamaEmbedder(base_url, search_config.get("model", "nomic-embed-text"))
+    if provider == "sentence_transformers":
+        return SentenceTransformerEmbedder(search_config.get("model", "paraphrase-multilingual-MiniLM-L12-v2"))
+    if provider == "hashing":
+        return HashingEmbedder(search_config.get("dimensions", 256))
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, so that dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def transcript_hash(transcript: str) -> int:
+    """Hash of a transcript, to tell whether its vector is outdated."""
+    return int.from_bytes(hashlib.blake2b(transcript.encode("utf-8"), digest_size=8).digest(), "little")
+
+class SemanticIndex:
+    """Memory-mapped vector index of the message transcripts."""
+
+    # Rows scored per matrix product in exhaustive searches
+    SEARCH_BATCH_ROWS = 16384
+
+    def __init__(self, directory: str, embedder, dtype: str = "float32", batch_size: int = 32,
+                 clusters: int = 0, nprobe: int = 8):
+        """
+        Initialize the index.
+
+        Args:
+            directory: Directory of the index files (created if missing)
+            embedder: Object with embed(texts) and a model attribute
+            dtype: Storage type of the vectors: "float32", or "float16" for half
+                the disk space and page cache at several times the search time
+                (each block is converted to float32 before the product)
+            batch_size: Number of transcripts embedded per request
+            clusters: Number of clusters built automatically once the index is
+                large enough (0 = always search all rows)
+            nprobe: Number of clusters searched per query
+        """
+        self.directory = Path(directory)
+        self.embedder = embedder
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.batch_size = batch_size
+        self.clusters = clusters
+        self.nprobe = nprobe
+
+        # _lock guards the rows searches read; _sync_lock keeps syncs apart, so that
+        # embedding (the slow part) does not hold up searches
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _load(self) -> None:
+        """Read the index files; an index built with another model is discarded."""
+        meta_path = self._path("meta.json")
+        self.meta = json.loads(meta_path.read_text()) if meta_path.exists() else None
+        if self.meta and (self.meta["model"] != self.embedder.model or self.meta["dtype"] != self.dtype.name):
+            print(f"Semantic index was built with {self.meta['model']} ({self.meta['dtype']}), rebuilding")
+            self.meta = None
+        if self.meta is None:
+            for name in ("vectors.bin", "ids.bin", "hashes.bin", "centroids.npy", "lists.bin"):
+                self._path(name).unlink(missing_ok=True)
+            self.meta = {"model": self.embedder.model, "dtype": self.dtype.name, "dimensions": None,
+                         "count": 0, "last_change_id": 0, "built": False}
+            self._save_meta()
+
+        count = self.meta["count"]
+        self.ids = np.fromfile(self._path("ids.bin"), dtype="<i8", count=count) if count else np.zeros(0, "<i8")
+        self.hashes = np.fromfile(self._path("hashes.bin"), dtype="<u8", count=count) if count else np.zeros(0, "<u8")
+        self.rows = {int(message_id): row for row, message_id in enumerate(self.ids) if message_id >= 0}
+        self._map_vectors()
+
+        self.centroids = None
+        if self._path("centroids.npy").exists():
+            self.centroids = np.load(self._path("centroids.npy"))
+            self.lists = np.fromfile(self._path("lists.bin"), dtype="<i4", count=count)
+            self._group_lists()
+
+    def _map_vectors(self) -> None:
+        """Memory-map the vector matrix (read-only; writes go through file handles)."""
+        count, dimensions = self.meta["count"], self.meta["dimensions"]
+        self.vectors = None
+        if count:
+            self.vectors = np.memmap(self._path("vectors.bin"), dtype=self.dtype, mode="r", shape=(count, dimensions))
+
+    def _group_lists(self) -> None:
+        """Index the rows of each cluster."""
+        order = np.argsort(self.lists, kind="stable")
+        bounds = np.searchsorted(self.lists[order], np.arange(len(self.centroids) + 1))
+        self.list_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def _save_meta(self) -> None:
+        self._path("meta.json").write_text(json.dumps(self.meta, indent=2))
+
+    @property
+    def size(self) -> int:
+        """Number of indexed messages."""
+        return len(self.rows)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = normalize(self.embedder.embed(texts))
+        if self.meta["dimensions"] is None:
+            self.meta["dimensions"] = vectors.shape[1]
+        return vectors.astype(self.dtype)
+
+    def _write_rows(self, messages: List[Tuple[int, str]]) -> None:
+        """Embed messages and store their vectors, replacing the rows of messages already indexed."""
+        vectors = self._embed([transcript for _, transcript in messages])
+        hashes = np.array([transcript_hash(transcript) for _, transcript in messages], dtype="<u8")
+        with self._lock:
+            self._store_rows(messages, vectors, hashes)
+
+    def _store_rows(self, messages: List[Tuple[int, str]], vectors: np.ndarray, hashes: np.ndarray) -> None:
+        """Write the rows of embedded messages (called with _lock held)."""
+        row_bytes = vectors.shape[1] * self.dtype.itemsize
+
+        # Close the mapping before the files change
+        self.vectors = None
+        appended, replaced = [], []
+        with open(self._path("vectors.bin"), "r+b" if self._path("vectors.bin").exists() else "w+b") as vector_file, \
+                open(self._path("hashes.bin"), "r+b" if self._path("hashes.bin").exists() else "w+b") as hash_file:
+            for position, (message_id, _) in enumerate(messages):
+                row = self.rows.get(message_id)
+                if row is None:
+                    appended.append(position)
+                    continue
+                vector_file.seek(row * row_bytes)
+                vector_file.write(vectors[position].tobytes())
+                hash_file.seek(row * 8)
+                hash_file.write(hashes[position].tobytes())
+                self.hashes[row] = hashes[position]
+                replaced.append((row, position))
+
+            if replaced and self.centroids is not None:
+                self._set_lists([row for row, _ in replaced], vectors[[position for _, position in replaced]])
+
+            if appended:
+                start = self.meta["count"]
+                new_ids = np.array([messages[position][0] for position in appended], dtype="<i8")
+                vector_file.seek(start * row_bytes)
+                vector_file.write(vectors[appended].tobytes())
+                hash_file.seek(start * 8)
+                hash_file.write(hashes[appended].tobytes())
+                with open(self._path("ids.bin"), "ab") as id_file:
+                    id_file.write(new_ids.tobytes())
+
+                self.ids = np.concatenate([self.ids, new_ids])
+                self.hashes = np.concatenate([self.hashes, hashes[appended]])
+                for offset, message_id in enumerate(new_ids):
+                    self.rows[int(message_id)] = start + offset
+                self.meta["count"] = start + len(appended)
+                if self.centroids is not None:
+                    self.lists = np.concatenate([self.lists, np.full(len(appended), -1, dtype="<i4")])
+                    self._set_lists(range(start, start + len(appended)), vectors[appended])
+
+        self._save_meta()
+        self._map_vectors()
+
+    def _set_lists(self, rows, vectors: np.ndarray) -> None:
+        """Assign rows to their nearest clusters and store the assignment."""
+        rows = np.fromiter(rows, dtype=np.int64)
+        self.lists[rows] = np.argmax(vectors.astype(np.float32) @ self.centroids.T, axis=1)
+        with open(self._path("lists.bin"), "r+b") as list_file:
+            for row in rows:
+                list_file.seek(int(row) * 4)
+                list_file.write(self.lists[row].tobytes())
+        self._group_lists()
+
+    def _delete_rows(self, message_ids: List[int]) -> None:
+        """Mark the rows of deleted messages; they are skipped by searches."""
+        with self._lock, open(self._path("ids.bin"), "r+b") as id_file:
+            for message_id in message_ids:
+                row = self.rows.pop(message_id, None)
+                if row is None:
+                    continue
+                self.ids[row] = -1
+                id_file.seek(row * 8)
+                id_file.write(self.ids[row].tobytes())
+
+    def sync(self, connect: Callable) -> int:
+        """
+        Bring the index up to date with the database.
+
+        Searches keep running on the rows indexed so far while it embeds.
+
+        Args:
+            connect: Function returning a new database connection
+
+        Returns:
+            The number of messages that were embedded
+        """
+        with self._sync_lock:
+            conn = connect()
+            try:
+                latest_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+                oldest_id = conn.execute("SELECT COALESCE(MIN(id), 0) FROM change_log").fetchone()[0]
+                last_change_id = self.meta["last_change_id"]
+                built = self.meta.get("built", False)
+                if built and latest_id == last_change_id:
+                    return 0
+
+                if built and oldest_id <= last_change_id + 1:
+                    # Only the messages named in the change log since the last sync
+                    changed = [row[0] for row in conn.execute(
+                        "SELECT DISTINCT row_id FROM change_log WHERE id > ? AND table_name = 'messages'",
+                        (last_change_id,)
+                    )]
+                    embedded = self._sync_messages(conn, changed)
+                else:
+                    # First build, or the log was pruned since: compare all transcripts by hash
+                    embedded = self._sync_all(conn)
+
+                self.meta["last_change_id"] = latest_id
+                self.meta["built"] = True
+                self._save_meta()
+            finally:
+                conn.close()
+
+            if self.clusters and self.centroids is None and self.size >= self.clusters * 10:
+                self.build_clusters(self.clusters)
+            return embedded
+
+    def _sync_messages(self, conn, message_ids: List[int]) -> int:
+        embedded = 0
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            placeholders = ",".join(["?"] * len(chunk))
+            found = dict(conn.execute(f"SELECT id, transcript FROM messages WHERE id IN ({placeholders})", chunk).fetchall())
+            self._delete_rows([message_id for message_id in chunk if message_id not in found])
+            embedded += self._embed_outdated(sorted(found.items()))
+        return embedded
+
+    def _sync_all(self, conn) -> int:
+        embedded = 0
+        seen = set()
+        cursor = conn.execute("SELECT id, transcript FROM messages ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(5000)
+            if not batch:
+                break
+            seen.update(message_id for message_id, _ in batch)
+            embedded += self._embed_outdated([(message_id, transcript) for message_id, transcript in batch])
+        self._delete_rows([message_id for message_id in list(self.rows) if message_id not in seen])
+        return embedded
+
+    def _embed_outdated(self, messages: List[Tuple[int, str]]) -> int:
+        """Embed the messages that are not indexed or whose transcript changed."""
+        outdated = [
+            (message_id, transcript) for message_id, transcript in messages
+            if message_id not in self.rows or int(self.hashes[self.rows[message_id]]) != transcript_hash(transcript)
+        ]
+        for start in range(0, len(outdated), self.batch_size):
+            self._write_rows(outdated[start:start + self.batch_size])
+        return len(outdated)
+
+    def build_clusters(self, clusters: int, iterations: int = 10, sample_size: int = 100000, seed: int = 0) -> None:
+        """
+        Cluster the vectors with spherical k-means, so that searches only score nearby rows.
+
+        Args:
+            clusters: Number of clusters (around the square root of the row count works well)
+            iterations: k-means iterations on the sample
+            sample_size: Number of rows the centers are computed from
+            seed: Random seed for the sample and the initial centers
+        """
+        with self._lock:
+            live = np.flatnonzero(self.ids >= 0)
+            if len(live) < clusters:
+                raise ValueError(f"Cannot build {clusters} clusters from {len(live)} vectors")
+
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(self.vectors[np.sort(rng.choice(live, min(sample_size, len(live)), replace=False))],
+                                dtype=np.float32)
+            centroids = sample[rng.choice(len(sample), clusters, replace=False)]
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for cluster in range(clusters):
+                    members = sample[assignment == cluster]
+                    if len(members):
+                        centroids[cluster] = members.sum(axis=0)
+                centroids = normalize(centroids)
+
+            lists = np.empty(self.meta["count"], dtype="<i4")
+            for start in range(0, self.meta["count"], self.SEARCH_BATCH_ROWS):
+                block = np.asarray(self.vectors[start:start + self.SEARCH_BATCH_ROWS], dtype=np.float32)
+                lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+            np.save(self._path("centroids.npy"), centroids.astype(np.float32))
+            lists.tofile(self._path("lists.bin"))
+            self.centroids, self.lists = centroids.astype(np.float32), lists
+            self._group_lists()
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        Find the messages closest in meaning to a query.
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+
+        Returns:
+            A list of (message id, cosine similarity), best first
+        """
+        query_vector = normalize(self.embedder.embed([query]))[0].astype(np.float32)
+
+        with self._lock:
+            if self.vectors is None:
+                return []
+            if self.centroids is not None:
+                probes = np.argsort(self.centroids @ query_vector)[::-1][:self.nprobe]
+                candidate_rows = np.sort(np.concatenate([self.list_rows[probe] for probe in probes]))
+                blocks = [(candidate_rows, np.asarray(self.vectors[candidate_rows], dtype=np.float32))]
+            else:
+                blocks = (
+                    (np.arange(start, min(start + self.SEARCH_BATCH_ROWS, self.meta["count"])),
+                     np.asarray(self.vectors[start:start + self.SEARCH_BATCH_ROWS], dtype=np.float32))
+                    for start in range(0, self.meta["count"], self.SEARCH_BATCH_ROWS)
+                )
+
+            best_rows, best_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            for rows, block in blocks:
+                scores = block @ query_vector
+                scores[self.ids[rows] < 0] = -np.inf
+                if len(scores) > limit:
+                    top = np.argpartition(scores, -limit)[-limit:]
+                    rows, scores = rows[top], scores[top]
+                best_rows = np.concatenate([best_rows, rows])
+                best_scores = np.concatenate([best_scores, scores])
+
+            order = np.argsort(best_scores)[::-1][:limit]
+            return [(int(self.ids[best_rows[i]]), float(best_scores[i]))
+                    for i in order if np.isfinite(best_scores[i])]
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import sqlite3
+    import argparse
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Build and maintain the semantic search index")
+    parser.add_argument("command", choices=["sync", "cluster", "search"])
+    parser.add_argument("query", nargs="?", help="Search text (for search)")
+    parser.add_argument("--db", default=os.environ.get("TRANSCRIPTS_DB", "transcripts.db"), help="Database file")
+    parser.add_argument("--clusters", type=int, default=None, help="Number of clusters (for cluster)")
+    args = parser.parse_args()
+
+    config = Config()
+    search_config = config.get_semantic_search_config()
+    index = SemanticIndex(
+        search_config.get("index_dir", "embeddings"),
+        create_embedder(search_config, config.get_llm_config()),
+        dtype=search_config.get("dtype", "float32"),
+        batch_size=search_config.get("batch_size", 32),
+        clusters=search_config.get("clusters", 0),
+        nprobe=search_config.get("nprobe", 8)
+    )
+
+    if args.command == "sync":
+        embedded = index.sync(lambda: sqlite3.connect(args.db))
+        print(f"Embedded {embedded} messages, {index.size} in the index")
+    elif args.command == "cluster":
+        clusters = args.clusters or search_config.get("clusters") or max(1, int(index.size ** 0.5))
+        index.build_clusters(clusters)
+        print(f"Built {clusters} clusters over {index.size} vectors")
+    else:
+        if not args.query:
+            print("Usage: python semantic_index.py search <text>")
+            sys.exit(1)
+        conn = sqlite3.connect(args.db)
+        for message_id, score in index.search(args.query):
+            row = conn.execute("SELECT timestamp, transcript FROM messages WHERE id = ?", (message_id,)).fetchone()
+            print(f"{score:.3f}  {row[0][:16]}  {row[1][:100]}")
+        conn.close()
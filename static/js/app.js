@@ -132,23 +132,54 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    async function extractEntities(messageId) {
-        try {
-            const response = await fetch(`/api/messages/${messageId}/extract-entities`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                }
-            });
-            
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
+    async function streamExtractEntities(messageId, onEvent) {
+        const response = await fetch(`/api/messages/${messageId}/extract-entities/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            }
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error('Network response was not ok');
+        }
+        
+        await readEventStream(response.body, onEvent);
+    }
+    
+    // Reads a text/event-stream body and calls onEvent(name, data) per event
+    async function readEventStream(body, onEvent) {
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
             }
             
-            return await response.json();
-        } catch (error) {
-            console.error(`Error extracting entities for message ${messageId}:`, error);
-            throw error;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let eventName = 'message';
+                const dataLines = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                
+                if (dataLines.length > 0) {
+                    onEvent(eventName, JSON.parse(dataLines.join('\n')));
+                }
+            }
         }
     }
     
@@ -197,72 +228,13 @@ document.addEventListener('DOMContentLoaded', function() {
         for (const group of dateGroups) {
             const dateGroup = document.importNode(dateGroupTemplate.content, true);
             const dateHeader = dateGroup.querySelector('.date-header');
+            dateGroup.querySelector('.date-group').dataset.date = group.date;
             const messageList = dateGroup.querySelector('.message-list');
             
             dateHeader.textContent = formatDate(group.date);
             
             for (const message of group.messages) {
-                const messageElement = document.importNode(messageTemplate.content, true);
-                const messageCard = messageElement.querySelector('.message-card');
-                
-                // Store message data for editing
-                messageCard.dataset.id = message.id;
-                messageCard.dataset.timestamp = message.timestamp;
-                messageCard.dataset.transcript = message.transcript;
-                
-                // Format timestamp for display (just the time part)
-                messageElement.querySelector('.message-time').textContent = message.formatted_time;
-                messageElement.querySelector('.message-id').textContent = `#${message.id}`;
-                messageElement.querySelector('.message-text').textContent = message.transcript;
-                
-                // Set up edit button
-                const editBtn = messageElement.querySelector('.edit-message-btn');
-                editBtn.addEventListener('click', function() {
-                    toggleEditMode(messageCard, true);
-                });
-                
-                // Set up save button
-                const saveBtn = messageElement.querySelector('.save-edit-btn');
-                saveBtn.addEventListener('click', function() {
-                    saveMessageEdit(messageCard);
-                });
-                
-                // Set up cancel button
-                const cancelBtn = messageElement.querySelector('.cancel-edit-btn');
-                cancelBtn.addEventListener('click', function() {
-                    toggleEditMode(messageCard, false);
-                });
-                
-                // Set up extract entities button
-                const extractBtn = messageElement.querySelector('.extract-entities-btn');
-                extractBtn.addEventListener('click', async function() {
-                    try {
-                        extractBtn.disabled = true;
-                        extractBtn.innerHTML = '<i class="bi bi-hourglass"></i> Extrahiere...';
-                        
-                        const result = await extractEntities(message.id);
-                        
-                        if (!result.success) {
-                            // Show error message
-                            alert(`Fehler: ${result.error || 'Unbekannter Fehler beim Extrahieren der Entitäten.'}`);
-                            return;
-                        }
-                        
-                        // Render the extracted entities
-                        if (result.entities && result.entities.length > 0) {
-                            renderEntitiesForMessage(messageCard, result.entities);
-                        } else {
-                            alert('Keine Entitäten gefunden. Möglicherweise ist der LLM-Dienst nicht erreichbar oder es wurden keine Entitäten erkannt.');
-                        }
-                    } catch (error) {
-                        console.error('Error extracting entities:', error);
-                        alert('Fehler beim Extrahieren der Entitäten: ' + (error.message || 'Unbekannter Fehler'));
-                    } finally {
-                        extractBtn.disabled = false;
-                        extractBtn.innerHTML = '<i class="bi bi-tags"></i> Entitäten extrahieren';
-                    }
-                });
-                
+                const { messageElement, messageCard } = createMessageElement(message);
                 messageList.appendChild(messageElement);
                 
                 // Load and render entities for this message
@@ -273,6 +245,84 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    function createMessageElement(message) {
+        const messageElement = document.importNode(messageTemplate.content, true);
+        const messageCard = messageElement.querySelector('.message-card');
+        
+        // Store message data for editing
+        messageCard.dataset.id = message.id;
+        messageCard.dataset.timestamp = message.timestamp;
+        messageCard.dataset.transcript = message.transcript;
+        
+        // Format timestamp for display (just the time part)
+        messageElement.querySelector('.message-time').textContent = message.formatted_time;
+        messageElement.querySelector('.message-id').textContent = `#${message.id}`;
+        messageElement.querySelector('.message-text').textContent = message.transcript;
+        
+        // Set up edit button
+        const editBtn = messageElement.querySelector('.edit-message-btn');
+        editBtn.addEventListener('click', function() {
+            toggleEditMode(messageCard, true);
+        });
+        
+        // Set up save button
+        const saveBtn = messageElement.querySelector('.save-edit-btn');
+        saveBtn.addEventListener('click', function() {
+            saveMessageEdit(messageCard);
+        });
+        
+        // Set up cancel button
+        const cancelBtn = messageElement.querySelector('.cancel-edit-btn');
+        cancelBtn.addEventListener('click', function() {
+            toggleEditMode(messageCard, false);
+        });
+        
+        // Set up extract entities button
+        const extractBtn = messageElement.querySelector('.extract-entities-btn');
+        extractBtn.addEventListener('click', async function() {
+            try {
+                extractBtn.disabled = true;
+                extractBtn.innerHTML = '<i class="bi bi-hourglass"></i> Extrahiere...';
+                
+                // Stream entities into the card as the LLM produces them
+                const streamedEntities = [];
+                let result = null;
+                
+                await streamExtractEntities(message.id, (eventName, data) => {
+                    if (eventName === 'entity') {
+                        streamedEntities.push(data);
+                        renderEntitiesForMessage(messageCard, streamedEntities);
+                    } else if (eventName === 'done') {
+                        result = data;
+                    } else if (eventName === 'error') {
+                        result = { success: false, error: data.error };
+                    }
+                });
+                
+                if (!result || !result.success) {
+                    // Show error message
+                    alert(`Fehler: ${(result && result.error) || 'Unbekannter Fehler beim Extrahieren der Entitäten.'}`);
+                    return;
+                }
+                
+                // Render the saved entities (with their database ids)
+                if (result.entities && result.entities.length > 0) {
+                    renderEntitiesForMessage(messageCard, result.entities);
+                } else {
+                    alert('Keine Entitäten gefunden. Möglicherweise ist der LLM-Dienst nicht erreichbar oder es wurden keine Entitäten erkannt.');
+                }
+            } catch (error) {
+                console.error('Error extracting entities:', error);
+                alert('Fehler beim Extrahieren der Entitäten: ' + (error.message || 'Unbekannter Fehler'));
+            } finally {
+                extractBtn.disabled = false;
+                extractBtn.innerHTML = '<i class="bi bi-tags"></i> Entitäten extrahieren';
+            }
+        });
+        
+        return { messageElement, messageCard };
+    }
+    
     async function loadEntitiesForMessage(messageCard) {
         const messageId = messageCard.dataset.id;
         const entityContainer = messageCard.querySelector('.entity-container');
@@ -352,8 +402,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 entityEditModal.hide();
                 
-                // Refresh data to show updated entities
-                await refreshData();
+                // Refresh data to show updated entities (the live update does it otherwise)
+                if (!liveUpdatesConnected) {
+                    await refreshData();
+                }
                 
             } catch (error) {
                 console.error('Error saving entity:', error);
@@ -393,8 +445,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 entityMergeModal.hide();
                 
-                // Refresh data to show merged entities
-                await refreshData();
+                // Refresh data to show merged entities (the live update does it otherwise)
+                if (!liveUpdatesConnected) {
+                    await refreshData();
+                }
                 
             } catch (error) {
                 console.error('Error merging entities:', error);
@@ -439,7 +493,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     <input class="form-check-input" type="checkbox" value="${entity.id}" id="entity-${entity.id}">
                     <label class="form-check-label" for="entity-${entity.id}">
                         <span class="badge" style="background-color: ${entity.color}">${entity.label}</span>
-                        <small class="text-muted">(${entity.type})</small>
+                        <small class="text-muted">(${entity.type}, ${entity.message_count} Memos)</small>
                     </label>
                 `;
                 mergeList.appendChild(checkbox);
@@ -527,8 +581,10 @@ document.addEventListener('DOMContentLoaded', function() {
             // Exit edit mode
             toggleEditMode(messageCard, false);
             
-            // Refresh data to ensure correct grouping by date
-            await refreshData();
+            // Refresh data to ensure correct grouping by date (the live update moves the card otherwise)
+            if (!liveUpdatesConnected) {
+                await refreshData();
+            }
             
         } catch (error) {
             console.error('Error updating message:', error);
@@ -536,6 +592,134 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Live Updates
+    let liveUpdatesConnected = false;
+    
+    function connectLiveUpdates() {
+        if (!window.EventSource) {
+            return;
+        }
+        
+        // EventSource reconnects by itself and resumes after the last event id
+        const source = new EventSource('/api/events');
+        
+        source.addEventListener('open', () => {
+            liveUpdatesConnected = true;
+        });
+        source.addEventListener('error', () => {
+            liveUpdatesConnected = false;
+        });
+        
+        source.addEventListener('message-created', event => {
+            insertMessageCard(JSON.parse(event.data));
+            fetchStats().then(updateStats);
+        });
+        source.addEventListener('message-updated', event => {
+            updateMessageCard(JSON.parse(event.data));
+        });
+        source.addEventListener('message-deleted', event => {
+            removeMessageCard(JSON.parse(event.data).id);
+            fetchStats().then(updateStats);
+        });
+        source.addEventListener('entities-updated', event => {
+            const data = JSON.parse(event.data);
+            const messageCard = findMessageCard(data.message_id);
+            if (messageCard) {
+                renderEntitiesForMessage(messageCard, data.entities);
+            }
+        });
+        source.addEventListener('entity-updated', event => {
+            // Reload the entities of every card that shows the changed entity
+            const entity = JSON.parse(event.data);
+            const cards = new Set();
+            messagesContainer.querySelectorAll(`.entity-badge[data-id="${entity.id}"]`).forEach(badge => {
+                cards.add(badge.closest('.message-card'));
+            });
+            cards.forEach(card => loadEntitiesForMessage(card));
+        });
+        source.addEventListener('reload', () => {
+            refreshData();
+        });
+    }
+    
+    function findMessageCard(messageId) {
+        return messagesContainer.querySelector(`.message-card[data-id="${messageId}"]`);
+    }
+    
+    // Place a card in its day's list, which is sorted newest first
+    function positionMessageCard(messageList, messageCard) {
+        const next = Array.from(messageList.querySelectorAll('.message-card'))
+            .find(card => card !== messageCard && card.dataset.timestamp < messageCard.dataset.timestamp);
+        messageList.insertBefore(messageCard, next || null);
+    }
+    
+    function insertMessageCard(message) {
+        if (findMessageCard(message.id)) {
+            updateMessageCard(message);
+            return;
+        }
+        
+        // Replace the empty state
+        if (!messagesContainer.querySelector('.date-group')) {
+            messagesContainer.innerHTML = '';
+        }
+        
+        let dateGroupElement = messagesContainer.querySelector(`.date-group[data-date="${message.date}"]`);
+        if (!dateGroupElement) {
+            const dateGroup = document.importNode(dateGroupTemplate.content, true);
+            dateGroupElement = dateGroup.querySelector('.date-group');
+            dateGroupElement.dataset.date = message.date;
+            dateGroup.querySelector('.date-header').textContent = formatDate(message.date);
+            
+            // Date groups are sorted newest first
+            const next = Array.from(messagesContainer.querySelectorAll('.date-group'))
+                .find(group => group.dataset.date < message.date);
+            messagesContainer.insertBefore(dateGroup, next || null);
+        }
+        
+        const { messageElement, messageCard } = createMessageElement(message);
+        const messageList = dateGroupElement.querySelector('.message-list');
+        messageList.appendChild(messageElement);
+        positionMessageCard(messageList, messageCard);
+        
+        return messageCard;
+    }
+    
+    function updateMessageCard(message) {
+        const messageCard = findMessageCard(message.id);
+        if (!messageCard) {
+            insertMessageCard(message);
+            return;
+        }
+        
+        if (messageCard.closest('.date-group').dataset.date !== message.date) {
+            // Moved to another day: re-insert under that date
+            removeMessageCard(message.id);
+            const movedCard = insertMessageCard(message);
+            loadEntitiesForMessage(movedCard);
+            return;
+        }
+        
+        messageCard.dataset.timestamp = message.timestamp;
+        messageCard.dataset.transcript = message.transcript;
+        messageCard.querySelector('.message-time').textContent = message.formatted_time;
+        messageCard.querySelector('.message-text').textContent = message.transcript;
+        positionMessageCard(messageCard.parentElement, messageCard);
+    }
+    
+    function removeMessageCard(messageId) {
+        const messageCard = findMessageCard(messageId);
+        if (!messageCard) {
+            return;
+        }
+        
+        const dateGroupElement = messageCard.closest('.date-group');
+        messageCard.remove();
+        if (!dateGroupElement.querySelector('.message-card')) {
+            dateGroupElement.remove();
+        }
+    }
+    
     function updateStats(stats) {
         totalMessagesElement.textContent = `${stats.total_messages} Memos`;
     }
@@ -552,6 +736,9 @@ document.addEventListener('DOMContentLoaded', function() {
         // Load initial data
         await refreshData();
         
+        // Patch the page when memos change, including those recorded with trans.pyw
+        connectLiveUpdates();
+        
         // Set up event listeners
         themeToggleBtn.addEventListener('click', toggleTheme);
         refreshButton.addEventListener('click', refreshData);
@@ -607,8 +794,10 @@ document.addEventListener('DOMContentLoaded', function() {
             newMessageDate.value = date;
             newMessageTime.value = time;
             
-            // Refresh data to show new message
-            await refreshData();
+            // Refresh data to show new message (the live update inserts it otherwise)
+            if (!liveUpdatesConnected) {
+                await refreshData();
+            }
             
         } catch (error) {
             console.error('Error creating message:', error);
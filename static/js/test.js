@@ -8,6 +8,13 @@ document.addEventListener('DOMContentLoaded', function() {
     const resultsContainer = document.getElementById('results-container');
     const themeToggleBtn = document.getElementById('theme-toggle-btn');
     const entityTemplate = document.getElementById('entity-template');
+    const evaluationForm = document.getElementById('evaluation-form');
+    const evaluationSetups = document.getElementById('evaluation-setups');
+    const evaluationSampleSize = document.getElementById('evaluation-sample-size');
+    const evaluationMinF1 = document.getElementById('evaluation-min-f1');
+    const evaluationIncludePrompt = document.getElementById('evaluation-include-prompt');
+    const runEvaluationBtn = document.getElementById('run-evaluation-btn');
+    const evaluationResults = document.getElementById('evaluation-results');
     
     // Theme Management
     function initTheme() {
@@ -29,32 +36,113 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // API Calls
-    async function runExtraction(provider, note, prompt) {
-        try {
-            const response = await fetch('/api/test/extract', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    provider: provider,
-                    note: note,
-                    prompt: prompt
-                })
-            });
-            
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
+    async function streamExtraction(provider, note, prompt, onEvent) {
+        const response = await fetch('/api/test/extract/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                provider: provider,
+                note: note,
+                prompt: prompt
+            })
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error('Network response was not ok');
+        }
+        
+        await readEventStream(response.body, onEvent);
+    }
+    
+    async function runEvaluation(request) {
+        const response = await fetch('/api/test/evaluate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(request)
+        });
+        
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.error || 'Network response was not ok');
+        }
+        return result;
+    }
+    
+    // Reads a text/event-stream body and calls onEvent(name, data) per event
+    async function readEventStream(body, onEvent) {
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
             }
             
-            return await response.json();
-        } catch (error) {
-            console.error('Error running extraction:', error);
-            throw error;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let eventName = 'message';
+                const dataLines = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                
+                if (dataLines.length > 0) {
+                    onEvent(eventName, JSON.parse(dataLines.join('\n')));
+                }
+            }
         }
     }
     
     // UI Rendering
+    function renderStreamingResults() {
+        resultsContainer.innerHTML = `
+            <div class="mb-4">
+                <h5>Rohantwort vom LLM <span class="spinner-border spinner-border-sm" role="status"></span></h5>
+                <pre class="bg-light p-3 rounded" id="streaming-raw-response"></pre>
+            </div>
+            <div class="mb-4">
+                <h5>Extrahierte Entitäten (<span id="streaming-entity-count">0</span>)</h5>
+                <div class="entity-container mb-3" id="streaming-entities"></div>
+            </div>
+        `;
+    }
+    
+    function appendStreamingToken(token) {
+        const rawResponse = document.getElementById('streaming-raw-response');
+        if (rawResponse) {
+            rawResponse.textContent += token;
+        }
+    }
+    
+    function appendStreamingEntity(entity) {
+        const entityContainer = document.getElementById('streaming-entities');
+        const entityCount = document.getElementById('streaming-entity-count');
+        if (!entityContainer) {
+            return;
+        }
+        
+        const entityElement = document.importNode(entityTemplate.content, true);
+        entityElement.querySelector('.entity-badge').style.backgroundColor = entity.color;
+        entityElement.querySelector('.entity-label').textContent = entity.label;
+        entityContainer.appendChild(entityElement);
+        entityCount.textContent = entityContainer.children.length;
+    }
+    
     function renderResults(result) {
         resultsContainer.innerHTML = '';
         
@@ -148,6 +236,72 @@ document.addEventListener('DOMContentLoaded', function() {
         resultsContainer.appendChild(jsonDiv);
     }
     
+    function renderEvaluation(result) {
+        const formatNumber = (value, digits) => value === null || value === undefined ? '–' : value.toFixed(digits);
+        const recommended = result.recommended;
+        
+        const rows = result.reports.map(report => {
+            const isRecommended = recommended && recommended.prompt === report.prompt &&
+                recommended.provider === report.provider && recommended.model === report.model;
+            const typeRows = Object.entries(report.by_type).map(([type, scores]) => `
+                <tr class="small text-muted">
+                    <td></td>
+                    <td>${escapeHtml(type)} (${scores.support})</td>
+                    <td>${formatNumber(scores.precision, 3)}</td>
+                    <td>${formatNumber(scores.recall, 3)}</td>
+                    <td>${formatNumber(scores.f1, 3)}</td>
+                    <td colspan="6"></td>
+                </tr>
+            `).join('');
+            
+            return `
+                <tr class="${isRecommended ? 'table-success' : ''}">
+                    <td>${escapeHtml(report.prompt)}</td>
+                    <td>${escapeHtml(report.provider)}/${escapeHtml(report.model)}</td>
+                    <td>${formatNumber(report.precision, 3)}</td>
+                    <td>${formatNumber(report.recall, 3)}</td>
+                    <td><strong>${formatNumber(report.f1, 3)}</strong></td>
+                    <td>${formatNumber(report.latency_mean_ms, 0)}</td>
+                    <td>${formatNumber(report.latency_p95_ms, 0)}</td>
+                    <td>${formatNumber(report.latency_p99_ms, 0)}</td>
+                    <td>${formatNumber(report.tokens_per_note, 0)}</td>
+                    <td>${report.parse_failure_rate === null ? '–' : (report.parse_failure_rate * 100).toFixed(1) + ' %'}</td>
+                    <td>${report.errors}</td>
+                </tr>
+                ${typeRows}
+            `;
+        }).join('');
+        
+        const recommendation = recommended
+            ? `<div class="alert alert-success">Empfehlung: <strong>${escapeHtml(recommended.provider)}/${escapeHtml(recommended.model)}</strong> mit Prompt "${escapeHtml(recommended.prompt)}" (F1 ${recommended.f1}, ${recommended.tokens_per_note} Tokens pro Memo)</div>`
+            : (result.recommended === null ? '<div class="alert alert-warning">Kein Modell erreicht den Mindest-F1-Wert.</div>' : '');
+        
+        evaluationResults.innerHTML = `
+            <p>${result.notes} Memos ausgewertet</p>
+            ${recommendation}
+            <div class="table-responsive">
+                <table class="table table-sm">
+                    <thead>
+                        <tr>
+                            <th>Prompt</th>
+                            <th>Modell</th>
+                            <th>Precision</th>
+                            <th>Recall</th>
+                            <th>F1</th>
+                            <th>Ø ms</th>
+                            <th>p95 ms</th>
+                            <th>p99 ms</th>
+                            <th>Tokens/Memo</th>
+                            <th>Parse-Fehler</th>
+                            <th>Fehler</th>
+                        </tr>
+                    </thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>
+        `;
+    }
+    
     // Helper function to escape HTML
     function escapeHtml(unsafe) {
         return unsafe
@@ -192,11 +346,24 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
         
         try {
-            // Run extraction
-            const result = await runExtraction(provider, note, prompt);
+            // Stream the extraction so entities show up while the LLM is still generating
+            let finished = false;
+            renderStreamingResults();
             
-            // Render results
-            renderResults(result);
+            await streamExtraction(provider, note, prompt, (eventName, data) => {
+                if (eventName === 'token') {
+                    appendStreamingToken(data);
+                } else if (eventName === 'entity') {
+                    appendStreamingEntity(data);
+                } else if (eventName === 'done' || eventName === 'error') {
+                    finished = true;
+                    renderResults(data);
+                }
+            });
+            
+            if (!finished) {
+                throw new Error('Die Verbindung wurde vor dem Ende der Extraktion geschlossen');
+            }
             
         } catch (error) {
             console.error('Error:', error);
@@ -215,6 +382,55 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    async function handleEvaluationSubmit(event) {
+        event.preventDefault();
+        
+        // One setup per line: "provider" or "provider:model"
+        const setups = evaluationSetups.value.split('\n').map(line => line.trim()).filter(line => line).map(line => {
+            const separator = line.indexOf(':');
+            return separator < 0
+                ? { provider: line }
+                : { provider: line.slice(0, separator), model: line.slice(separator + 1) };
+        });
+        
+        const prompts = [{ name: 'default', prompt: null }];
+        if (evaluationIncludePrompt.checked && extractionPrompt.value.trim()) {
+            prompts.push({ name: 'editor', prompt: extractionPrompt.value.trim() });
+        }
+        
+        runEvaluationBtn.disabled = true;
+        runEvaluationBtn.innerHTML = '<i class="bi bi-hourglass"></i> Verarbeite...';
+        evaluationResults.innerHTML = `
+            <div class="text-center py-3">
+                <div class="spinner-border mb-3" role="status">
+                    <span class="visually-hidden">Lädt...</span>
+                </div>
+                <p>Evaluiere ${prompts.length * setups.length} Kombinationen...</p>
+            </div>
+        `;
+        
+        try {
+            const result = await runEvaluation({
+                setups: setups,
+                prompts: prompts,
+                sample_size: parseInt(evaluationSampleSize.value, 10) || 50,
+                min_f1: parseFloat(evaluationMinF1.value) || 0
+            });
+            renderEvaluation(result);
+        } catch (error) {
+            console.error('Error:', error);
+            evaluationResults.innerHTML = `
+                <div class="alert alert-danger">
+                    <h5><i class="bi bi-exclamation-triangle"></i> Fehler</h5>
+                    <p>Bei der Evaluation ist ein Fehler aufgetreten: ${escapeHtml(error.message || 'Unbekannter Fehler')}</p>
+                </div>
+            `;
+        } finally {
+            runEvaluationBtn.disabled = false;
+            runEvaluationBtn.innerHTML = '<i class="bi bi-bar-chart"></i> Evaluation starten';
+        }
+    }
+    
     // Add CSS for color preview
     function addStyles() {
         const style = document.createElement('style');
@@ -237,6 +453,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Set up event listeners
         themeToggleBtn.addEventListener('click', toggleTheme);
         testForm.addEventListener('submit', handleFormSubmit);
+        evaluationForm.addEventListener('submit', handleEvaluationSubmit);
     }
     
     // Start the application
@@ -0,0 +1,14 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """An empty database with the full schema, used by the app for this test."""
+    path = str(tmp_path / "transcripts.db")
+    monkeypatch.setattr(app, "DB_PATH", path)
+    # Cached per database revision, which starts over in every test database
+    monkeypatch.setattr(app, "duplicate_clusters", {})
+    app.init_db(path)
+    return path
@@ -0,0 +1,84 @@
+import sqlite3
+
+import app
+from app import AGGREGATE_TABLES, rebuild_aggregates, save_message_entities
+
+
+def aggregates(conn):
+    return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in AGGREGATE_TABLES}
+
+
+def assert_aggregates_rebuild_unchanged(db_path):
+    conn = sqlite3.connect(db_path)
+    maintained = aggregates(conn)
+    rebuild_aggregates(conn.cursor())
+    try:
+        assert aggregates(conn) == maintained
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def add_message(db_path, timestamp, transcript, entities):
+    conn = sqlite3.connect(db_path)
+    message_id = conn.execute("INSERT INTO messages (timestamp, transcript) VALUES (?, ?)",
+                              (timestamp, transcript)).lastrowid
+    conn.commit()
+    conn.close()
+    save_message_entities(message_id, [{"type": entity_type, "label": label, "color": "#FF5733"}
+                                       for entity_type, label in entities])
+    return message_id
+
+
+def entity_id(db_path, label):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT id FROM entities WHERE label = ?", (label,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def test_aggregates_match_rebuild_after_insert_merge_and_delete(db_path):
+    client = app.app.test_client()
+
+    first = add_message(db_path, "2025-06-30T09:12:44", "Call Sarah Müller about Acme",
+                        [("person", "Sarah Müller"), ("company", "Acme Corp")])
+    add_message(db_path, "2025-06-30T17:01:02", "sarah müller sent the ACME offer\nplease review",
+                [("person", "sarah müller"), ("company", "ACME Corporation"), ("topic", "Offer")])
+    last = add_message(db_path, "2025-07-01T08:00:00", "Offer for Acme is done",
+                       [("company", "Acme Corp"), ("topic", "Offer")])
+    assert_aggregates_rebuild_unchanged(db_path)
+
+    response = client.put(f"/api/messages/{first}", json={"transcript": "Call Sarah Müller about the Acme offer"})
+    assert response.status_code == 200
+    assert_aggregates_rebuild_unchanged(db_path)
+
+    response = client.post("/api/entities/merge", json={
+        "entity_ids": [entity_id(db_path, "Sarah Müller"), entity_id(db_path, "sarah müller")],
+        "merged_entity": {"type": "person", "label": "Sarah Müller", "color": "#FF5733"}
+    })
+    assert response.status_code == 200
+    assert_aggregates_rebuild_unchanged(db_path)
+
+    acme = entity_id(db_path, "Acme Corp")
+    response = client.post("/api/entities/merge/bulk", json={
+        "groups": [{"entity_ids": [acme, entity_id(db_path, "ACME Corporation")], "target_id": acme}]
+    })
+    assert response.status_code == 200
+    assert_aggregates_rebuild_unchanged(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE note_entities SET entity_id = ? WHERE message_id = ? AND entity_id = ?",
+                 (entity_id(db_path, "Offer"), first, acme))
+    conn.execute("DELETE FROM note_entities WHERE message_id = ? AND entity_id = ?", (last, acme))
+    conn.commit()
+    conn.close()
+    assert_aggregates_rebuild_unchanged(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM messages WHERE id = ?", (last,))
+    conn.execute("DELETE FROM note_entities WHERE message_id = ?", (last,))
+    conn.execute("DELETE FROM entities WHERE label = 'Offer'")
+    conn.execute("DELETE FROM note_entities WHERE entity_id NOT IN (SELECT id FROM entities)")
+    conn.commit()
+    conn.close()
+    assert_aggregates_rebuild_unchanged(db_path)
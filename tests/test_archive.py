@@ -0,0 +1,67 @@
+import json
+import sqlite3
+
+import app
+from archive import export_ndjson, import_ndjson
+
+
+def content(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = {}
+    for timestamp, transcript, entity_type, label in conn.execute("""
+        SELECT m.timestamp, m.transcript, e.type, e.label
+        FROM messages m
+        LEFT JOIN note_entities ne ON ne.message_id = m.id
+        LEFT JOIN entities e ON e.id = ne.entity_id
+    """):
+        entities = rows.setdefault((timestamp, transcript), set())
+        if label is not None:
+            entities.add((entity_type, label))
+    conn.close()
+    return rows
+
+
+def test_export_import_round_trip(db_path, tmp_path):
+    conn = sqlite3.connect(db_path)
+    for timestamp, transcript, entities in [
+        ("2025-06-30T09:12:44", "Call Sarah Müller about Acme", [("person", "Sarah Müller"), ("company", "Acme Corp")]),
+        ("2025-06-30T17:01:02", "Offer for Acme is done", [("company", "Acme Corp"), ("topic", "Offer")]),
+        ("2025-07-01T08:00:00", "Nothing to extract here", []),
+    ]:
+        message_id = conn.execute("INSERT INTO messages (timestamp, transcript) VALUES (?, ?)",
+                                  (timestamp, transcript)).lastrowid
+        for entity_type, label in entities:
+            row = conn.execute("SELECT id FROM entities WHERE type = ? AND label = ?", (entity_type, label)).fetchone()
+            entity_id = row[0] if row else conn.execute(
+                "INSERT INTO entities (type, label, color) VALUES (?, ?, '#FF5733')", (entity_type, label)).lastrowid
+            conn.execute("INSERT INTO note_entities (message_id, entity_id) VALUES (?, ?)", (message_id, entity_id))
+    conn.commit()
+    conn.close()
+
+    lines = list(export_ndjson(lambda: sqlite3.connect(db_path), batch_size=2))
+    assert json.loads(lines[0])["format"] == "transprogram"
+    assert len(lines) == 4
+
+    # A target whose newest messages were deleted: their ids must not come back
+    target = str(tmp_path / "target.db")
+    app.init_db(target)
+    conn = sqlite3.connect(target)
+    conn.executemany("INSERT INTO messages (timestamp, transcript) VALUES (?, ?)",
+                     [("2025-01-01T00:00:00", f"old {i}") for i in range(5)])
+    conn.execute("DELETE FROM messages WHERE id > 2")
+    conn.commit()
+
+    result = import_ndjson(conn, lines, batch_size=2)
+    assert (result["imported"], result["skipped"], result["entities_created"], result["links"]) == (3, 0, 3, 4)
+    assert result["without_entities"] == 1
+    assert (result["first_id"], result["last_id"]) == (6, 8)
+    assert [row[0] for row in conn.execute("SELECT id FROM messages ORDER BY id")] == [1, 2, 6, 7, 8]
+
+    # Importing again skips every message as a duplicate
+    result = import_ndjson(conn, lines)
+    assert (result["imported"], result["skipped"], result["links"]) == (0, 3, 0)
+    conn.close()
+
+    imported = content(target)
+    del imported[("2025-01-01T00:00:00", "old 0")], imported[("2025-01-01T00:00:00", "old 1")]
+    assert imported == content(db_path)
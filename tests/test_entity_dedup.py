@@ -0,0 +1,78 @@
+import sqlite3
+import time
+
+import app
+from entity_dedup import DuplicateFinder
+
+
+def entities(*labels, entity_type="person"):
+    return [{"id": i, "type": entity_type, "label": label, "message_count": 0}
+            for i, label in enumerate(labels, start=1)]
+
+
+def cluster_labels(clusters):
+    return sorted(sorted(entity["label"] for entity in cluster["entities"]) for cluster in clusters)
+
+
+def test_legal_suffixes_and_case_are_ignored():
+    clusters = DuplicateFinder().find_clusters(entities("Acme Corp", "ACME Corporation", "Globex GmbH",
+                                                        entity_type="company"))
+
+    assert cluster_labels(clusters) == [["ACME Corporation", "Acme Corp"]]
+
+
+def test_unambiguous_abbreviation_is_merged():
+    clusters = DuplicateFinder().find_clusters(entities("Sarah Müller", "sarah müller", "S. Müller"))
+
+    assert cluster_labels(clusters) == [["S. Müller", "Sarah Müller", "sarah müller"]]
+
+
+def test_ambiguous_abbreviation_is_left_alone():
+    clusters = DuplicateFinder().find_clusters(entities("Sarah Müller", "Stefan Müller", "S. Müller"))
+
+    assert clusters == []
+
+
+def test_different_types_are_not_merged():
+    candidates = entities("Acme") + [{"id": 2, "type": "project", "label": "Acme", "message_count": 0}]
+
+    assert DuplicateFinder().find_clusters(candidates) == []
+
+
+def test_target_is_the_most_used_entity():
+    candidates = entities("sarah müller", "Sarah Müller")
+    candidates[0]["message_count"] = 5
+
+    (cluster,) = DuplicateFinder().find_clusters(candidates)
+    assert cluster["target_id"] == 1
+
+
+def test_proposed_clusters_can_be_passed_to_bulk_merge(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO entities (type, label, color) VALUES (?, ?, '#FF5733')", [
+        ("company", "Acme Corp"), ("company", "ACME Corporation"), ("person", "Sarah Müller"),
+        ("person", "Stefan Müller"), ("person", "S. Müller")
+    ])
+    conn.commit()
+    conn.close()
+    client = app.app.test_client()
+
+    # Computed in the background; pending until ready
+    for _ in range(100):
+        response = client.get("/api/entities/duplicates")
+        if response.status_code == 200:
+            break
+        assert response.status_code == 202
+        time.sleep(0.05)
+    clusters = response.get_json()["clusters"]
+    assert cluster_labels(clusters) == [["ACME Corporation", "Acme Corp"]]
+
+    response = client.post("/api/entities/merge/bulk", json={"groups": clusters})
+    assert response.status_code == 200
+
+    conn = sqlite3.connect(db_path)
+    companies = conn.execute("SELECT id FROM entities WHERE type = 'company'").fetchall()
+    people = conn.execute("SELECT COUNT(*) FROM entities WHERE type = 'person'").fetchone()[0]
+    conn.close()
+    assert companies == [(clusters[0]["target_id"],)]
+    assert people == 3
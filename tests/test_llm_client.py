@@ -0,0 +1,45 @@
+import pytest
+
+from llm_client import LLMClient, LLMResponseError
+
+TRUNCATED = '{"entities": [{"type": "person", "label": "Sarah Müller"}, {"type": "company", "label": "Ac'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No connectivity check against a real Ollama
+    monkeypatch.setattr(LLMClient, "check_connectivity", lambda self: True)
+    return LLMClient("ollama", {"model": "test"})
+
+
+def test_valid_response_is_no_parse_failure(client):
+    client._local.parse_failed = False
+    entities = client._parse_llm_response('{"entities": [{"type": "person", "label": "Sarah Müller"}]}')
+
+    assert [entity["label"] for entity in entities] == ["Sarah Müller"]
+    assert not client._local.parse_failed
+
+
+def test_truncated_response_returns_prefix_and_counts_as_parse_failure(client):
+    client._local.parse_failed = False
+    entities = client._parse_llm_response(TRUNCATED)
+
+    assert [entity["label"] for entity in entities] == ["Sarah Müller"]
+    assert client._local.parse_failed
+
+
+def test_truncated_response_keeps_prefix_with_raise_errors(client, monkeypatch):
+    monkeypatch.setattr(LLMClient, "_extract_with_ollama",
+                        lambda self, text, raise_errors=False: self._parse_llm_response(TRUNCATED))
+
+    assert [entity["label"] for entity in client.extract_entities("text")] == ["Sarah Müller"]
+    assert [entity["label"] for entity in client.extract_entities("text", raise_errors=True)] == ["Sarah Müller"]
+
+
+def test_unrecoverable_response_raises_with_raise_errors(client, monkeypatch):
+    monkeypatch.setattr(LLMClient, "_extract_with_ollama",
+                        lambda self, text, raise_errors=False: self._parse_llm_response('{"entities": [{"ty'))
+
+    assert client.extract_entities("text") == []
+    with pytest.raises(LLMResponseError):
+        client.extract_entities("text", raise_errors=True)
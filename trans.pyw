@@ -18,6 +18,30 @@ import sys
 import sqlite3
 import datetime
 
+import metrics
+
+# Prometheus-Metriken der Transkription (abrufbar unter http://localhost:9101/metrics)
+METRICS_PORT = 9101
+
+AUDIO_SECONDS = metrics.Histogram(
+    "transcription_audio_seconds",
+    "Länge der aufgenommenen Audiodaten in Sekunden",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+TRANSCRIPTION_SECONDS = metrics.Histogram(
+    "transcription_duration_seconds",
+    "Dauer der Whisper-Transkription in Sekunden"
+)
+REAL_TIME_FACTOR = metrics.Histogram(
+    "transcription_real_time_factor",
+    "Transkriptionsdauer geteilt durch Audiolänge",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+)
+TIME_TO_CLIPBOARD = metrics.Histogram(
+    "transcription_time_to_clipboard_seconds",
+    "Zeit vom Stoppen der Aufnahme bis der Text in der Zwischenablage liegt"
+)
+
 class VoiceMemoRecorder:
     def __init__(self):
         self.recording = False
@@ -163,6 +187,7 @@ class VoiceMemoRecorder:
             self.frames.append(data)
             
     def stop_recording(self):
+        stopped_at = time.perf_counter()
         self.recording = False
         
         # Signalton für Ende der Aufnahme (500 Hz für 100ms - sanfter, tieferer Ton)
@@ -186,12 +211,15 @@ class VoiceMemoRecorder:
             
             # Konvertiere Float32 zu Int16 für WAV-Datei
             audio_data = np.frombuffer(b''.join(self.frames), dtype=np.float32)
+            audio_seconds = len(audio_data) / self.RATE
             audio_data = (audio_data * 32767).astype(np.int16)
             wf.writeframes(audio_data.tobytes())
             wf.close()
         
         # Transkribiere mit Whisper (Deutsch)
+        transcription_started = time.perf_counter()
         result = self.model.transcribe(temp_filename, language="de")
+        transcription_seconds = time.perf_counter() - transcription_started
         transcript = result["text"]
         
         # Speichere in der Datenbank
@@ -200,6 +228,13 @@ class VoiceMemoRecorder:
         # Kopiere in die Zwischenablage
         pyperclip.copy(transcript)
         
+        # Erfasse Metriken
+        TIME_TO_CLIPBOARD.observe(time.perf_counter() - stopped_at)
+        TRANSCRIPTION_SECONDS.observe(transcription_seconds)
+        AUDIO_SECONDS.observe(audio_seconds)
+        if audio_seconds > 0:
+            REAL_TIME_FACTOR.observe(transcription_seconds / audio_seconds)
+        
         # Signalton für erfolgreiche Transkription (600 Hz für 100ms - mittlerer, erfolgreicher Ton)
         winsound.Beep(600, 100)
         
@@ -223,6 +258,13 @@ def main():
     recorder = VoiceMemoRecorder()
     recording_thread = None
     
+    # Stelle die Metriken für Prometheus bereit
+    try:
+        metrics.start_http_server(METRICS_PORT)
+        print(f"Metriken unter http://localhost:{METRICS_PORT}/metrics")
+    except OSError as e:
+        print(f"Metrik-Server konnte nicht gestartet werden: {e}")
+    
     def start_stop_recording():
         nonlocal recording_thread
         